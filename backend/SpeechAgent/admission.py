@@ -0,0 +1,261 @@
+# admission.py
+"""
+Admission control and graceful degradation for /ws/voice.
+
+- SessionGate caps concurrent voice sessions; extra clients wait in a FIFO
+  waiting room and are told their position.
+- StageLimiter caps how many STT / RAG / TTS calls run at once in this process,
+  so a burst of sessions can't exhaust the asyncio.to_thread worker pool.
+- DegradationController watches per-turn latency against an SLO and steps the
+  service through degraded modes, notifying every connected session:
+      normal         full answers, spoken
+      short_answers  one-sentence answers, spoken
+      text_only      short answers, TTS skipped
+      cached_only    only answers already in the KB answer cache
+"""
+import os
+import time
+import asyncio
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Set
+
+MODES = ("normal", "short_answers", "text_only", "cached_only")
+
+MAX_VOICE_SESSIONS = int(os.environ.get("VOICE_MAX_SESSIONS", "40"))
+WAITING_ROOM_MAX = int(os.environ.get("VOICE_WAITING_ROOM_MAX", "200"))
+WAITING_ROOM_TIMEOUT_SECONDS = float(os.environ.get("VOICE_WAITING_ROOM_TIMEOUT", "180"))
+
+STAGE_LIMITS = {
+    "stt": int(os.environ.get("VOICE_STT_CONCURRENCY", "12")),
+    "rag": int(os.environ.get("VOICE_RAG_CONCURRENCY", "12")),
+    "tts": int(os.environ.get("VOICE_TTS_CONCURRENCY", "16")),
+}
+
+# Turn latency = end-of-turn marker -> answer sent (STT + RAG).
+TURN_SLO_MS = float(os.environ.get("VOICE_TURN_SLO_MS", "8000"))
+# Fixed mode for testing/incidents; disables automatic switching.
+FORCED_MODE = os.environ.get("VOICE_FORCE_MODE")
+# How often an idle server re-checks whether it can leave a degraded mode.
+DEGRADATION_CHECK_SECONDS = float(os.environ.get("VOICE_DEGRADATION_CHECK_SECONDS", "15"))
+
+
+class WaitingRoomFull(Exception):
+    pass
+
+
+class SessionGate:
+    """
+    Counting gate with a FIFO waiting room.
+    """
+
+    def __init__(self, max_sessions: int, max_waiting: int):
+        self.max_sessions = max_sessions
+        self.max_waiting = max_waiting
+        self.active = 0
+        self._waiters: List[asyncio.Future] = []
+        self.admitted_total = 0
+        self.waited_total = 0
+        self.rejected_total = 0
+
+    def position(self, waiter: asyncio.Future) -> int:
+        return self._waiters.index(waiter) + 1 if waiter in self._waiters else 0
+
+    async def acquire(
+        self,
+        on_wait: Callable[[int], Awaitable[None]],
+        timeout: float,
+    ):
+        """
+        Take a session slot, waiting in line if none is free. on_wait(position)
+        is called when queued and whenever the position changes.
+        Raises WaitingRoomFull, or asyncio.TimeoutError after `timeout` seconds.
+        """
+        if self.active < self.max_sessions and not self._waiters:
+            self.active += 1
+            self.admitted_total += 1
+            return
+
+        if len(self._waiters) >= self.max_waiting:
+            self.rejected_total += 1
+            raise WaitingRoomFull()
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        self.waited_total += 1
+        deadline = time.monotonic() + timeout
+        last_position = 0
+        try:
+            while True:
+                position = self.position(waiter)
+                if position != last_position:
+                    last_position = position
+                    await on_wait(position)
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise asyncio.TimeoutError()
+                try:
+                    # Wake up periodically to report position changes.
+                    await asyncio.wait_for(asyncio.shield(waiter), timeout=min(remaining, 2.0))
+                    # release() already counted this session as active.
+                    self.admitted_total += 1
+                    return
+                except asyncio.TimeoutError:
+                    continue
+        except BaseException:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+            elif waiter.done() and not waiter.cancelled():
+                # Slot was handed to us just as we gave up; pass it on.
+                self.release()
+            raise
+
+    def release(self):
+        # Hand the slot straight to the next waiter so nobody can jump the queue.
+        while self._waiters:
+            waiter = self._waiters.pop(0)
+            if not waiter.done():
+                waiter.set_result(True)
+                return
+        self.active = max(self.active - 1, 0)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "active": self.active,
+            "max_sessions": self.max_sessions,
+            "waiting": len(self._waiters),
+            "admitted_total": self.admitted_total,
+            "waited_total": self.waited_total,
+            "rejected_total": self.rejected_total,
+        }
+
+
+class StageLimiter:
+    """
+    One semaphore per pipeline stage.
+    """
+
+    def __init__(self, limits: Dict[str, int]):
+        self.limits = dict(limits)
+        self._semaphores = {stage: asyncio.Semaphore(n) for stage, n in limits.items()}
+        self._in_use = {stage: 0 for stage in limits}
+
+    def slot(self, stage: str) -> "_StageSlot":
+        return _StageSlot(self, stage)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            stage: {"in_use": self._in_use[stage], "limit": self.limits[stage]}
+            for stage in self.limits
+        }
+
+
+class _StageSlot:
+    def __init__(self, limiter: StageLimiter, stage: str):
+        self.limiter = limiter
+        self.stage = stage
+
+    async def __aenter__(self):
+        await self.limiter._semaphores[self.stage].acquire()
+        self.limiter._in_use[self.stage] += 1
+
+    async def __aexit__(self, *exc):
+        self.limiter._in_use[self.stage] -= 1
+        self.limiter._semaphores[self.stage].release()
+
+
+class DegradationController:
+    """
+    Moves between MODES based on recent turn latency:
+    one step worse when the recent p90 breaches the SLO, one step better once
+    it has stayed well under the SLO for `recover_after` seconds.
+    """
+
+    def __init__(
+        self,
+        slo_ms: float,
+        window: int = 20,
+        min_samples: int = 5,
+        recover_after: float = 60.0,
+        forced_mode: Optional[str] = None,
+    ):
+        self.slo_ms = slo_ms
+        self.min_samples = min_samples
+        self.recover_after = recover_after
+        self.forced_mode = forced_mode if forced_mode in MODES else None
+        self.mode = self.forced_mode or "normal"
+        self._samples: Deque[float] = deque(maxlen=window)
+        self._last_change = time.monotonic()
+        self._listeners: Set[Callable[[Dict[str, Any]], Awaitable[None]]] = set()
+        self.switches = 0
+
+    def subscribe(self, listener: Callable[[Dict[str, Any]], Awaitable[None]]):
+        self._listeners.add(listener)
+
+    def unsubscribe(self, listener: Callable[[Dict[str, Any]], Awaitable[None]]):
+        self._listeners.discard(listener)
+
+    def event(self, reason: str = "") -> Dict[str, Any]:
+        return {"type": "mode", "mode": self.mode, "reason": reason}
+
+    def _p90(self) -> float:
+        ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(0.9 * len(ordered)))]
+
+    def record_turn(self, latency_ms: float):
+        self._samples.append(latency_ms)
+        if self.forced_mode or len(self._samples) < self.min_samples:
+            return
+
+        p90 = self._p90()
+        idx = MODES.index(self.mode)
+        now = time.monotonic()
+        if p90 > self.slo_ms and idx < len(MODES) - 1:
+            self._switch(MODES[idx + 1], f"p90 turn latency {p90:.0f} ms > SLO {self.slo_ms:.0f} ms")
+        elif p90 < 0.6 * self.slo_ms and idx > 0 and now - self._last_change > self.recover_after:
+            self._switch(MODES[idx - 1], f"p90 turn latency {p90:.0f} ms back under SLO")
+
+    def reevaluate(self):
+        """
+        Step back toward normal once nothing slow has been seen for `recover_after`
+        seconds. record_turn only runs when turns do, so without this a server
+        whose load has gone away would stay degraded until the next turn.
+        """
+        if self.forced_mode or self.mode == "normal":
+            return
+        if time.monotonic() - self._last_change <= self.recover_after:
+            return
+        if self._samples and self._p90() >= 0.6 * self.slo_ms:
+            return
+        self._switch(MODES[MODES.index(self.mode) - 1], "no slow turns recently")
+
+    def _switch(self, mode: str, reason: str):
+        print(f"[Admission] mode {self.mode} -> {mode} ({reason})")
+        self.mode = mode
+        self.switches += 1
+        self._last_change = time.monotonic()
+        # Start fresh so the new mode is judged on its own latency.
+        self._samples.clear()
+        event = self.event(reason)
+        for listener in list(self._listeners):
+            asyncio.ensure_future(listener(event))
+
+    @property
+    def speak_answers(self) -> bool:
+        return self.mode in ("normal", "short_answers")
+
+    @property
+    def short_answers(self) -> bool:
+        return self.mode != "normal"
+
+    @property
+    def cached_only(self) -> bool:
+        return self.mode == "cached_only"
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "mode": self.mode,
+            "forced": bool(self.forced_mode),
+            "slo_ms": self.slo_ms,
+            "recent_p90_ms": round(self._p90()) if self._samples else None,
+            "switches": self.switches,
+        }
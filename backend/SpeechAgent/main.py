@@ -1,19 +1,75 @@
 import os
+import sys
 import io
 import wave
 import asyncio
 import json
 import base64
+import time
 import datetime
+import threading
 from uuid import uuid4
-from typing import Any
+from typing import Any, Optional
 from dotenv import load_dotenv, find_dotenv
 import websockets
-from openai import OpenAI
 from fastapi import FastAPI, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
 from starlette.websockets import WebSocketState
 
+# Make the shared backend/common package importable when running from this directory.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from admission import (
+    DEGRADATION_CHECK_SECONDS,
+    FORCED_MODE,
+    MAX_VOICE_SESSIONS,
+    STAGE_LIMITS,
+    TURN_SLO_MS,
+    WAITING_ROOM_MAX,
+    WAITING_ROOM_TIMEOUT_SECONDS,
+    DegradationController,
+    SessionGate,
+    StageLimiter,
+    WaitingRoomFull,
+)
+from common.cache import TTLCache
+from common.kb import create_kb_assistant, extract_text_and_citations, run_assistant
+from common.model_router import ModelRouter
+from common.openai_client import TRANSPORT_STATS, client_for_stage, get_openai_client
+from common.prompts import PROMPT_CACHE_STATS
+from common.resilience import (
+    CircuitBreaker,
+    CircuitOpenError,
+    Hedger,
+    resilience_snapshot,
+    to_thread_cancellable,
+)
+from common.single_flight import SingleFlight, question_flight_key
+from session_recorder import SessionRecorder
+from voice_protocol import (
+    AUDIO,
+    AUDIO_OUT,
+    CANCEL,
+    CONTROL,
+    END_TURN,
+    MODE_AUDIO,
+    MODE_TEXT,
+    PROTOCOL_STATS,
+    PROTOCOL_V1,
+    PROTOCOL_V2,
+    QUESTION,
+    RESULT,
+    ProtocolError,
+    SeqTracker,
+    decode_frame,
+    encode_frame,
+    encode_json,
+    frame_name,
+    negotiate,
+    negotiate_modes,
+    parse_v1_question,
+)
+
 # Load .env reliably regardless of current working directory (root vs backend/).
 load_dotenv(find_dotenv(usecwd=True))
 
@@ -24,11 +80,42 @@ VECTOR_STORE_ID = os.environ.get("VECTOR_STORE_ID")
 REALTIME_MODEL = os.environ.get("OPENAI_REALTIME_MODEL", "gpt-4o-realtime-preview")
 STT_MODEL = os.environ.get("OPENAI_STT_MODEL", "gpt-4o-mini-transcribe")
 RAG_MODEL = os.environ.get("OPENAI_RAG_MODEL", "gpt-5.1-mini")
-RAG_ASSISTANT_MODEL = os.environ.get("OPENAI_RAG_ASSISTANT_MODEL", "gpt-4o-mini")
+# When set, voice answers always use this model; otherwise the tier table picks one per turn.
+RAG_ASSISTANT_MODEL_OVERRIDE = os.environ.get("OPENAI_RAG_ASSISTANT_MODEL")
+RAG_ASSISTANT_MODEL = RAG_ASSISTANT_MODEL_OVERRIDE or "gpt-4o-mini"
 TTS_VOICE = os.environ.get("OPENAI_TTS_VOICE", "alloy")
 
+# Bump KB_VERSION when the vector store content changes in place, so coalesced
+# requests never share answers across KB versions.
+KB_VERSION = os.environ.get("KB_VERSION") or VECTOR_STORE_ID or ""
+# How long a single voice turn waits for a (possibly shared) KB answer.
+KB_QUERY_TIMEOUT_SECONDS = float(os.environ.get("KB_QUERY_TIMEOUT_SECONDS", "75"))
+# Longer typed questions are rejected (text input sessions).
+MAX_TYPED_QUESTION_CHARS = int(os.environ.get("MAX_TYPED_QUESTION_CHARS", "1000"))
+# Turns a session may have waiting behind the one being answered.
+MAX_PENDING_TURNS = int(os.environ.get("VOICE_MAX_PENDING_TURNS", "4"))
+
 SAMPLE_RATE_HZ = 24000
 
+# Static instructions are kept in constants and never interpolated, so every KB run
+# and every TTS session starts with the same prefix (cacheable on the provider side).
+# Per-request content (the question / the text to speak) is always sent last.
+KB_ASSISTANT_INSTRUCTIONS = (
+    "You are a friendly voice assistant for children learning about anti-corruption. "
+    "ONLY answer using information from the attached files (file_search). "
+    "Keep answers SHORT (2-3 sentences max), SIMPLE (easy words), and CLEAR. "
+    "Explain like you're talking to a 15-year-old. "
+    "Always respond in English. "
+    "If the topic isn't covered, say: 'I don't have information about that in my knowledge base.'"
+)
+
+TTS_INSTRUCTIONS = (
+    "You are a friendly voice assistant for young adults. "
+    "Speak in English with a warm, encouraging tone. "
+    "Read the provided text aloud exactly as written. "
+    "Do not add extra words or translate."
+)
+
 app = FastAPI()
 
 # for local dev, allow your React origin
@@ -45,9 +132,61 @@ if not OPENAI_API_KEY:
 if not VECTOR_STORE_ID:
     raise RuntimeError("VECTOR_STORE_ID missing in .env (create/upload KB vector store first)")
 
-client = OpenAI(api_key=OPENAI_API_KEY)
+# One pooled client per process; stage clients share its connections but carry
+# their own timeouts (see common/openai_client.py).
+client = get_openai_client(OPENAI_API_KEY)
+stt_client = client_for_stage("stt")
+rag_client = client_for_stage("rag")
 _kb_assistant_id: str | None = os.environ.get("KB_ASSISTANT_ID")
 
+# Identical concurrent KB questions share one upstream assistant run.
+kb_flights = SingleFlight("kb")
+
+# Picks model + output budget per request from the tier table (common/model_router.py).
+model_router = ModelRouter.from_env(stage_models={"voice": RAG_ASSISTANT_MODEL_OVERRIDE})
+
+# Recent KB answers; the only source of answers in "cached_only" mode.
+kb_answer_cache = TTLCache(max_entries=500, ttl_seconds=3600)
+
+# Admission control / degradation for /ws/voice (see admission.py).
+voice_gate = SessionGate(MAX_VOICE_SESSIONS, WAITING_ROOM_MAX)
+stage_limiter = StageLimiter(STAGE_LIMITS)
+degradation = DegradationController(TURN_SLO_MS, forced_mode=FORCED_MODE)
+_degradation_timer: asyncio.Task | None = None
+
+
+async def _reevaluate_degradation():
+    while True:
+        await asyncio.sleep(DEGRADATION_CHECK_SECONDS)
+        degradation.reevaluate()
+
+
+@app.on_event("startup")
+async def _start_degradation_timer():
+    global _degradation_timer
+    _degradation_timer = asyncio.create_task(_reevaluate_degradation())
+
+
+@app.on_event("shutdown")
+async def _stop_degradation_timer():
+    if _degradation_timer:
+        _degradation_timer.cancel()
+
+BRIEF_ANSWER_INSTRUCTIONS = "The service is busy: answer in ONE short sentence."
+CACHE_MISS_ANSWER = (
+    "Lots of people are asking questions right now, so I can only answer ones I've heard recently. "
+    "Please try again in a minute."
+)
+
+# Tail-latency hedging + fail-fast breakers for the upstream calls (common/resilience.py).
+stt_hedger = Hedger("stt")
+stt_breaker = CircuitBreaker("stt")
+kb_hedger = Hedger("kb")
+kb_breaker = CircuitBreaker("kb")
+KB_UNAVAILABLE_ANSWER = (
+    "I can't reach the course knowledge base right now. Please try again in a minute."
+)
+
 
 def _safe_json_dumps(obj: Any) -> str:
     """
@@ -78,7 +217,7 @@ def transcribe_turn(pcm16_bytes: bytes) -> str:
     """
     wav_file = _wav_bytes_from_pcm16(pcm16_bytes)
     # The SDK supports multiple STT models; use env-configured model.
-    result = client.audio.transcriptions.create(
+    result = stt_client.audio.transcriptions.create(
         model=STT_MODEL,
         file=wav_file,
     )
@@ -86,9 +225,13 @@ def transcribe_turn(pcm16_bytes: bytes) -> str:
     return (getattr(result, "text", "") or "").strip()
 
 
-def kb_only_answer_with_citations(question: str) -> dict[str, Any]:
+def kb_only_answer_with_citations(
+    question: str, brief: bool = False, cancel_event: Optional[threading.Event] = None
+) -> dict[str, Any]:
     """
     KB-only answer using file_search against the configured vector store.
+    `brief` asks for a one-sentence answer (degraded mode); setting `cancel_event`
+    stops polling and cancels the run (see run_assistant).
     Returns {answer: str, citations: list}.
     """
     global _kb_assistant_id
@@ -96,89 +239,141 @@ def kb_only_answer_with_citations(question: str) -> dict[str, Any]:
     # Use Assistants API because this OpenAI SDK version (2.9.0) doesn't accept
     # `tool_resources` on responses.create(). Assistants/Threads does support it.
     if not _kb_assistant_id:
-        assistant = client.beta.assistants.create(
+        _kb_assistant_id = create_kb_assistant(
+            rag_client,
             name="KB Voice Assistant",
-            instructions=(
-                "You are a friendly voice assistant for children learning about anti-corruption. "
-                "ONLY answer using information from the attached files (file_search). "
-                "Keep answers SHORT (2-3 sentences max), SIMPLE (easy words), and CLEAR. "
-                "Explain like you're talking to a 15-year-old. "
-                "Always respond in English. "
-                "If the topic isn't covered, say: 'I don't have information about that in my knowledge base.'"
-            ),
+            instructions=KB_ASSISTANT_INSTRUCTIONS,
             model=RAG_ASSISTANT_MODEL,
-            tools=[{"type": "file_search"}],
-            tool_resources={"file_search": {"vector_store_ids": [VECTOR_STORE_ID]}},
+            vector_store_id=VECTOR_STORE_ID,
         )
-        _kb_assistant_id = assistant.id
-
-    thread = client.beta.threads.create()
-    client.beta.threads.messages.create(
-        thread_id=thread.id,
-        role="user",
-        content=question,
-    )
-
-    run = client.beta.threads.runs.create(
-        thread_id=thread.id,
-        assistant_id=_kb_assistant_id,
-    )
 
-    # Poll until run completes
-    import time
-
-    max_wait_seconds = 60
-    waited = 0
-    while run.status in ("queued", "in_progress") and waited < max_wait_seconds:
-        time.sleep(1.5)
-        waited += 1.5
-        run = client.beta.threads.runs.retrieve(thread_id=thread.id, run_id=run.id)
-
-    if run.status != "completed":
-        detail = (
-            run.last_error.message
-            if getattr(run, "last_error", None)
-            else f"Assistant run status: {run.status}"
+    tier = model_router.route("voice", text_length=len(question))
+    with model_router.track(tier):
+        assistant_message = run_assistant(
+            rag_client,
+            _kb_assistant_id,
+            question,
+            max_wait_seconds=60,
+            poll_interval=1.5,
+            usage_label="kb_answer",
+            model=tier.model,
+            max_completion_tokens=tier.max_output_tokens,
+            additional_instructions=BRIEF_ANSWER_INSTRUCTIONS if brief else None,
+            # A spoken answer cut off at the budget is still worth saying.
+            allow_incomplete=True,
+            cancel_event=cancel_event,
         )
-        raise RuntimeError(detail)
-
-    messages = client.beta.threads.messages.list(thread_id=thread.id)
-    assistant_message = next((m for m in messages.data if m.role == "assistant"), None)
     if not assistant_message:
         return {"answer": "", "citations": []}
 
     # Extract answer and citations (best-effort).
-    answer_text = ""
-    citations: list[dict[str, Any]] = []
-
-    for part in assistant_message.content:
-        # Most assistant outputs are text parts
-        if getattr(part, "type", None) == "text":
-            text_obj = getattr(part, "text", None)
-            if text_obj and getattr(text_obj, "value", None):
-                answer_text += (text_obj.value or "")
-
-            for ann in getattr(text_obj, "annotations", []) or []:
-                raw = ann if isinstance(ann, dict) else getattr(ann, "__dict__", {"annotation": str(ann)})
-                try:
-                    citations.append(json.loads(_safe_json_dumps(raw)))
-                except Exception:
-                    citations.append({"citation": str(raw)})
+    answer_text, citations = extract_text_and_citations(assistant_message)
+    return {"answer": answer_text, "citations": citations}
+
+
+class BrowserChannel:
+    """
+    Outgoing side of the browser websocket. All kb_result events and audio chunks
+    go through here so an optional SessionRecorder sees exactly what the client saw.
+    Encodes for the negotiated protocol (see voice_protocol.py): v1 sends JSON text
+    and raw PCM, v2 sends typed binary frames.
+    """
 
-    return {"answer": answer_text.strip(), "citations": citations}
+    def __init__(
+        self,
+        ws: WebSocket,
+        recorder: SessionRecorder | None = None,
+        protocol: int = PROTOCOL_V1,
+    ):
+        self.ws = ws
+        self.recorder = recorder
+        self.protocol = protocol
+        self._seq = 0
+
+    async def _send_frame(self, frame_type: int, payload: bytes):
+        seq = self._seq
+        self._seq += 1
+        await self.ws.send_bytes(encode_frame(frame_type, seq, payload))
+
+    async def send_event(self, payload: dict[str, Any]):
+        if self.protocol == PROTOCOL_V2:
+            body = encode_json(payload)
+            frame_type = RESULT if payload.get("type") == "kb_result" else CONTROL
+            await self._send_frame(frame_type, body)
+            if self.recorder:
+                self.recorder.event_out(body.decode("utf-8"))
+            return
+
+        text = _safe_json_dumps(payload)
+        await self.ws.send_text(text)
+        if self.recorder:
+            self.recorder.event_out(text)
+
+    async def send_audio(self, audio_bytes: bytes):
+        if self.protocol == PROTOCOL_V2:
+            await self._send_frame(AUDIO_OUT, audio_bytes)
+        else:
+            await self.ws.send_bytes(audio_bytes)
+        if self.recorder:
+            self.recorder.audio_out(len(audio_bytes))
 
 
 async def transcribe_turn_async(pcm16_bytes: bytes) -> str:
     # OpenAI Python SDK calls are synchronous; run in a worker thread so we don't block the WS event loop.
-    return await asyncio.to_thread(transcribe_turn, pcm16_bytes)
+    # Transcription is idempotent, so a slow call gets a hedged duplicate.
+    try:
+        return await stt_breaker.call(
+            lambda: stt_hedger.run(lambda: asyncio.to_thread(transcribe_turn, pcm16_bytes))
+        )
+    except CircuitOpenError:
+        raise RuntimeError("speech recognition is temporarily unavailable")
+
+
+def cached_kb_answer(question: str) -> dict[str, Any] | None:
+    """
+    A recent answer to this question (full or brief), if any.
+    """
+    key = question_flight_key(question, KB_VERSION)
+    return kb_answer_cache.get(key) or kb_answer_cache.get(key + "#brief")
 
 
-async def kb_only_answer_with_citations_async(question: str) -> dict[str, Any]:
+async def kb_only_answer_with_citations_async(question: str, brief: bool = False) -> dict[str, Any]:
     # OpenAI Python SDK calls are synchronous; run in a worker thread so we don't block the WS event loop.
-    return await asyncio.to_thread(kb_only_answer_with_citations, question)
+    # A cancelled call (e.g. a losing hedge) signals the thread, which cancels its Assistants run.
+    # Concurrent identical questions (e.g. a whole class asking the same thing) share one run.
+    # While the KB breaker is open, answer from the cache (or apologise) immediately.
+    key = question_flight_key(question, KB_VERSION) + ("#brief" if brief else "")
+
+    # The breaker wraps only the shared upstream call, so it sees one outcome per
+    # call rather than one per waiting session.
+    try:
+        rag = await kb_flights.do(
+            key,
+            lambda: kb_breaker.call(
+                lambda: kb_hedger.run(
+                    lambda: to_thread_cancellable(kb_only_answer_with_citations, question, brief)
+                )
+            ),
+            timeout=KB_QUERY_TIMEOUT_SECONDS,
+        )
+    except asyncio.TimeoutError:
+        raise RuntimeError(f"KB answer timed out after {KB_QUERY_TIMEOUT_SECONDS:.0f}s")
+    except CircuitOpenError:
+        rag = cached_kb_answer(question) or {"answer": KB_UNAVAILABLE_ANSWER, "citations": [], "fallback": True}
+    if rag.get("answer") and not rag.get("fallback"):
+        kb_answer_cache.set(key, rag)
+    return rag
 
 
-async def speak_text_via_realtime(browser_ws: WebSocket, text: str):
+def decode_audio_delta(event: dict[str, Any]) -> bytes:
+    """
+    PCM16 audio carried by a Realtime "response.audio.delta" event (b"" if none).
+    """
+    audio_b64 = event.get("delta")
+    return base64.b64decode(audio_b64) if audio_b64 else b""
+
+
+async def speak_text_via_realtime(channel: BrowserChannel, text: str):
     """
     Use OpenAI Realtime as a TTS engine:
     - send text
@@ -202,12 +397,7 @@ async def speak_text_via_realtime(browser_ws: WebSocket, text: str):
             "modalities": ["audio", "text"],
             "output_audio_format": "pcm16",
             "voice": TTS_VOICE,
-            "instructions": (
-                "You are a friendly voice assistant for young adults. "
-                "Speak in English with a warm, encouraging tone. "
-                "Read the provided text aloud exactly as written. "
-                "Do not add extra words or translate."
-            ),
+            "instructions": TTS_INSTRUCTIONS,
         },
     }
     print("[TTS] Sending session.update...")
@@ -235,7 +425,7 @@ async def speak_text_via_realtime(browser_ws: WebSocket, text: str):
             if isinstance(message, bytes):
                 # Rare, but forward if received.
                 print(f"[TTS] Received binary message ({len(message)} bytes)")
-                await browser_ws.send_bytes(message)
+                await channel.send_audio(message)
                 continue
 
             try:
@@ -250,12 +440,12 @@ async def speak_text_via_realtime(browser_ws: WebSocket, text: str):
             if msg_type == "error":
                 print(f"[TTS] ERROR from OpenAI: {data}")
             elif msg_type == "response.audio.delta":
-                audio_b64 = data.get("delta")
-                if audio_b64:
-                    audio_bytes = base64.b64decode(audio_b64)
-                    await browser_ws.send_bytes(audio_bytes)
+                audio_bytes = decode_audio_delta(data)
+                if audio_bytes:
+                    await channel.send_audio(audio_bytes)
             elif msg_type == "response.done" or msg_type == "response.completed":
                 print("[TTS] Response completed")
+                PROMPT_CACHE_STATS.record("tts", (data.get("response") or {}).get("usage"))
                 break
     except Exception as e:
         print(f"[TTS] Exception during message loop: {e}")
@@ -269,6 +459,173 @@ async def speak_text_via_realtime(browser_ws: WebSocket, text: str):
             pass
 
 
+@app.get("/stats")
+async def stats():
+    """
+    Process-local counters for tuning (prompt cache hit ratios, request coalescing, connection reuse, model routing, admission, ...).
+    """
+    return {
+        "prompt_cache": PROMPT_CACHE_STATS.snapshot(),
+        "coalescing": {"kb": kb_flights.snapshot()},
+        "transport": TRANSPORT_STATS.snapshot(),
+        "routing": model_router.snapshot(),
+        "kb_answer_cache": kb_answer_cache.snapshot(),
+        "admission": {
+            "sessions": voice_gate.snapshot(),
+            "stages": stage_limiter.snapshot(),
+            "degradation": degradation.snapshot(),
+        },
+        "protocol": PROTOCOL_STATS.snapshot(),
+        "resilience": resilience_snapshot(),
+    }
+
+
+async def process_turn(
+    channel: BrowserChannel,
+    pcm16_bytes: bytes = b"",
+    question: str | None = None,
+    speak: bool = True,
+):
+    """
+    One voice turn: STT -> KB answer -> spoken answer, shaped by the current
+    degradation mode and bounded by the per-stage concurrency limits.
+    A typed `question` skips STT; speak=False (text output sessions) skips TTS.
+    """
+    turn_id = uuid4().hex[:8]
+    timestamp = datetime.datetime.utcnow().isoformat()
+    turn_started = time.monotonic()
+
+    cancelled = False
+    try:
+        # Let the UI know we're working so it doesn't feel stuck.
+        try:
+            await channel.send_event({"type": "kb_result", "status": "processing"})
+        except Exception:
+            pass
+
+        # STT
+        if question is not None:
+            transcript = question
+            print(f"[{turn_id}] {timestamp} - typed question, skipping STT (len {len(transcript)})")
+        else:
+            try:
+                print(f"[{turn_id}] {timestamp} - starting STT ({len(pcm16_bytes)} bytes)")
+                async with stage_limiter.slot("stt"):
+                    transcript = await transcribe_turn_async(pcm16_bytes)
+                print(f"[{turn_id}] {timestamp} - STT done: '{transcript[:100]}...' (len {len(transcript)})")
+            except Exception as e:
+                print(f"[{turn_id}] STT error:", e)
+                try:
+                    await channel.send_event({"type": "kb_result", "error": f"STT failed: {e}"})
+                except Exception:
+                    pass
+                return
+
+        # Send transcript to frontend (echoed for typed questions, so clients see the same events)
+        try:
+            await channel.send_event({"type": "kb_result", "transcript": transcript})
+        except Exception as e:
+            print("Failed sending transcript to client:", e)
+
+        if not transcript:
+            print(f"[{turn_id}] Empty transcript, skipping KB query")
+            return
+
+        # RAG / KB query
+        degraded = degradation.mode != "normal"
+        try:
+            if degradation.cached_only:
+                print(f"[{turn_id}] {timestamp} - cached_only mode, checking answer cache")
+                rag = cached_kb_answer(transcript) or {"answer": CACHE_MISS_ANSWER, "citations": []}
+            else:
+                print(f"[{turn_id}] {timestamp} - querying KB")
+                async with stage_limiter.slot("rag"):
+                    rag = await kb_only_answer_with_citations_async(
+                        transcript, brief=degradation.short_answers
+                    )
+            answer_text = rag.get("answer", "")
+            citations = rag.get("citations", [])
+            print(f"[{turn_id}] {timestamp} - KB answer ready ({len(answer_text)} chars)")
+        except Exception as e:
+            print(f"[{turn_id}] RAG error:", e)
+            try:
+                await channel.send_event({"type": "kb_result", "error": f"RAG failed: {e}"})
+            except Exception:
+                pass
+            return
+
+        # Send answer + citations to frontend (text)
+        try:
+            result = {
+                "type": "kb_result",
+                "answer": answer_text,
+                "citations": citations,
+                "status": "done",
+            }
+            if degraded:
+                result["mode"] = degradation.mode
+            await channel.send_event(result)
+        except Exception as e:
+            print("Failed sending answer/citations to client:", e)
+    except asyncio.CancelledError:
+        cancelled = True
+        raise
+    finally:
+        # STT/RAG failures and timeouts are the slow turns the controller most
+        # needs to see; a turn the client cancelled says nothing about latency.
+        if not cancelled:
+            degradation.record_turn((time.monotonic() - turn_started) * 1000)
+
+    if not speak:
+        print(f"[{turn_id}] {timestamp} - text output session, skipping TTS")
+        return
+    if not degradation.speak_answers:
+        print(f"[{turn_id}] {timestamp} - {degradation.mode} mode, skipping TTS")
+        return
+
+    # Speak the answer
+    try:
+        print(f"[{turn_id}] {timestamp} - speaking answer")
+        async with stage_limiter.slot("tts"):
+            await speak_text_via_realtime(
+                channel,
+                answer_text or "I don't know based on the current knowledge base.",
+            )
+        print(f"[{turn_id}] {timestamp} - speak complete")
+    except Exception as e:
+        print(f"[{turn_id}] TTS error:", e)
+
+
+def classify_message(protocol: int, message: dict[str, Any], seq_tracker: SeqTracker) -> tuple[int, bytes] | None:
+    """
+    One "websocket.receive" message -> (frame type, payload) in v2 terms for either
+    protocol, or None when it should be skipped (stray text, bad or stale frame).
+    """
+    data = message.get("bytes")
+    if data is None:
+        # The only text message in either protocol is a v1 typed question
+        question = parse_v1_question(message.get("text")) if protocol == PROTOCOL_V1 else None
+        if question is None:
+            print(f"[WS] Received text message (ignoring): {message.get('text')}")
+            return None
+        PROTOCOL_STATS.messages_in[protocol] += 1
+        return QUESTION, question.encode("utf-8")
+
+    PROTOCOL_STATS.messages_in[protocol] += 1
+    if protocol == PROTOCOL_V2:
+        try:
+            frame = decode_frame(data)
+        except ProtocolError as e:
+            PROTOCOL_STATS.protocol_errors += 1
+            print(f"[WS] Dropping bad frame: {e}")
+            return None
+        if not seq_tracker.accept(frame.seq):
+            return None
+        return frame.type, frame.payload
+    # v1: zero-length binary = Stop Speaking marker, anything else is PCM
+    return (END_TURN, b"") if len(data) == 0 else (AUDIO, data)
+
+
 @app.websocket("/ws/voice")
 async def voice_bridge(ws: WebSocket):
     """
@@ -278,30 +635,150 @@ async def voice_bridge(ws: WebSocket):
 
     This is a simplified bridge intended for hackathon prototyping.
     For production, follow OpenAI's latest Realtime docs closely.
+
+    Wire format is v1 unless the client negotiates v2, and audio in/out unless
+    the client asks for text input and/or output (see voice_protocol.py).
     """
-    await ws.accept()
-    print("[WS] Connection accepted")
+    protocol, subprotocol = negotiate(ws)
+    input_mode, output_mode = negotiate_modes(ws)
+    speak = output_mode == MODE_AUDIO
+    await ws.accept(subprotocol=subprotocol)
+    PROTOCOL_STATS.session_started(protocol, input_mode, output_mode)
+    print(f"[WS] Connection accepted (protocol v{protocol}, {input_mode} in, {output_mode} out)")
 
-    # Greet on connect (spoken)
-    try:
-        print("[WS] Starting greeting TTS...")
-        await speak_text_via_realtime(ws, "Hi! How can I help you today?")
-        print("[WS] Greeting TTS completed")
-    except Exception as e:
-        print("[WS] Greeting TTS failed:", e)
+    # Opt-in session recording for replay (VOICE_RECORD_DIR); None when disabled.
+    recorder = SessionRecorder.from_env(SAMPLE_RATE_HZ)
+    channel = BrowserChannel(ws, recorder, protocol)
 
     # Per-turn audio buffer (PCM16)
     audio_chunks: list[bytes] = []
-    chunk_count = 0
+    seq_tracker = SeqTracker()
+    # Finished turns queue up for turn_worker, which answers them one at a time, in
+    # order, so the receive loop never waits and still sees a v2 CANCEL mid-turn.
+    pending_turns: asyncio.Queue = asyncio.Queue(maxsize=MAX_PENDING_TURNS)
+    turn_task: asyncio.Task | None = None
+
+    async def turn_worker():
+        nonlocal turn_task
+        while True:
+            turn = await pending_turns.get()
+            turn_task = asyncio.create_task(process_turn(channel, speak=speak, **turn))
+            try:
+                # wait() rather than await: a cancelled turn must not stop the worker
+                await asyncio.wait({turn_task})
+            finally:
+                turn_task = None
+
+    async def queue_turn(**turn):
+        try:
+            pending_turns.put_nowait(turn)
+        except asyncio.QueueFull:
+            print("[WS] Too many pending turns, dropping this one")
+            await channel.send_event(
+                {"type": "kb_result", "error": "Still answering your earlier questions, please wait"}
+            )
+
+    async def end_turn():
+        nonlocal audio_chunks
+        if recorder:
+            recorder.turn_end()
+        pcm16_bytes = b"".join(audio_chunks)
+        audio_chunks = []
+
+        if not pcm16_bytes:
+            print("[WS] No audio buffered, skipping turn")
+            return
+
+        print(f"[WS] End of turn - queueing {len(pcm16_bytes)} bytes")
+        await queue_turn(pcm16_bytes=pcm16_bytes)
+
+    async def typed_turn(question: str):
+        question = question.strip()
+        if input_mode != MODE_TEXT:
+            print("[WS] Ignoring typed question: session input is audio")
+            return
+        if not question:
+            return
+        if len(question) > MAX_TYPED_QUESTION_CHARS:
+            await channel.send_event(
+                {"type": "kb_result", "error": f"Question too long (max {MAX_TYPED_QUESTION_CHARS} characters)"}
+            )
+            return
+        if recorder:
+            recorder.question_in(question)
+        PROTOCOL_STATS.typed_questions += 1
+        await queue_turn(question=question)
+
+    async def cancel_turn():
+        # Cancel drops everything the client asked so far, not just the current answer.
+        audio_chunks.clear()
+        dropped = pending_turns.qsize()
+        while not pending_turns.empty():
+            pending_turns.get_nowait()
+        if turn_task and not turn_task.done():
+            turn_task.cancel()
+            dropped += 1
+        if dropped:
+            PROTOCOL_STATS.cancels += 1
+            print(f"[WS] {dropped} turn(s) cancelled by client")
+            await channel.send_event({"type": "kb_result", "status": "cancelled"})
+
+    # Admission: wait for a session slot, telling the client its place in line.
+    async def announce_position(position: int):
+        await channel.send_event({"type": "waiting_room", "position": position})
+
+    # Mode switches are pushed to every connected session.
+    async def on_mode_change(event: dict[str, Any]):
+        try:
+            await channel.send_event(event)
+        except Exception:
+            pass
 
-    print("[WS] Entering receive loop...")
+    worker: asyncio.Task | None = None
+    admitted = False
+    # Everything from admission on shares one cleanup (finally below), so an error
+    # anywhere, e.g. announcing a position to a socket that already closed, still
+    # closes the recorder and gives back the session slot.
     try:
+        try:
+            await voice_gate.acquire(announce_position, timeout=WAITING_ROOM_TIMEOUT_SECONDS)
+        except (WaitingRoomFull, asyncio.TimeoutError, WebSocketDisconnect) as e:
+            print(f"[WS] Not admitted: {type(e).__name__}")
+            try:
+                await channel.send_event({"type": "waiting_room", "status": "rejected"})
+                await ws.close(code=1013)  # "try again later"
+            except Exception:
+                pass
+            return
+        admitted = True
+        degradation.subscribe(on_mode_change)
+
+        try:
+            await channel.send_event({"type": "waiting_room", "status": "admitted"})
+            await channel.send_event(
+                {"type": "session", "protocol": protocol, "input": input_mode, "output": output_mode}
+            )
+            await channel.send_event(degradation.event())
+        except Exception:
+            pass
+
+        # Greet on connect (spoken unless the session or the service is text-only)
+        if speak and degradation.speak_answers:
+            try:
+                print("[WS] Starting greeting TTS...")
+                async with stage_limiter.slot("tts"):
+                    await speak_text_via_realtime(channel, "Hi! How can I help you today?")
+                print("[WS] Greeting TTS completed")
+            except Exception as e:
+                print("[WS] Greeting TTS failed:", e)
+
+        worker = asyncio.create_task(turn_worker())
+        print("[WS] Entering receive loop...")
         while True:
             try:
                 # Use receive() directly instead of iter_bytes() to see all messages including 0-length
                 message = await ws.receive()
                 msg_type = message.get("type")
-                print(f"[WS] Received message type={msg_type}")
 
                 if msg_type == "websocket.disconnect":
                     print("[WS] Client disconnected")
@@ -310,103 +787,28 @@ async def voice_bridge(ws: WebSocket):
                 if msg_type != "websocket.receive":
                     continue
 
-                chunk = message.get("bytes")
-                if chunk is None:
-                    # Text message - ignore
-                    text_data = message.get("text")
-                    print(f"[WS] Received text message (ignoring): {text_data}")
+                classified = classify_message(protocol, message, seq_tracker)
+                if classified is None:
                     continue
+                kind, payload = classified
 
-                chunk_count += 1
-                print(f"[WS] Received binary chunk #{chunk_count}, len={len(chunk)}")
-
-                # Stop Speaking marker: run STT -> KB answer -> speak answer
-                if len(chunk) == 0:
-                    print("[WS] Zero-length chunk received - processing turn")
-                    pcm16_bytes = b"".join(audio_chunks)
-                    audio_chunks = []
-
-                    if not pcm16_bytes:
-                        print("[WS] No audio buffered, skipping turn")
-                        continue
-
-                    turn_id = uuid4().hex[:8]
-                    timestamp = datetime.datetime.utcnow().isoformat()
-
-                    # Let the UI know we're working so it doesn't feel stuck.
-                    try:
-                        await ws.send_text(_safe_json_dumps({"type": "kb_result", "status": "processing"}))
-                    except Exception:
-                        pass
-
-                    # STT
-                    try:
-                        print(f"[{turn_id}] {timestamp} - starting STT ({len(pcm16_bytes)} bytes)")
-                        transcript = await transcribe_turn_async(pcm16_bytes)
-                        print(f"[{turn_id}] {timestamp} - STT done: '{transcript[:100]}...' (len {len(transcript)})")
-                    except Exception as e:
-                        print(f"[{turn_id}] STT error:", e)
-                        try:
-                            await ws.send_text(_safe_json_dumps({"type": "kb_result", "error": f"STT failed: {e}"}))
-                        except Exception:
-                            pass
-                        continue
-
-                    # Send transcript to frontend
-                    try:
-                        await ws.send_text(_safe_json_dumps({"type": "kb_result", "transcript": transcript}))
-                    except Exception as e:
-                        print("Failed sending transcript to client:", e)
-
-                    if not transcript:
-                        print(f"[{turn_id}] Empty transcript, skipping KB query")
-                        continue
-
-                    # RAG / KB query
-                    try:
-                        print(f"[{turn_id}] {timestamp} - querying KB")
-                        rag = await kb_only_answer_with_citations_async(transcript)
-                        answer_text = rag.get("answer", "")
-                        citations = rag.get("citations", [])
-                        print(f"[{turn_id}] {timestamp} - KB answer ready ({len(answer_text)} chars)")
-                    except Exception as e:
-                        print(f"[{turn_id}] RAG error:", e)
-                        try:
-                            await ws.send_text(_safe_json_dumps({"type": "kb_result", "error": f"RAG failed: {e}"}))
-                        except Exception:
-                            pass
-                        continue
-
-                    # Send answer + citations to frontend (text)
-                    try:
-                        await ws.send_text(
-                            _safe_json_dumps(
-                                {
-                                    "type": "kb_result",
-                                    "answer": answer_text,
-                                    "citations": citations,
-                                    "status": "done",
-                                }
-                            )
-                        )
-                    except Exception as e:
-                        print("Failed sending answer/citations to client:", e)
-
-                    # Speak the answer
-                    try:
-                        print(f"[{turn_id}] {timestamp} - speaking answer")
-                        await speak_text_via_realtime(
-                            ws,
-                            answer_text or "I don't know based on the current knowledge base.",
-                        )
-                        print(f"[{turn_id}] {timestamp} - speak complete")
-                    except Exception as e:
-                        print(f"[{turn_id}] TTS error:", e)
-
+                if kind in (AUDIO, END_TURN) and input_mode != MODE_AUDIO:
+                    # Text input session: nothing to transcribe
                     continue
-
-                # Normal audio chunk - buffer it
-                audio_chunks.append(chunk)
+                if kind == AUDIO:
+                    audio_chunks.append(payload)
+                    PROTOCOL_STATS.audio_bytes_in[protocol] += len(payload)
+                    if recorder:
+                        recorder.audio_in(payload)
+                elif kind == END_TURN:
+                    # Run STT -> KB answer -> speak answer
+                    await end_turn()
+                elif kind == QUESTION:
+                    await typed_turn(payload.decode("utf-8", errors="replace"))
+                elif kind == CANCEL:
+                    await cancel_turn()
+                else:
+                    print(f"[WS] Ignoring {frame_name(kind)} frame from client")
 
             except Exception as loop_err:
                 # Don't kill the WS on unexpected processing errors; report and continue.
@@ -414,7 +816,7 @@ async def voice_bridge(ws: WebSocket):
                 import traceback
                 traceback.print_exc()
                 try:
-                    await ws.send_text(_safe_json_dumps({"type": "kb_result", "error": f"Server error: {loop_err}"}))
+                    await channel.send_event({"type": "kb_result", "error": f"Server error: {loop_err}"})
                 except Exception:
                     pass
 
@@ -426,6 +828,18 @@ async def voice_bridge(ws: WebSocket):
         traceback.print_exc()
     finally:
         print("[WS] Cleaning up connection")
+        if turn_task and not turn_task.done():
+            turn_task.cancel()
+        if worker:
+            worker.cancel()
+        PROTOCOL_STATS.seq_gaps += seq_tracker.gaps
+        degradation.unsubscribe(on_mode_change)
+        if admitted:
+            voice_gate.release()
+            # Load just dropped; don't wait for the next turn to leave a degraded mode.
+            degradation.reevaluate()
+        if recorder:
+            recorder.close()
         try:
             if ws.application_state != WebSocketState.DISCONNECTED:
                 await ws.close()
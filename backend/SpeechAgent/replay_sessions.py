@@ -0,0 +1,222 @@
+# replay_sessions.py
+"""
+Replay recorded /ws/voice sessions (see session_recorder.py) against a running
+SpeechAgent and report per-turn latency.
+
+    python replay_sessions.py recordings/*.vrec --speed 4 --report new.json
+    python replay_sessions.py recordings/*.vrec --baseline old.json
+
+--speed compresses the gaps between audio chunks and between turns; the server
+side is not sped up. Each turn's audio is only sent once the previous turn's
+answer (and spoken audio) has finished, so queueing inside the server never
+leaks into the next turn's numbers.
+
+Sessions recorded with text input/output modes are replayed in the same modes
+(read from the recorded "session" event); typed questions are re-sent as v1
+question messages.
+
+Latencies are measured from sending the end-of-turn marker or question to:
+    stt_ms          transcript event
+    answer_ms       final answer / error event
+    first_audio_ms  first audio chunk after the answer
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+from typing import Any, Dict, List, Optional
+from urllib.parse import urlencode
+
+import websockets
+
+from session_recorder import (
+    AUDIO_IN,
+    EVENT_OUT,
+    QUESTION_IN,
+    TURN_END,
+    iter_turns,
+    read_session,
+    turn_latencies,
+)
+
+DEFAULT_URL = "ws://127.0.0.1:8000/ws/voice"
+METRICS = ("stt_ms", "answer_ms", "first_audio_ms")
+
+
+class _TurnWatcher:
+    """
+    Reads everything the server sends and timestamps the events of the current turn.
+    """
+
+    def __init__(self):
+        self.turn_sent_at: Optional[float] = None
+        self.result: Dict[str, Optional[int]] = {}
+        self.last_activity_at = time.monotonic()
+        self.answered = asyncio.Event()
+
+    def start_turn(self):
+        self.turn_sent_at = time.monotonic()
+        self.result = {m: None for m in METRICS}
+        self.answered.clear()
+
+    def _elapsed_ms(self) -> int:
+        return int((time.monotonic() - self.turn_sent_at) * 1000)
+
+    async def run(self, ws):
+        async for message in ws:
+            if isinstance(message, bytes):
+                self.last_activity_at = time.monotonic()
+                if self.turn_sent_at and self.answered.is_set() and self.result["first_audio_ms"] is None:
+                    self.result["first_audio_ms"] = self._elapsed_ms()
+                continue
+
+            if self.turn_sent_at is None:
+                continue
+            try:
+                event = json.loads(message)
+            except json.JSONDecodeError:
+                continue
+
+            if "transcript" in event and self.result["stt_ms"] is None:
+                self.result["stt_ms"] = self._elapsed_ms()
+                if not event["transcript"]:
+                    # Server skips the KB query for empty transcripts.
+                    self.answered.set()
+            if event.get("status") == "done" or "error" in event:
+                if self.result["answer_ms"] is None:
+                    self.result["answer_ms"] = self._elapsed_ms()
+                # Spoken audio follows the answer; don't call the turn quiet before it starts.
+                self.last_activity_at = time.monotonic()
+                self.answered.set()
+
+    async def wait_for_quiet(self, settle_seconds: float):
+        """
+        Wait until nothing has arrived for settle_seconds (end of spoken output).
+        """
+        while time.monotonic() - self.last_activity_at < settle_seconds:
+            await asyncio.sleep(settle_seconds / 4)
+
+
+def session_url(url: str, records) -> str:
+    """
+    `url` with the input/output modes of the recorded session, if it used any.
+    """
+    for record in records:
+        if record.kind == EVENT_OUT:
+            event = record.event()
+            if event.get("type") == "session":
+                modes = {k: event[k] for k in ("input", "output") if event.get(k) not in (None, "audio")}
+                if modes:
+                    return url + ("&" if "?" in url else "?") + urlencode(modes)
+                break
+    return url
+
+
+async def replay_session(
+    path: str,
+    url: str,
+    speed: float,
+    turn_timeout: float,
+    settle_seconds: float,
+) -> Dict[str, Any]:
+    _, records = read_session(path)
+    turns = list(iter_turns(records))
+    results: List[Dict[str, Optional[int]]] = []
+
+    async with websockets.connect(session_url(url, records), max_size=None) as ws:
+        watcher = _TurnWatcher()
+        reader = asyncio.create_task(watcher.run(ws))
+        try:
+            # Let the greeting finish so it isn't attributed to the first turn.
+            await watcher.wait_for_quiet(settle_seconds)
+
+            for turn in turns:
+                previous_t_ms = turn[0].t_ms
+                for record in turn:
+                    gap = (record.t_ms - previous_t_ms) / 1000 / speed
+                    previous_t_ms = record.t_ms
+                    if gap > 0:
+                        await asyncio.sleep(gap)
+
+                    if record.kind == AUDIO_IN:
+                        await ws.send(record.payload)
+                    elif record.kind == TURN_END:
+                        await ws.send(b"")
+                        watcher.start_turn()
+                    elif record.kind == QUESTION_IN:
+                        await ws.send(json.dumps({"type": "question", "text": record.payload.decode("utf-8")}))
+                        watcher.start_turn()
+
+                try:
+                    await asyncio.wait_for(watcher.answered.wait(), timeout=turn_timeout)
+                except asyncio.TimeoutError:
+                    print(f"  turn {len(results) + 1}: no answer within {turn_timeout}s")
+                await watcher.wait_for_quiet(settle_seconds)
+                results.append(dict(watcher.result))
+        finally:
+            reader.cancel()
+
+    return {"recorded": turn_latencies(records), "replayed": results}
+
+
+def _fmt(value: Optional[int]) -> str:
+    return "-" if value is None else f"{value}"
+
+
+def _delta(new: Optional[int], old: Optional[int]) -> str:
+    if new is None or old is None:
+        return "-"
+    return f"{new - old:+d}"
+
+
+def print_comparison(name: str, current: List[Dict], reference: List[Dict], reference_label: str):
+    print(f"\n{name}  (ms; delta vs {reference_label})")
+    print("turn  " + "  ".join(f"{m:>22}" for m in METRICS))
+    for idx, turn in enumerate(current, 1):
+        ref = reference[idx - 1] if idx - 1 < len(reference) else {}
+        cells = [
+            f"{_fmt(turn.get(m)):>8} ({_delta(turn.get(m), ref.get(m)):>9})"
+            for m in METRICS
+        ]
+        print(f"{idx:>4}  " + "  ".join(f"{c:>22}" for c in cells))
+
+
+async def main(argv: List[str]) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("recordings", nargs="+", help=".vrec files written with VOICE_RECORD_DIR")
+    parser.add_argument("--url", default=os.environ.get("VOICE_REPLAY_URL", DEFAULT_URL))
+    parser.add_argument("--speed", type=float, default=1.0, help="1 = original timing, 4 = four times faster")
+    parser.add_argument("--turn-timeout", type=float, default=90.0)
+    parser.add_argument("--settle", type=float, default=1.0, help="seconds of silence that end a spoken answer")
+    parser.add_argument("--report", help="write replayed latencies to this JSON file")
+    parser.add_argument("--baseline", help="compare against a report from another build")
+    args = parser.parse_args(argv)
+
+    baseline: Dict[str, Any] = {}
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+
+    report: Dict[str, Any] = {}
+    for path in args.recordings:
+        name = os.path.basename(path)
+        print(f"Replaying {name} at {args.speed}x against {args.url} ...")
+        result = await replay_session(path, args.url, args.speed, args.turn_timeout, args.settle)
+        report[name] = result["replayed"]
+
+        if name in baseline:
+            print_comparison(name, result["replayed"], baseline[name], "baseline")
+        else:
+            print_comparison(name, result["replayed"], result["recorded"], "recording")
+
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nReport written to {args.report}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main(sys.argv[1:])))
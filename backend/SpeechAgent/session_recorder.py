@@ -0,0 +1,185 @@
+# session_recorder.py
+"""
+Opt-in record/replay format for /ws/voice sessions.
+
+Set VOICE_RECORD_DIR to have voice_bridge write one .vrec file per session.
+replay_sessions.py feeds those files back into a running server.
+
+File layout (little-endian):
+    header:  b"VREC" | u8 version | u32 sample_rate | f64 started_at (unix seconds)
+    records: u8 kind | u32 t_ms (since started_at) | u32 payload_len | payload
+
+Incoming audio is stored verbatim so it can be replayed. Outgoing audio is only
+stored as its byte count: replay needs its timing, not its content, and this
+keeps files small.
+"""
+import os
+import time
+import json
+import struct
+from dataclasses import dataclass
+from typing import Any, BinaryIO, Dict, Iterator, List, Optional, Tuple
+from uuid import uuid4
+
+MAGIC = b"VREC"
+FORMAT_VERSION = 1
+
+_HEADER = struct.Struct("<4sBId")
+_RECORD = struct.Struct("<BII")
+_AUDIO_OUT_LEN = struct.Struct("<I")
+
+# Record kinds
+AUDIO_IN = 1   # PCM16 chunk from the browser
+TURN_END = 2   # zero-length "stop speaking" marker from the browser
+EVENT_OUT = 3  # JSON text event sent to the browser (kb_result, ...)
+AUDIO_OUT = 4  # audio chunk sent to the browser (payload: u32 byte count)
+QUESTION_IN = 5  # typed question from a text input session (UTF-8); starts a turn like TURN_END
+
+
+@dataclass
+class Record:
+    kind: int
+    t_ms: int
+    payload: bytes
+
+    def event(self) -> Dict[str, Any]:
+        """
+        Decode an EVENT_OUT payload (empty dict for anything unparseable).
+        """
+        try:
+            return json.loads(self.payload.decode("utf-8"))
+        except (UnicodeDecodeError, json.JSONDecodeError):
+            return {}
+
+    def audio_out_bytes(self) -> int:
+        return _AUDIO_OUT_LEN.unpack(self.payload)[0] if len(self.payload) == 4 else 0
+
+
+class SessionRecorder:
+    """
+    Appends records for one voice session. Writes are buffered; the file is
+    flushed on every turn marker so a crash loses at most the current turn.
+    """
+
+    def __init__(self, path: str, sample_rate: int):
+        self.path = path
+        self._started = time.monotonic()
+        self._file: Optional[BinaryIO] = open(path, "wb")
+        self._file.write(_HEADER.pack(MAGIC, FORMAT_VERSION, sample_rate, time.time()))
+
+    @classmethod
+    def from_env(cls, sample_rate: int) -> Optional["SessionRecorder"]:
+        """
+        Start a recorder if VOICE_RECORD_DIR is set, otherwise return None.
+        """
+        directory = os.environ.get("VOICE_RECORD_DIR")
+        if not directory:
+            return None
+        os.makedirs(directory, exist_ok=True)
+        name = time.strftime("%Y%m%d-%H%M%S") + f"-{uuid4().hex[:6]}.vrec"
+        return cls(os.path.join(directory, name), sample_rate)
+
+    def _write(self, kind: int, payload: bytes = b""):
+        if self._file is None:
+            return
+        t_ms = int((time.monotonic() - self._started) * 1000)
+        self._file.write(_RECORD.pack(kind, t_ms, len(payload)))
+        if payload:
+            self._file.write(payload)
+
+    def audio_in(self, chunk: bytes):
+        self._write(AUDIO_IN, chunk)
+
+    def turn_end(self):
+        self._write(TURN_END)
+        if self._file is not None:
+            self._file.flush()
+
+    def question_in(self, question: str):
+        self._write(QUESTION_IN, question.encode("utf-8"))
+        if self._file is not None:
+            self._file.flush()
+
+    def event_out(self, text: str):
+        self._write(EVENT_OUT, text.encode("utf-8"))
+
+    def audio_out(self, n_bytes: int):
+        self._write(AUDIO_OUT, _AUDIO_OUT_LEN.pack(n_bytes))
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+            print(f"[REC] Session written to {self.path}")
+
+
+def read_session(path: str) -> Tuple[int, List[Record]]:
+    """
+    Load a .vrec file. Returns (sample_rate, records).
+    A truncated trailing record (e.g. server killed mid-write) is dropped.
+    """
+    with open(path, "rb") as f:
+        data = f.read()
+
+    magic, version, sample_rate, _ = _HEADER.unpack_from(data, 0)
+    if magic != MAGIC:
+        raise ValueError(f"{path} is not a voice session recording")
+    if version != FORMAT_VERSION:
+        raise ValueError(f"{path}: unsupported recording version {version}")
+
+    records: List[Record] = []
+    offset = _HEADER.size
+    while offset + _RECORD.size <= len(data):
+        kind, t_ms, length = _RECORD.unpack_from(data, offset)
+        offset += _RECORD.size
+        if offset + length > len(data):
+            break
+        records.append(Record(kind, t_ms, data[offset:offset + length]))
+        offset += length
+    return sample_rate, records
+
+
+def iter_turns(records: List[Record]) -> Iterator[List[Record]]:
+    """
+    Split records into turns; each turn ends with (and includes) its TURN_END,
+    or is a single QUESTION_IN. Trailing audio with no TURN_END is not a turn
+    and is dropped.
+    """
+    current: List[Record] = []
+    for record in records:
+        if record.kind in (AUDIO_IN, TURN_END, QUESTION_IN):
+            current.append(record)
+        if record.kind in (TURN_END, QUESTION_IN):
+            yield current
+            current = []
+
+
+def turn_latencies(records: List[Record]) -> List[Dict[str, Optional[int]]]:
+    """
+    Per-turn latencies (ms after the TURN_END marker or typed question) as observed in a recording:
+    transcript event, final answer/error event, and first audio chunk after it.
+    """
+    turns: List[Dict[str, Optional[int]]] = []
+    current: Optional[Dict[str, Optional[int]]] = None
+    turn_start = 0
+
+    for record in records:
+        if record.kind in (TURN_END, QUESTION_IN):
+            current = {"stt_ms": None, "answer_ms": None, "first_audio_ms": None}
+            turns.append(current)
+            turn_start = record.t_ms
+            continue
+        if current is None:
+            continue
+
+        if record.kind == EVENT_OUT:
+            event = record.event()
+            if "transcript" in event and current["stt_ms"] is None:
+                current["stt_ms"] = record.t_ms - turn_start
+            if (event.get("status") == "done" or "error" in event) and current["answer_ms"] is None:
+                current["answer_ms"] = record.t_ms - turn_start
+        elif record.kind == AUDIO_OUT:
+            if current["answer_ms"] is not None and current["first_audio_ms"] is None:
+                current["first_audio_ms"] = record.t_ms - turn_start
+
+    return turns
@@ -0,0 +1,203 @@
+# voice_protocol.py
+"""
+Wire protocols for /ws/voice.
+
+v1 (default, unchanged): client sends raw PCM16 binary messages and a zero-length
+binary message as "end of turn"; server sends JSON text events and raw PCM16 audio.
+
+v2 (negotiated with ?protocol=2 or the "voice.v2" websocket subprotocol): every
+message in both directions is a binary frame with an 8-byte little-endian header
+
+    u8 version (=2) | u8 type | u16 flags | u32 seq
+
+followed by the payload. `seq` counts frames per direction, starting at 0.
+
+    AUDIO     client -> server  PCM16 mono, 24 kHz; may batch many capture frames
+    END_TURN  client -> server  empty; process the buffered audio
+    CANCEL    client -> server  empty; drop the buffered audio / cancel the running turn
+    CONTROL   both ways         compact JSON (waiting_room, mode, ...)
+    RESULT    server -> client  compact JSON kb_result events
+    AUDIO_OUT server -> client  PCM16 mono, 24 kHz answer audio
+    QUESTION  client -> server  UTF-8 typed question (text input sessions)
+
+Independently of the version, each session picks its input and output modes
+with ?input=audio|text&output=audio|text (default audio for both), for clients
+on networks too slow to stream PCM:
+
+    input=text   the client types questions instead of speaking: QUESTION frames
+                 in v2, {"type": "question", "text": "..."} text messages in v1.
+                 Speech-to-text is skipped; audio from the client is ignored.
+    output=text  answers arrive only as kb_result events; no spoken greeting or
+                 answers, so no audio is sent at all.
+
+The server confirms the modes it applied with a {"type": "session", ...} event.
+"""
+import json
+import struct
+from typing import Any, Dict, NamedTuple, Optional
+
+from fastapi import WebSocket
+
+PROTOCOL_V1 = 1
+PROTOCOL_V2 = 2
+V2_SUBPROTOCOL = "voice.v2"
+
+HEADER = struct.Struct("<BBHI")
+
+AUDIO = 0x01
+END_TURN = 0x02
+CANCEL = 0x03
+CONTROL = 0x04
+RESULT = 0x05
+AUDIO_OUT = 0x06
+QUESTION = 0x07
+
+FRAME_NAMES = {
+    AUDIO: "audio",
+    END_TURN: "end_turn",
+    CANCEL: "cancel",
+    CONTROL: "control",
+    RESULT: "result",
+    AUDIO_OUT: "audio_out",
+    QUESTION: "question",
+}
+
+MODE_AUDIO = "audio"
+MODE_TEXT = "text"
+SESSION_MODES = (MODE_AUDIO, MODE_TEXT)
+
+
+class ProtocolError(ValueError):
+    pass
+
+
+class Frame(NamedTuple):
+    type: int
+    flags: int
+    seq: int
+    payload: bytes
+
+
+def negotiate(ws: WebSocket) -> tuple:
+    """
+    Pick the protocol for a new connection -> (version, subprotocol to accept or None).
+    """
+    offered = [p.strip() for p in ws.headers.get("sec-websocket-protocol", "").split(",") if p.strip()]
+    if V2_SUBPROTOCOL in offered:
+        return PROTOCOL_V2, V2_SUBPROTOCOL
+    if ws.query_params.get("protocol") == "2":
+        return PROTOCOL_V2, None
+    return PROTOCOL_V1, None
+
+
+def negotiate_modes(ws: WebSocket) -> tuple:
+    """
+    Input/output modes for a new connection -> (input_mode, output_mode).
+    Missing or unknown values fall back to audio.
+    """
+    modes = []
+    for name in ("input", "output"):
+        value = ws.query_params.get(name, MODE_AUDIO)
+        modes.append(value if value in SESSION_MODES else MODE_AUDIO)
+    return tuple(modes)
+
+
+def parse_v1_question(text: Optional[str]) -> Optional[str]:
+    """
+    The question in a v1 {"type": "question", "text": ...} text message, else None.
+    """
+    try:
+        message = json.loads(text or "")
+    except json.JSONDecodeError:
+        return None
+    if not isinstance(message, dict) or message.get("type") != "question":
+        return None
+    question = message.get("text")
+    return question if isinstance(question, str) else None
+
+
+def encode_frame(frame_type: int, seq: int, payload: bytes = b"", flags: int = 0) -> bytes:
+    return HEADER.pack(PROTOCOL_V2, frame_type, flags, seq & 0xFFFFFFFF) + payload
+
+
+def encode_json(data: Dict[str, Any]) -> bytes:
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":"), default=str).encode("utf-8")
+
+
+def decode_frame(data: bytes) -> Frame:
+    if len(data) < HEADER.size:
+        raise ProtocolError(f"frame too short ({len(data)} bytes)")
+    version, frame_type, flags, seq = HEADER.unpack_from(data)
+    if version != PROTOCOL_V2:
+        raise ProtocolError(f"unsupported frame version {version}")
+    if frame_type not in FRAME_NAMES:
+        raise ProtocolError(f"unknown frame type {frame_type}")
+    return Frame(frame_type, flags, seq, data[HEADER.size:])
+
+
+class SeqTracker:
+    """
+    Per-connection inbound sequence check: drops replayed/out-of-order frames and
+    counts gaps (frames the client sent that never arrived).
+    """
+
+    def __init__(self):
+        self.expected = 0
+        self.gaps = 0
+        self.stale = 0
+
+    def accept(self, seq: int) -> bool:
+        if seq < self.expected:
+            self.stale += 1
+            return False
+        if seq > self.expected:
+            self.gaps += seq - self.expected
+        self.expected = seq + 1
+        return True
+
+
+class ProtocolStats:
+    """
+    Process-wide message counters per protocol version, for /stats.
+    """
+
+    def __init__(self):
+        self.sessions = {PROTOCOL_V1: 0, PROTOCOL_V2: 0}
+        self.messages_in = {PROTOCOL_V1: 0, PROTOCOL_V2: 0}
+        self.audio_bytes_in = {PROTOCOL_V1: 0, PROTOCOL_V2: 0}
+        self.modes: Dict[str, int] = {}
+        self.typed_questions = 0
+        self.protocol_errors = 0
+        self.seq_gaps = 0
+        self.cancels = 0
+
+    def session_started(self, version: int, input_mode: str, output_mode: str):
+        self.sessions[version] += 1
+        key = f"{input_mode}_in/{output_mode}_out"
+        self.modes[key] = self.modes.get(key, 0) + 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        out: Dict[str, Any] = {}
+        for version in (PROTOCOL_V1, PROTOCOL_V2):
+            messages = self.messages_in[version]
+            out[f"v{version}"] = {
+                "sessions": self.sessions[version],
+                "messages_in": messages,
+                "audio_bytes_in": self.audio_bytes_in[version],
+                "avg_bytes_per_message": round(self.audio_bytes_in[version] / messages) if messages else None,
+            }
+        out.update(
+            modes=dict(self.modes),
+            typed_questions=self.typed_questions,
+            protocol_errors=self.protocol_errors,
+            seq_gaps=self.seq_gaps,
+            cancels=self.cancels,
+        )
+        return out
+
+
+PROTOCOL_STATS = ProtocolStats()
+
+
+def frame_name(frame_type: Optional[int]) -> str:
+    return FRAME_NAMES.get(frame_type, str(frame_type))
@@ -1,12 +1,40 @@
 # main.py
 import os
-from typing import List, Optional
+import sys
+import json
+import asyncio
+import itertools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
 from enum import Enum
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 from dotenv import load_dotenv
-from openai import OpenAI
+
+from quiz_jobs import JobFallback, JobStore, QueueFull, QuizJobQueue, dedupe_key
+from kb_modules import module_filter, retrieve_module_passages
+from quiz_bank import load_quiz_bank
+from quiz_kb_index import load_index, question_key
+from reflection_prescore import prescore
+
+# Make the shared backend/common package importable when running from this directory.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from common.cache import TTLCache
+from common.model_router import ModelRouter, Tier, expand_budget
+from common.kb import AssistantRunError, OutputTruncated, create_kb_assistant, parse_json_answer, run_assistant
+from common.openai_client import (
+    TRANSPORT_STATS,
+    async_client_for_stage,
+    client_for_stage,
+    get_async_openai_client,
+    get_openai_client,
+)
+from common.prompts import PROMPT_CACHE_STATS, build_prompt
+from common.resilience import CircuitBreaker, CircuitOpenError, Hedger, resilience_snapshot
+from common.single_flight import SingleFlight, question_flight_key
 
 load_dotenv()
 
@@ -18,9 +46,52 @@ if not OPENAI_API_KEY:
 if not VECTOR_STORE_ID:
     raise RuntimeError("VECTOR_STORE_ID missing in .env (run ingest_kb.py first)")
 
-client = OpenAI(api_key=OPENAI_API_KEY)
+# Bump KB_VERSION when the vector store content changes in place, so coalesced
+# requests never share answers across KB versions.
+KB_VERSION = os.getenv("KB_VERSION") or VECTOR_STORE_ID
+ASK_TIMEOUT_SECONDS = float(os.getenv("ASK_TIMEOUT_SECONDS", "60"))
+
+# One pooled client per process; stage clients share its connections but carry
+# their own timeouts (see common/openai_client.py).
+client = get_openai_client(OPENAI_API_KEY)
+rag_client = client_for_stage("rag")
+analysis_client = client_for_stage("analysis")
+get_async_openai_client(OPENAI_API_KEY)
+async_rag_client = async_client_for_stage("rag")
+async_analysis_client = async_client_for_stage("analysis")
 app = FastAPI()
 
+# Created on first use and reused; the instructions never change between requests.
+_quiz_assistant_id: Optional[str] = os.getenv("QUIZ_ASSISTANT_ID")
+
+# Identical concurrent /ask questions share one upstream call.
+ask_flights = SingleFlight("ask")
+
+# Picks model + output budget per request from the tier table (common/model_router.py).
+model_router = ModelRouter.from_env()
+
+# Precomputed KB passages per quiz question (built offline by quiz_kb_index.py).
+QUIZ_KB_INDEX = load_index(vector_store_id=VECTOR_STORE_ID, kb_version=KB_VERSION)
+
+# The fixed quiz banks indexed by question ID (quiz_bank.py), for compact /analyze-quiz submissions.
+QUIZ_BANK = load_quiz_bank()
+
+# Analyses of quiz bank submissions, keyed by which questions were missed (+ preferences, module).
+quiz_result_cache = TTLCache(
+    max_entries=1000, ttl_seconds=float(os.getenv("QUIZ_RESULT_CACHE_TTL_SECONDS", "86400"))
+)
+
+# Runs the per-question module-scoped vector store searches in parallel.
+retrieval_pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix="kb-search")
+
+# Tail-latency hedging + fail-fast breakers for the upstream calls (common/resilience.py).
+# Quiz analyses can run for minutes on the Assistants API, so they get a breaker but no hedge.
+ask_hedger = Hedger("ask")
+ask_breaker = CircuitBreaker("ask")
+quiz_breaker = CircuitBreaker("quiz_analysis")
+reflection_hedger = Hedger("reflection_analysis")
+reflection_breaker = CircuitBreaker("reflection_analysis")
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -29,6 +100,22 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.get("/stats")
+async def stats():
+    """
+    Process-local counters for tuning (prompt cache hit ratios, request coalescing, connection reuse, model routing, ...).
+    """
+    return {
+        "prompt_cache": PROMPT_CACHE_STATS.snapshot(),
+        "coalescing": {"ask": ask_flights.snapshot()},
+        "transport": TRANSPORT_STATS.snapshot(),
+        "routing": model_router.snapshot(),
+        "quiz_jobs": quiz_jobs.snapshot(),
+        "quiz_results": {"bank_questions": len(QUIZ_BANK), **quiz_result_cache.snapshot()},
+        "resilience": resilience_snapshot(),
+    }
+
+
 class QuestionRequest(BaseModel):
     question: str
 
@@ -49,6 +136,12 @@ class QuizQuestion(BaseModel):
     user_answer: bool
 
 
+class QuizAnswer(BaseModel):
+    # "id" of a question in the server-side quiz bank (see quiz_bank.py)
+    question_id: str
+    # 0-based index of the chosen option in the question's answerOptions
+    choice: int
+
 
 # Personalization Enums
 class UnderstandingStyle(str, Enum):
@@ -83,8 +176,15 @@ class UserPreferences(BaseModel):
 
 
 class QuizAnalysisRequest(BaseModel):
-    quiz: List[QuizQuestion]
+    # Full questions, for quizzes that aren't in the quiz bank
+    quiz: List[QuizQuestion] = []
+    # Compact alternative to `quiz`: the chosen option per quiz bank question
+    answers: Optional[List[QuizAnswer]] = None
     preferences: Optional[UserPreferences] = None
+    # Lets /analyze-quiz/jobs attach duplicate submissions from the same student to one job
+    student_id: Optional[str] = None
+    # Course module the quiz belongs to; scopes KB retrieval to that module's documents
+    module_number: Optional[int] = None
 
 
 class PerQuestionExplanation(BaseModel):
@@ -103,64 +203,171 @@ class PerQuestionExplanation(BaseModel):
 class QuizAnalysisResponse(BaseModel):
     per_question: List[PerQuestionExplanation]
     overall_summary: str
+    # True when the model analysis was unavailable and these are the quiz's own rationales
+    fallback: bool = False
+
+
+ASK_SYSTEM_PROMPT = (
+    "You are an assistant that ONLY answers using "
+    "the knowledge from the attached files. "
+    "If something is not covered, reply exactly with: "
+    "'I don’t know based on the current knowledge base.'"
+)
+
+
+def _ask_request_kwargs(question: str, tier: Tier) -> dict:
+    """
+    responses.create() arguments shared by /ask and /ask/stream.
+    """
+    return dict(
+        model=tier.model,
+        max_output_tokens=tier.max_output_tokens,
+        input=[
+            {
+                "role": "system",
+                "content": [{"type": "input_text", "text": ASK_SYSTEM_PROMPT}],
+            },
+            {
+                "role": "user",
+                "content": [{"type": "input_text", "text": question}],
+            },
+        ],
+        # The Responses API takes the vector store on the tool itself (no tool_resources).
+        tools=[{"type": "file_search", "vector_store_ids": [VECTOR_STORE_ID]}],
+    )
+
+
+def _citation_from_annotation(annotation) -> dict:
+    raw = annotation if isinstance(annotation, dict) else annotation.model_dump()
+    return json.loads(json.dumps(raw, ensure_ascii=False, default=str))
+
+
+async def _ask_kb(question: str) -> str:
+    """
+    Answer a question from the KB only. Uses the async client so that cancelling
+    the task (e.g. a losing hedge) aborts the HTTP request as well.
+    """
+    tier = model_router.route("ask", text_length=len(question))
+    response = await _ask_response(question, tier)
+    if _ask_truncated(response):
+        # The fast tier's budget is small; retry once on the next tier up.
+        retry_tier = model_router.escalate(tier)
+        print(f"[Router] ask truncated, retrying on {retry_tier.name} ({retry_tier.max_output_tokens} tokens)")
+        response = await _ask_response(question, retry_tier)
+        if _ask_truncated(response):
+            print("[Router] ask still truncated, returning the partial answer")
+
+    # output[0] is usually the file_search call; output_text joins all message text.
+    return (response.output_text or "").strip()
+
+
+async def _ask_response(question: str, tier: Tier):
+    with model_router.track(tier):
+        response = await async_rag_client.responses.create(**_ask_request_kwargs(question, tier))
+    PROMPT_CACHE_STATS.record("ask", getattr(response, "usage", None))
+    return response
+
+
+def _ask_truncated(response) -> bool:
+    details = getattr(response, "incomplete_details", None)
+    return (
+        getattr(response, "status", None) == "incomplete"
+        and getattr(details, "reason", None) == "max_output_tokens"
+    )
 
 
 @app.post("/ask", response_model=AnswerResponse)
 async def ask(req: QuestionRequest):
     try:
-        response = client.responses.create(
-            model="gpt-5.1-mini",
-            input=[
-                {
-                    "role": "system",
-                    "content": [
-                        {
-                            "type": "input_text",
-                            "text": (
-                                "You are an assistant that ONLY answers using "
-                                "the knowledge from the attached files. "
-                                "If something is not covered, reply exactly with: "
-                                "'I don’t know based on the current knowledge base.'"
-                            ),
-                        }
-                    ],
-                },
-                {
-                    "role": "user",
-                    "content": [
-                        {"type": "input_text", "text": req.question}
-                    ],
-                },
-            ],
-            tools=[{"type": "file_search"}],
-            tool_resources={
-                "file_search": {
-                    "vector_store_ids": [VECTOR_STORE_ID]
-                }
-            },
+        # Concurrent identical questions (e.g. a whole class asking the same thing) share one call.
+        # The breaker wraps only that shared call, so it sees one outcome per upstream call.
+        answer = await ask_flights.do(
+            question_flight_key(req.question, KB_VERSION),
+            lambda: ask_breaker.call(
+                lambda: ask_hedger.run(lambda: _ask_kb(req.question))
+            ),
+            timeout=ASK_TIMEOUT_SECONDS,
         )
-
-        # Extract answer text from response
-        content_items = response.output[0].content
-        answer_parts = [
-            c.text for c in content_items
-            if c.type == "output_text"
-        ]
-        answer = "\n".join(answer_parts).strip()
-
         return AnswerResponse(answer=answer)
 
+    except CircuitOpenError:
+        raise HTTPException(status_code=503, detail="The knowledge base is temporarily unavailable, please retry shortly")
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=504, detail="Timed out waiting for the knowledge base answer")
     except Exception as e:
         # For debugging, you can print(e)
         raise HTTPException(status_code=500, detail="Error talking to OpenAI")
 
-def build_style_instructions(prefs: Optional[UserPreferences]) -> str:
+def _ndjson(event: dict) -> bytes:
+    return (json.dumps(event, ensure_ascii=False) + "\n").encode("utf-8")
+
+
+@app.post("/ask/stream")
+async def ask_stream(req: QuestionRequest, request: Request):
     """
-    Convert UserPreferences into a plain English instruction block for the system prompt.
+    Streaming variant of /ask, as newline-delimited JSON:
+        {"type": "delta", "text": "..."}        as output text arrives
+        {"type": "done", "answer": "...", "citations": [...]}
+        {"type": "error", "detail": "..."}      if the upstream stream fails midway
+    If the client goes away, the upstream stream is closed, which cancels generation.
     """
-    if not prefs:
-        return ""
+    if not ask_breaker.allow():
+        raise HTTPException(status_code=503, detail="The knowledge base is temporarily unavailable, please retry shortly")
+
+    tier = model_router.route("ask", text_length=len(req.question))
+    try:
+        stream = await async_rag_client.responses.create(
+            **_ask_request_kwargs(req.question, tier), stream=True
+        )
+    except Exception as e:
+        ask_breaker.record_failure()
+        print(f"Error starting /ask/stream: {e}")
+        raise HTTPException(status_code=500, detail="Error talking to OpenAI")
+    ask_breaker.record_success()
+
+    async def events():
+        answer_parts: List[str] = []
+        citations: List[dict] = []
+        try:
+            with model_router.track(tier):
+                async for event in stream:
+                    if await request.is_disconnected():
+                        print("/ask/stream: client disconnected, cancelling upstream response")
+                        return
+
+                    if event.type == "response.output_text.delta":
+                        answer_parts.append(event.delta)
+                        yield _ndjson({"type": "delta", "text": event.delta})
+                    elif event.type == "response.output_text.annotation.added":
+                        citations.append(_citation_from_annotation(event.annotation))
+                    elif event.type == "response.completed":
+                        PROMPT_CACHE_STATS.record("ask", getattr(event.response, "usage", None))
+                    elif event.type in ("response.failed", "error"):
+                        yield _ndjson({"type": "error", "detail": "The answer could not be completed."})
+                        return
+
+            yield _ndjson(
+                {"type": "done", "answer": "".join(answer_parts).strip(), "citations": citations}
+            )
+        except Exception as e:
+            print(f"Error in /ask/stream: {e}")
+            yield _ndjson({"type": "error", "detail": "Error talking to OpenAI"})
+        finally:
+            # Runs on normal completion, on error, and when Starlette cancels the
+            # generator after a disconnect; closing the HTTP stream stops the upstream call.
+            await stream.close()
+
+    return StreamingResponse(
+        events(),
+        media_type="application/x-ndjson",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
+
+def _compile_style_instructions(prefs: UserPreferences) -> str:
+    """
+    Convert UserPreferences into a plain English instruction block for the system prompt.
+    """
     instructions = []
 
     # 1. Complexity
@@ -202,15 +409,410 @@ def build_style_instructions(prefs: Optional[UserPreferences]) -> str:
 
     return "STYLE INSTRUCTIONS (FOLLOW STRICTLY):\n- " + "\n- ".join(instructions)
 
-@app.post("/analyze-quiz", response_model=QuizAnalysisResponse)
-async def analyze_quiz(req: QuizAnalysisRequest):
+
+# Every preference combination is known up front, so compile each style block once at
+# import time. The same preferences then always produce byte-identical prompt text.
+_STYLE_PREFERENCE_FIELDS = (
+    ("complexity", ComplexityLevel),
+    ("understanding_style", UnderstandingStyle),
+    ("correction_style", CorrectionStyle),
+    ("start_with", StartWith),
+    ("visual_preference", VisualPreference),
+)
+
+STYLE_INSTRUCTIONS: Dict[tuple, str] = {
+    combo: _compile_style_instructions(
+        UserPreferences(**{name: value for (name, _), value in zip(_STYLE_PREFERENCE_FIELDS, combo)})
+    )
+    for combo in itertools.product(
+        *[[None, *enum_cls] for _, enum_cls in _STYLE_PREFERENCE_FIELDS]
+    )
+}
+
+
+def build_style_instructions(prefs: Optional[UserPreferences]) -> str:
+    """
+    Look up the precompiled instruction block for these preferences.
+    """
+    if not prefs:
+        return ""
+
+    key = tuple(getattr(prefs, name) for name, _ in _STYLE_PREFERENCE_FIELDS)
+    compiled = STYLE_INSTRUCTIONS.get(key)
+    return compiled if compiled is not None else _compile_style_instructions(prefs)
+
+def _run_quiz_assistant(analysis_query: str, tier: Tier) -> str:
+    """
+    Run the analysis query through the Assistants API with file_search over the
+    whole vector store and return the raw assistant text.
+    """
+    global _quiz_assistant_id
+
+    if not _quiz_assistant_id:
+        _quiz_assistant_id = create_kb_assistant(
+            analysis_client,
+            name="Quiz Teaching Assistant",
+            instructions=(
+                "You are an educational assistant that analyzes quiz performance and teaches concepts "
+                "using ONLY the attached knowledge base files. Always ground explanations in the KB and "
+                "follow the requested JSON output format exactly."
+            ),
+            # Only the assistant's default: every run passes its routed tier's model.
+            model=model_router.tiers["standard"].model,
+            vector_store_id=VECTOR_STORE_ID,
+        )
+
+    try:
+        with model_router.track(tier):
+            assistant_message = run_assistant(
+                analysis_client,
+                _quiz_assistant_id,
+                analysis_query,
+                max_wait_seconds=180,
+                poll_interval=2,
+                usage_label="analyze_quiz.assistant",
+                model=tier.model,
+                max_completion_tokens=tier.max_output_tokens,
+            )
+    except OutputTruncated:
+        raise
+    except AssistantRunError as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Assistant run did not complete successfully: {e}",
+        )
+
+    if assistant_message is None:
+        raise HTTPException(status_code=500, detail="Assistant returned no message")
+    return assistant_message.content[0].text.value
+
+
+def _run_quiz_with_passages(analysis_query: str, tier: Tier) -> str:
+    """
+    Answer the analysis query from KB passages already embedded in the prompt
+    (see quiz_kb_index.py). No retrieval tool call, so this is a single
+    deterministic chat completion.
+    """
+    with model_router.track(tier):
+        response = analysis_client.chat.completions.create(
+            model=tier.model,
+            messages=[
+                {
+                    "role": "system",
+                    "content": (
+                        "You are an educational assistant that analyzes quiz performance and teaches concepts "
+                        "using ONLY the knowledge base passages provided by the user. Always ground explanations "
+                        "in those passages and follow the requested JSON output format exactly."
+                    ),
+                },
+                {"role": "user", "content": analysis_query},
+            ],
+            temperature=0,
+            max_tokens=tier.max_output_tokens,
+            response_format={"type": "json_object"},
+        )
+    PROMPT_CACHE_STATS.record("analyze_quiz.passages", response.usage)
+    if response.choices[0].finish_reason == "length":
+        raise OutputTruncated(f"Quiz analysis hit max_tokens={tier.max_output_tokens}")
+    return response.choices[0].message.content.strip()
+
+
+def _quiz_completion(analysis_query: str, tier: Tier, use_passages: bool) -> str:
+    """
+    Raw model answer for a quiz analysis. Output cut off by the token budget is
+    retried once with double the budget; if that is cut off too, OutputTruncated
+    propagates (the caller falls back instead of failing on half a JSON object).
+    """
+    run = _run_quiz_with_passages if use_passages else _run_quiz_assistant
+    try:
+        return run(analysis_query, tier)
+    except OutputTruncated as e:
+        retry_tier = expand_budget(tier)
+        print(f"[Router] quiz_analysis truncated ({e}), retrying with {retry_tier.max_output_tokens} tokens")
+        return run(analysis_query, retry_tier)
+
+
+def _retrieve_module_entries(
+    questions: List[QuizQuestion],
+    entries: List[Optional[dict]],
+    module_number: int,
+) -> List[dict]:
+    """
+    Fill in index entries missing from the precomputed index with passages from
+    the module's own KB documents (one search per question, in parallel).
+    """
+
+    def fill(pair) -> dict:
+        question, entry = pair
+        if entry and entry.get("passages"):
+            return entry
+        correct = next((opt for opt in question.answerOptions if opt.isCorrect), None)
+        query = question.question + (f"\n{correct.text}" if correct else "")
+        return {"passages": retrieve_module_passages(rag_client, VECTOR_STORE_ID, query, module_number)}
+
+    return list(retrieval_pool.map(fill, zip(questions, entries)))
+
+
+def build_quiz_analysis_prompt(
+    style_prompt: str,
+    wrong_answers: List[QuizQuestion],
+    passage_entries: Optional[List[dict]] = None,
+) -> str:
+    """
+    Prompt for /analyze-quiz. With `passage_entries` (one per wrong question) the
+    KB passages are inlined; without them the assistant uses file_search.
+    Static instructions + schema come first (cacheable prefix), per-request content last.
+    """
+    # Describe all wrong answers with the correct answers/rationales
+    # so the model can generate targeted explanations.
+    wrong_blocks: List[str] = []
+    for idx, question in enumerate(wrong_answers, 1):
+        correct_answer = next(
+            (opt for opt in question.answerOptions if opt.isCorrect), None
+        )
+
+        block = [
+            f"Question {idx}:",
+            f"Text: {question.question}",
+            f"Correct answer: {correct_answer.text if correct_answer else 'N/A'}",
+            f"Correct rationale: {correct_answer.rationale if correct_answer else 'N/A'}",
+        ]
+        wrong_blocks.append("\n".join(block))
+
+    wrong_questions_section = (
+        "Here are the wrong questions with their correct answers and rationales:\n\n"
+        + "\n\n---\n\n".join(wrong_blocks)
+    )
+
+    if passage_entries is not None:
+        return build_prompt(
+            QUIZ_ANALYSIS_PASSAGES_PROMPT,
+            style_prompt,
+            wrong_questions_section,
+            "Here are the relevant knowledge base passages for these questions:\n\n"
+            f"{_format_kb_passages(passage_entries)}",
+        )
+    return build_prompt(QUIZ_ANALYSIS_FILE_SEARCH_PROMPT, style_prompt, wrong_questions_section)
+
+
+def _fallback_quiz_analysis(wrong_answers: List[QuizQuestion]) -> QuizAnalysisResponse:
+    """
+    Served while the quiz analysis breaker is open (or the analysis stays
+    truncated): the quiz's own rationales, no model call.
+    """
+    per_question: List[PerQuestionExplanation] = []
+    for idx, question in enumerate(wrong_answers, 1):
+        correct = next((opt for opt in question.answerOptions if opt.isCorrect), None)
+        per_question.append(
+            PerQuestionExplanation(
+                question_index=idx,
+                question=question.question,
+                correct_answer=correct.text if correct else "",
+                explanation=(correct.rationale if correct else "") or "",
+            )
+        )
+    return QuizAnalysisResponse(
+        per_question=per_question,
+        overall_summary=(
+            "Detailed feedback is temporarily unavailable, so here are the explanations from the quiz itself. "
+            "Review them and try the analysis again in a few minutes."
+        ),
+        fallback=True,
+    )
+
+
+def _format_kb_passages(entries: List[dict]) -> str:
+    """
+    Render precomputed index entries (one per wrong question) as a prompt section.
+    """
+    blocks: List[str] = []
+    for idx, entry in enumerate(entries, 1):
+        for passage in entry.get("passages", []):
+            blocks.append(
+                f"[Question {idx}] Source file: {passage.get('filename')}\n{passage.get('text', '')}"
+            )
+    return "\n\n---\n\n".join(blocks)
+
+
+def _build_quiz_analysis_response(
+    parsed: dict, wrong_answers: List[QuizQuestion]
+) -> QuizAnalysisResponse:
+    """
+    Map the assistant's JSON onto QuizAnalysisResponse, filling gaps from the request.
     """
-    Analyze quiz results:
+    raw_per_question = parsed.get("per_question", [])
+    overall_summary = parsed.get(
+        "overall_summary",
+        "Review the key concepts in the knowledge base related to these questions.",
+    )
+
+    per_question_explanations: List[PerQuestionExplanation] = []
+    for idx, item in enumerate(raw_per_question, 1):
+        # Fallbacks if fields are missing
+        q_idx = item.get("question_index", idx)
+        # Map back to the wrong_answers list if possible
+        q_obj = wrong_answers[q_idx - 1] if 0 < q_idx <= len(wrong_answers) else None
+        question_text = item.get(
+            "question",
+            q_obj.question if q_obj is not None else "",
+        )
+        explanation = item.get(
+            "explanation",
+            "Please review the relevant section in the knowledge base for more details.",
+        )
+        filename = item.get("filename")
+
+        # Extract correct answer from the question object
+        correct_answer_text = "N/A"
+        if q_obj is not None:
+            correct_option = next(
+                (opt for opt in q_obj.answerOptions if opt.isCorrect), None
+            )
+            if correct_option:
+                correct_answer_text = correct_option.text
+
+        per_question_explanations.append(
+            PerQuestionExplanation(
+                question_index=q_idx,
+                question=question_text,
+                correct_answer=correct_answer_text,
+                explanation=explanation,
+                filename=filename,
+            )
+        )
+
+    # If the assistant didn't return any per_question data, create generic entries
+    if not per_question_explanations:
+        for idx, q in enumerate(wrong_answers, 1):
+            # Extract correct answer
+            correct_option = next(
+                (opt for opt in q.answerOptions if opt.isCorrect), None
+            )
+            correct_answer_text = correct_option.text if correct_option else "N/A"
+
+            per_question_explanations.append(
+                PerQuestionExplanation(
+                    question_index=idx,
+                    question=q.question,
+                    correct_answer=correct_answer_text,
+                    explanation=(
+                        "Please review the relevant section in the knowledge base for this topic. "
+                        "The system could not generate a detailed explanation."
+                    ),
+                    filename=None,
+                )
+            )
+
+    return QuizAnalysisResponse(
+        per_question=per_question_explanations,
+        overall_summary=overall_summary,
+    )
+
+
+# Static part of the quiz analysis prompt. The per-request style block, wrong questions
+# and passages are appended after it by build_prompt() so the prefix stays cacheable.
+_QUIZ_ANALYSIS_TASK = (
+    "The user has answered some quiz questions incorrectly. For each wrong question, "
+    "you must generate a **comprehensive and helpful teaching explanation** that fully clarifies the concept. "
+    "Do NOT be constrained by length; explain as much as needed to ensure understanding.\n"
+    "If the user requested diagrams, you MUST include a valid mermaid.js block (e.g. ```mermaid graph ...```) "
+    "within the explanation string.\n"
+    "If STYLE INSTRUCTIONS are given below, follow them strictly.\n\n"
+    "1. Produce a JSON object with this exact structure:\n"
+    "{\n"
+    '  \"per_question\": [\n'
+    "    {\n"
+    "      \"question_index\": <number, 1-based index matching the order of the questions below>,\n"
+    "      \"question\": \"<the question text>\",\n"
+    "      \"explanation\": \"<detailed teaching explanation complying with style instructions>\",\n"
+    "      \"filename\": \"<name of the most relevant KB file (e.g., some_file.pdf)>\" // or null if unsure\n"
+    "    },\n"
+    "    ...\n"
+    "  ],\n"
+    "  \"overall_summary\": \"<summary of the main ideas the user should review, grounded in the KB>\"\n"
+    "}\n\n"
+    "2. Respond with JSON ONLY. Do not include any extra commentary or formatting.\n"
+)
+
+QUIZ_ANALYSIS_FILE_SEARCH_PROMPT = (
+    "You are an educational tutor that ONLY uses information from the attached knowledge base "
+    "files (accessed via file_search). Do NOT use any outside knowledge.\n\n"
+    + _QUIZ_ANALYSIS_TASK
+)
+
+QUIZ_ANALYSIS_PASSAGES_PROMPT = (
+    "You are an educational tutor that ONLY uses information from the knowledge base "
+    "passages included at the end of this prompt. Do NOT use any outside knowledge.\n\n"
+    + _QUIZ_ANALYSIS_TASK
+)
+
+
+# Quiz bank questions as models, built once; a submission only copies them with its user_answer.
+_BANK_QUESTIONS: Dict[str, QuizQuestion] = {
+    qid: QuizQuestion(question=entry["question"], answerOptions=entry["answerOptions"], user_answer=False)
+    for qid, entry in QUIZ_BANK.items()
+}
+
+
+def resolve_quiz(req: QuizAnalysisRequest) -> List[QuizQuestion]:
+    """
+    The submitted questions: `quiz` as sent, or `answers` looked up in the quiz
+    bank and marked right/wrong against the precomputed correct option.
+    Raises 400 for unknown question IDs or out-of-range choices.
+    """
+    if req.answers is None:
+        return req.quiz
+
+    questions: List[QuizQuestion] = []
+    for answer in req.answers:
+        entry = QUIZ_BANK.get(answer.question_id)
+        if entry is None:
+            raise HTTPException(status_code=400, detail=f"Unknown question ID: {answer.question_id}")
+        if not 0 <= answer.choice < len(entry["answerOptions"]):
+            raise HTTPException(
+                status_code=400, detail=f"Invalid choice {answer.choice} for question {answer.question_id}"
+            )
+        questions.append(
+            _BANK_QUESTIONS[answer.question_id].model_copy(
+                update={"user_answer": answer.choice == entry["correct_index"]}
+            )
+        )
+    return questions
+
+
+def _quiz_result_key(req: QuizAnalysisRequest) -> Optional[str]:
+    """
+    Cache key for a quiz bank submission: the analysis only depends on which
+    questions were missed (in order), the preferences, module and KB version.
+    None for full-payload submissions.
+    """
+    if req.answers is None:
+        return None
+    missed = [
+        a.question_id for a in req.answers if a.choice != QUIZ_BANK[a.question_id]["correct_index"]
+    ]
+    return dedupe_key(
+        {
+            "missed": missed,
+            "preferences": req.preferences.model_dump(mode="json") if req.preferences else None,
+            "module_number": req.module_number,
+            "kb_version": KB_VERSION,
+        }
+    )
+
+
+def run_quiz_analysis(req: QuizAnalysisRequest) -> QuizAnalysisResponse:
+    """
+    Analyze quiz results (blocking; shared by /analyze-quiz and the job workers):
     - Find questions the user got wrong (user_answer == False)
-    - Use the KB (via file_search) to generate:
+    - Use the KB to generate:
         * A short teaching explanation per wrong question
         * An overall summary of what the user should review
+    KB passages come from the precomputed quiz index, topped up with a search of
+    the quiz's module documents when `module_number` is given; if some question
+    still has none, the assistant retrieves them via file_search.
     All explanations must be grounded ONLY in the knowledge base files.
+    Quiz bank submissions (`answers`) are cached by the questions missed.
     """
     # Build personalization string
     style_prompt = build_style_instructions(req.preferences)
@@ -218,7 +820,7 @@ async def analyze_quiz(req: QuizAnalysisRequest):
     try:
         # Filter for wrong answers (where user_answer is False)
         wrong_answers: List[QuizQuestion] = [
-            q for q in req.quiz if q.user_answer is False
+            q for q in resolve_quiz(req) if q.user_answer is False
         ]
 
         if not wrong_answers:
@@ -231,187 +833,66 @@ async def analyze_quiz(req: QuizAnalysisRequest):
                 ),
             )
 
-        # Build a single prompt describing all wrong answers with the correct answers/rationales
-        # so the assistant can generate targeted explanations.
-        wrong_blocks: List[str] = []
-        for idx, question in enumerate(wrong_answers, 1):
-            correct_answer = next(
-                (opt for opt in question.answerOptions if opt.isCorrect), None
-            )
-
-            block = [
-                f"Question {idx}:",
-                f"Text: {question.question}",
-                f"Correct answer: {correct_answer.text if correct_answer else 'N/A'}",
-                f"Correct rationale: {correct_answer.rationale if correct_answer else 'N/A'}",
-            ]
-            wrong_blocks.append("\n".join(block))
-
-        wrong_questions_section = "\n\n---\n\n".join(wrong_blocks)
-
-        # Instruct the assistant to respond with a strict JSON object so we can parse it.
-        analysis_query = (
-            "You are an educational tutor that ONLY uses information from the attached knowledge base "
-            "files (accessed via file_search). Do NOT use any outside knowledge.\n\n"
-            f"{style_prompt}\n\n"
-            "The user has answered some quiz questions incorrectly. For each wrong question, "
-            "you must generate a **comprehensive and helpful teaching explanation** that fully clarifies the concept. "
-            "Do NOT be constrained by length; explain as much as needed to ensure understanding.\n"
-            "If the user requested diagrams, you MUST include a valid mermaid.js block (e.g. ```mermaid graph ...```) "
-            "within the explanation string.\n\n"
-            "Here are the wrong questions with their correct answers and rationales:\n\n"
-            f"{wrong_questions_section}\n\n"
-            "Now, using ONLY the knowledge from the attached files:\n"
-            "1. Produce a JSON object with this exact structure:\n"
-            "{\n"
-            '  \"per_question\": [\n'
-            "    {\n"
-            "      \"question_index\": <number, 1-based index matching the order above>,\n"
-            "      \"question\": \"<the question text>\",\n"
-            "      \"explanation\": \"<detailed teaching explanation complying with style instructions>\",\n"
-            "      \"filename\": \"<name of the most relevant KB file (e.g., some_file.pdf)>\" // or null if unsure\n"
-            "    },\n"
-            "    ...\n"
-            "  ],\n"
-            "  \"overall_summary\": \"<summary of the main ideas the user should review, grounded in the KB>\"\n"
-            "}\n\n"
-            "2. Respond with JSON ONLY. Do not include any extra commentary or formatting.\n"
+        cache_key = _quiz_result_key(req)
+        if cache_key:
+            cached = quiz_result_cache.get(cache_key)
+            if cached is not None:
+                return cached
+
+        # Use precomputed passages only if every wrong question has some; a partial
+        # hit would leave the model without grounding for the missing questions.
+        index_entries = [QUIZ_KB_INDEX.get(question_key(q.question)) for q in wrong_answers]
+        use_passages = all(entry and entry.get("passages") for entry in index_entries)
+
+        # Known module: fetch the missing passages from that module's documents only,
+        # instead of an assistant file_search across the whole store.
+        if not use_passages and module_filter(req.module_number):
+            try:
+                index_entries = _retrieve_module_entries(wrong_answers, index_entries, req.module_number)
+                use_passages = all(entry.get("passages") for entry in index_entries)
+            except Exception as e:
+                print(f"[KB] module {req.module_number} retrieval failed, using file_search: {e}")
+
+        analysis_query = build_quiz_analysis_prompt(
+            style_prompt, wrong_answers, index_entries if use_passages else None
         )
         print(f"DEBUG FULL PROMPT:\n{analysis_query}\n-------------------")
 
-        # Use Assistants API with file_search and the configured vector store
-        import time
-        import json
-
-        try:
-            assistant = client.beta.assistants.create(
-                name="Quiz Teaching Assistant",
-                instructions=(
-                    "You are an educational assistant that analyzes quiz performance and teaches concepts "
-                    "using ONLY the attached knowledge base files. Always ground explanations in the KB and "
-                    "follow the requested JSON output format exactly."
-                ),
-                model="gpt-4o-mini",
-                tools=[{"type": "file_search"}],
-                tool_resources={
-                    "file_search": {
-                        "vector_store_ids": [VECTOR_STORE_ID],
-                    }
-                },
-            )
-
-            thread = client.beta.threads.create()
-            client.beta.threads.messages.create(
-                thread_id=thread.id,
-                role="user",
-                content=analysis_query,
-            )
-
-            run = client.beta.threads.runs.create(
-                thread_id=thread.id,
-                assistant_id=assistant.id,
-            )
-
-            # Poll until the run is complete or times out
-            max_wait_seconds = 180
-            waited = 0
-            while run.status in ("queued", "in_progress") and waited < max_wait_seconds:
-                time.sleep(2)
-                waited += 2
-                run = client.beta.threads.runs.retrieve(
-                    thread_id=thread.id,
-                    run_id=run.id,
-                )
+        prefs = req.preferences
+        tier = model_router.route(
+            "quiz_analysis",
+            item_count=len(wrong_answers),
+            complexity=prefs.complexity.value if prefs and prefs.complexity else None,
+            brief=bool(prefs and prefs.understanding_style == UnderstandingStyle.SHORT),
+        )
 
-            if run.status != "completed":
-                detail = (
-                    run.last_error.message
-                    if getattr(run, "last_error", None)
-                    else f"Assistant run status: {run.status}"
-                )
-                raise HTTPException(
-                    status_code=500,
-                    detail=f"Assistant run did not complete successfully: {detail}",
-                )
+        # Fail fast while the upstream keeps failing, instead of waiting out its timeouts.
+        if not quiz_breaker.allow():
+            print("[Breaker] quiz_analysis open, returning quiz rationales")
+            return _fallback_quiz_analysis(wrong_answers)
 
-            # Get the latest message from the assistant
-            messages = client.beta.threads.messages.list(thread_id=thread.id)
-            # messages.data is typically in reverse chronological order
-            assistant_message = next(
-                (m for m in messages.data if m.role == "assistant"), messages.data[0]
-            )
-            answer_text = assistant_message.content[0].text.value
+        try:
+            try:
+                # Passages inlined -> one chat completion; otherwise the Assistants API
+                # with file_search over the configured vector store.
+                answer_text = _quiz_completion(analysis_query, tier, use_passages)
+            except OutputTruncated:
+                # The upstream answered, just too long even with the larger budget.
+                quiz_breaker.record_success()
+                print("[Router] quiz_analysis still truncated, returning quiz rationales")
+                return _fallback_quiz_analysis(wrong_answers)
+            except Exception:
+                quiz_breaker.record_failure()
+                raise
+            quiz_breaker.record_success()
 
             # Try to parse the JSON structure
-            parsed = json.loads(answer_text)
+            parsed = parse_json_answer(answer_text)
 
-            raw_per_question = parsed.get("per_question", [])
-            overall_summary = parsed.get(
-                "overall_summary",
-                "Review the key concepts in the knowledge base related to these questions.",
-            )
-
-            per_question_explanations: List[PerQuestionExplanation] = []
-            for idx, item in enumerate(raw_per_question, 1):
-                # Fallbacks if fields are missing
-                q_idx = item.get("question_index", idx)
-                # Map back to the wrong_answers list if possible
-                q_obj = wrong_answers[q_idx - 1] if 0 < q_idx <= len(wrong_answers) else None
-                question_text = item.get(
-                    "question",
-                    q_obj.question if q_obj is not None else "",
-                )
-                explanation = item.get(
-                    "explanation",
-                    "Please review the relevant section in the knowledge base for more details.",
-                )
-                filename = item.get("filename")
-                
-                # Extract correct answer from the question object
-                correct_answer_text = "N/A"
-                if q_obj is not None:
-                    correct_option = next(
-                        (opt for opt in q_obj.answerOptions if opt.isCorrect), None
-                    )
-                    if correct_option:
-                        correct_answer_text = correct_option.text
-
-                per_question_explanations.append(
-                    PerQuestionExplanation(
-                        question_index=q_idx,
-                        question=question_text,
-                        correct_answer=correct_answer_text,
-                        explanation=explanation,
-                        filename=filename,
-                    )
-                )
-
-            # If the assistant didn't return any per_question data, create generic entries
-            if not per_question_explanations:
-                for idx, q in enumerate(wrong_answers, 1):
-                    # Extract correct answer
-                    correct_option = next(
-                        (opt for opt in q.answerOptions if opt.isCorrect), None
-                    )
-                    correct_answer_text = correct_option.text if correct_option else "N/A"
-                    
-                    per_question_explanations.append(
-                        PerQuestionExplanation(
-                            question_index=idx,
-                            question=q.question,
-                            correct_answer=correct_answer_text,
-                            explanation=(
-                                "Please review the relevant section in the knowledge base for this topic. "
-                                "The system could not generate a detailed explanation."
-                            ),
-                            filename=None,
-                        )
-                    )
-
-            return QuizAnalysisResponse(
-                per_question=per_question_explanations,
-                overall_summary=overall_summary,
-            )
+            result = _build_quiz_analysis_response(parsed, wrong_answers)
+            if cache_key:
+                quiz_result_cache.set(cache_key, result)
+            return result
 
         except HTTPException:
             # Re-raise HTTP errors as-is so FastAPI can handle them
@@ -442,6 +923,92 @@ async def analyze_quiz(req: QuizAnalysisRequest):
         )
 
 
+@app.post("/analyze-quiz", response_model=QuizAnalysisResponse)
+async def analyze_quiz(req: QuizAnalysisRequest):
+    """
+    Synchronous analysis: the response arrives when the analysis is done.
+    Prefer /analyze-quiz/jobs for long quizzes or flaky connections.
+    """
+    return await asyncio.to_thread(run_quiz_analysis, req)
+
+
+# ============================================================
+# Background quiz analysis jobs
+# ============================================================
+
+# Longest a single GET may block waiting for a job to finish.
+JOB_MAX_WAIT_SECONDS = 30.0
+
+
+class QuizJobSubmitResponse(BaseModel):
+    job_id: str
+    status: str
+    # True when this submission attached to an existing job for the same student + quiz
+    deduplicated: bool = False
+
+
+class QuizJobStatusResponse(BaseModel):
+    job_id: str
+    status: str  # queued | running | done | failed
+    result: Optional[QuizAnalysisResponse] = None
+    error: Optional[str] = None
+
+
+def _run_quiz_job(request: dict) -> dict:
+    result = run_quiz_analysis(QuizAnalysisRequest(**request))
+    if result.fallback:
+        # Fail the job (keeping the rationales) so a resubmission retries the analysis.
+        raise JobFallback(result.model_dump(), "Quiz analysis unavailable, returned the quiz's own explanations")
+    return result.model_dump()
+
+
+quiz_jobs = QuizJobQueue(JobStore(), _run_quiz_job)
+
+
+@app.on_event("startup")
+async def _start_quiz_jobs():
+    await quiz_jobs.start()
+
+
+@app.on_event("shutdown")
+async def _stop_quiz_jobs():
+    await quiz_jobs.stop()
+
+
+@app.post("/analyze-quiz/jobs", response_model=QuizJobSubmitResponse, status_code=202)
+async def submit_quiz_analysis(req: QuizAnalysisRequest):
+    """
+    Queue a quiz analysis and return its job ID immediately.
+    Resubmitting the same quiz for the same student returns the existing job.
+    """
+    resolve_quiz(req)  # reject unknown question IDs now rather than in the job
+    request = req.model_dump(mode="json")
+    key = dedupe_key(request)
+    try:
+        job_id, deduplicated = quiz_jobs.submit(key, request)
+    except QueueFull:
+        raise HTTPException(status_code=503, detail="Quiz analysis queue is full, please retry shortly")
+
+    row = quiz_jobs.store.get(job_id)
+    return QuizJobSubmitResponse(job_id=job_id, status=row["status"], deduplicated=deduplicated)
+
+
+@app.get("/analyze-quiz/jobs/{job_id}", response_model=QuizJobStatusResponse)
+async def get_quiz_analysis(job_id: str, wait: float = 0):
+    """
+    Job status and, once done, the analysis. With ?wait=N (seconds, max 30) the
+    request long-polls until the job finishes or N seconds pass.
+    """
+    if quiz_jobs.store.get(job_id) is None:
+        raise HTTPException(status_code=404, detail="Unknown job ID")
+
+    await quiz_jobs.wait(job_id, min(max(wait, 0.0), JOB_MAX_WAIT_SECONDS))
+
+    row = quiz_jobs.store.get(job_id)
+    result = json.loads(row["result_json"]) if row["result_json"] else None
+    return QuizJobStatusResponse(job_id=job_id, status=row["status"], result=result, error=row["error"])
+
+
 # ============================================================
 # Academia Reflection Analysis Endpoint
 # ============================================================
@@ -461,6 +1028,10 @@ class ReflectionAnalysisResponse(BaseModel):
     rule_or_duty_breached: str
     score: float
     feedback: ReflectionFeedback
+    # True for the instant local pre-score; the LLM analysis replaces it
+    provisional: bool = False
+    # True when the LLM analysis was unavailable and this final answer is the local pre-score
+    fallback: bool = False
 
 
 class ReflectionRequest(BaseModel):
@@ -468,10 +1039,10 @@ class ReflectionRequest(BaseModel):
     student_response: str
 
 
+# Static instructions + schema only; the student's story is appended after this
+# prefix (see analyze_reflection) so the prefix stays identical between requests.
 REFLECTION_ANALYSIS_PROMPT = """You are a strict but fair tutor. Analyze the student's story about corruption.
-
-STUDENT'S STORY:
-{student_response}
+The story is given at the end of this prompt, after the schema.
 
 INSTRUCTIONS:
 1. Extract: actors, action, who benefited, who was harmed, what duty or rule was breached.
@@ -490,7 +1061,7 @@ INSTRUCTIONS:
    - One improved sentence the student could write
 
 Output ONLY valid JSON in the following schema:
-{{
+{
   "actors": ["person/role 1", "person/role 2"],
   "action": "description of the corrupt action",
   "benefit_receiver": "who benefited from the corruption",
@@ -498,60 +1069,127 @@ Output ONLY valid JSON in the following schema:
   "harm": ["harm 1", "harm 2"],
   "rule_or_duty_breached": "description of rule or duty violated",
   "score": 7.5,
-  "feedback": {{
+  "feedback": {
     "strengths": ["strength 1", "strength 2"],
     "missing_points": ["missing point 1", "missing point 2"],
     "improved_sentence": "An example of how the student could better express their analysis"
-  }}
-}}
+  }
+}
 """
 
 
+def _validate_reflection(req: ReflectionRequest):
+    if not req.student_response or len(req.student_response.strip()) < 20:
+        raise HTTPException(
+            status_code=400,
+            detail="Please provide a more detailed story (at least 20 characters).",
+        )
+
+
+def _prescore_reflection(story: str) -> tuple:
+    """
+    Local heuristic analysis (reflection_prescore.py) -> (response, low_effort_reason).
+    """
+    local = prescore(story)
+    low_effort = local.pop("low_effort")
+    response = ReflectionAnalysisResponse(provisional=True, **local)
+    if low_effort:
+        # Final answer for low-effort stories: keep the rubric honest and say what's missing.
+        response.score = min(response.score, 3.0)
+        response.feedback.missing_points = [low_effort] + response.feedback.missing_points[:1]
+        response.feedback.improved_sentence = (
+            "For example: \"The official asked for money in exchange for approving the permit, "
+            "which broke the official's duty to treat every applicant equally and cost honest applicants their place.\""
+        )
+        response.provisional = False
+    return response, low_effort
+
+
+@app.post("/analyze-reflection/prescore", response_model=ReflectionAnalysisResponse)
+async def prescore_reflection(req: ReflectionRequest):
+    """
+    Instant local pre-score (no upstream call). Shown while /analyze-reflection runs;
+    `provisional` is false only when the story was too low-effort for a full analysis.
+    """
+    _validate_reflection(req)
+    response, _ = _prescore_reflection(req.student_response)
+    return response
+
+
+async def _reflection_completion(prompt: str, tier: Tier):
+    """
+    Chat completion for a reflection analysis. Output cut off by the token budget
+    is retried once with double the budget; the caller checks finish_reason on
+    the result.
+    """
+    response = await _reflection_chat(prompt, tier)
+    if response.choices[0].finish_reason == "length":
+        retry_tier = expand_budget(tier)
+        print(f"[Router] reflection_analysis truncated, retrying with {retry_tier.max_output_tokens} tokens")
+        response = await _reflection_chat(prompt, retry_tier)
+    return response
+
+
+async def _reflection_chat(prompt: str, tier: Tier):
+    # Async client: cancelling a losing hedge aborts the request instead of
+    # leaving it running in a worker thread.
+    return await async_analysis_client.chat.completions.create(
+        model=tier.model,
+        messages=[
+            {
+                "role": "system",
+                "content": "You are an educational tutor that analyzes student reflections about corruption. Always respond with valid JSON only, no additional text.",
+            },
+            {
+                "role": "user",
+                "content": prompt,
+            },
+        ],
+        temperature=0.3,
+        max_tokens=tier.max_output_tokens,
+    )
+
+
 @app.post("/analyze-reflection", response_model=ReflectionAnalysisResponse)
 async def analyze_reflection(req: ReflectionRequest):
     """
     Analyze a student's reflection story about corruption.
     Uses GPT-4o-mini to extract corruption elements and provide educational feedback.
+    Low-effort stories are answered by the local pre-score without calling the model.
     """
-    import json
+    _validate_reflection(req)
 
-    if not req.student_response or len(req.student_response.strip()) < 20:
-        raise HTTPException(
-            status_code=400,
-            detail="Please provide a more detailed story (at least 20 characters).",
-        )
+    provisional, low_effort = _prescore_reflection(req.student_response)
+    if low_effort:
+        print(f"[Reflection] low-effort story answered locally: {low_effort}")
+        return provisional
 
     try:
-        prompt = REFLECTION_ANALYSIS_PROMPT.format(student_response=req.student_response)
-
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[
-                {
-                    "role": "system",
-                    "content": "You are an educational tutor that analyzes student reflections about corruption. Always respond with valid JSON only, no additional text.",
-                },
-                {
-                    "role": "user",
-                    "content": prompt,
-                },
-            ],
-            temperature=0.3,
-            max_tokens=1000,
+        prompt = build_prompt(
+            REFLECTION_ANALYSIS_PROMPT,
+            f"STUDENT'S STORY:\n{req.student_response}",
         )
 
+        tier = model_router.route("reflection_analysis", text_length=len(req.student_response))
+        try:
+            with model_router.track(tier):
+                response = await reflection_breaker.call(
+                    lambda: reflection_hedger.run(lambda: _reflection_completion(prompt, tier))
+                )
+        except CircuitOpenError:
+            # Fail fast with the local pre-score while the upstream keeps failing.
+            print("[Breaker] reflection_analysis open, returning the local pre-score")
+            return provisional.model_copy(update={"provisional": False, "fallback": True})
+
+        PROMPT_CACHE_STATS.record("analyze_reflection", response.usage)
+        if response.choices[0].finish_reason == "length":
+            print("[Router] reflection_analysis still truncated, returning the local pre-score")
+            return provisional.model_copy(update={"provisional": False, "fallback": True})
+
         answer_text = response.choices[0].message.content.strip()
-        
-        # Clean up potential markdown code blocks
-        if answer_text.startswith("```json"):
-            answer_text = answer_text[7:]
-        if answer_text.startswith("```"):
-            answer_text = answer_text[3:]
-        if answer_text.endswith("```"):
-            answer_text = answer_text[:-3]
-        answer_text = answer_text.strip()
-
-        parsed = json.loads(answer_text)
+
+        # Tolerates markdown code fences around the JSON
+        parsed = parse_json_answer(answer_text)
 
         return ReflectionAnalysisResponse(
             actors=parsed.get("actors", []),
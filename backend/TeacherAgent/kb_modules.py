@@ -0,0 +1,101 @@
+# kb_modules.py
+"""
+Module-scoped KB retrieval.
+
+The course PDFs are named Anti-Corruption_Module_<N>_<title>.pdf. Each file in
+the vector store carries a `module` attribute (set on upload by vector_store.py,
+or backfilled with `python vector_store.py --tag-modules`), so a search can be
+restricted to one module's documents with an attribute filter. When the module
+is unknown, has no files, or the filtered search comes back empty (e.g. an
+untagged store), retrieval falls back to the whole store.
+"""
+import os
+import re
+from typing import Any, Dict, List, Optional
+
+from quiz_kb_index import retrieve_passages
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+KB_DIR = os.path.join(BASE_DIR, "kb")
+
+MODULE_FILE_RE = re.compile(r"^Anti-Corruption_Module_(\d+)_", re.IGNORECASE)
+
+
+def module_for_filename(filename: str) -> Optional[int]:
+    match = MODULE_FILE_RE.match(os.path.basename(filename or ""))
+    return int(match.group(1)) if match else None
+
+
+def module_attributes(filename: str) -> Dict[str, Any]:
+    """
+    Vector store file attributes for a KB file ({} for files outside any module).
+    """
+    module = module_for_filename(filename)
+    return {"module": module} if module is not None else {}
+
+
+def build_module_file_map(kb_dir: str = KB_DIR) -> Dict[int, List[str]]:
+    """
+    module number -> KB filenames, from the files in kb/.
+    """
+    mapping: Dict[int, List[str]] = {}
+    if not os.path.isdir(kb_dir):
+        return mapping
+    for name in sorted(os.listdir(kb_dir)):
+        module = module_for_filename(name)
+        if module is not None:
+            mapping.setdefault(module, []).append(name)
+    return mapping
+
+
+MODULE_FILES = build_module_file_map()
+
+
+def module_filter(module_number: Optional[int]) -> Optional[Dict[str, Any]]:
+    """
+    Attribute filter for one module, or None when the module has no KB files.
+    """
+    if module_number is None or module_number not in MODULE_FILES:
+        return None
+    return {"type": "eq", "key": "module", "value": module_number}
+
+
+def retrieve_module_passages(
+    client,
+    vector_store_id: str,
+    query: str,
+    module_number: Optional[int],
+    max_results: int = 3,
+) -> List[Dict[str, Any]]:
+    """
+    Top passages for `query` from the module's documents, falling back to the
+    full store when the module is unknown or the scoped search finds nothing.
+    """
+    filters = module_filter(module_number)
+    if filters:
+        passages = retrieve_passages(client, vector_store_id, query, filters=filters, max_results=max_results)
+        if passages:
+            return passages
+        print(f"[KB] no passages for module {module_number}, searching the full store")
+    return retrieve_passages(client, vector_store_id, query, max_results=max_results)
+
+
+def tag_vector_store_files(client, vector_store_id: str) -> int:
+    """
+    Backfill the `module` attribute on files already in the vector store.
+    Returns how many files were tagged.
+    """
+    tagged = 0
+    for vs_file in client.vector_stores.files.list(vector_store_id=vector_store_id, limit=100):
+        filename = client.files.retrieve(vs_file.id).filename
+        attributes = module_attributes(filename)
+        if not attributes or (vs_file.attributes or {}).get("module") == attributes["module"]:
+            continue
+        client.vector_stores.files.update(
+            vs_file.id,
+            vector_store_id=vector_store_id,
+            attributes={**(vs_file.attributes or {}), **attributes},
+        )
+        print(f"Tagged {filename} -> module {attributes['module']}")
+        tagged += 1
+    return tagged
@@ -0,0 +1,101 @@
+# quiz_bank.py
+"""
+Server-side copy of the fixed quiz banks (the same files quiz_kb_index.py reads).
+
+Loaded once at startup and indexed by question ID, with the correct option
+precomputed, so /analyze-quiz can take compact (question_id, choice)
+submissions instead of every question with all its options and rationales.
+
+Question IDs are stored in the quiz files themselves ("id" on each question)
+so the frontend can send them; a question without one gets the ID derived from
+its text. To add IDs to new questions after editing a quiz file:
+    python quiz_bank.py --write-ids
+"""
+import os
+import re
+import sys
+import json
+import hashlib
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from quiz_kb_index import QUIZ_SOURCES, question_key
+
+QUIZ_FILE_MODULE_RE = re.compile(r"quiz_module(\d+)\.json$")
+
+
+def question_id(question_text: str) -> str:
+    """
+    Stable ID for a question, from its normalized text.
+    """
+    return hashlib.sha1(question_key(question_text).encode("utf-8")).hexdigest()[:12]
+
+
+def _iter_source_questions(paths: Optional[List[str]] = None) -> Iterator[Tuple[Optional[int], Dict[str, Any]]]:
+    """
+    (module number or None, question dict) for every question in the quiz files.
+    """
+    for path in paths or QUIZ_SOURCES:
+        match = QUIZ_FILE_MODULE_RE.search(os.path.basename(path))
+        module_number = int(match.group(1)) if match else None
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        for quiz in [m.get("quiz", []) for m in data["modules"]] if "modules" in data else [data.get("quiz", [])]:
+            for question in quiz:
+                yield module_number, question
+
+
+def load_quiz_bank(paths: Optional[List[str]] = None) -> Dict[str, Dict[str, Any]]:
+    """
+    question ID -> {"id", "question", "answerOptions", "correct_index", "module_number"}.
+    Questions without a correct option are skipped.
+    """
+    bank: Dict[str, Dict[str, Any]] = {}
+    for module_number, question in _iter_source_questions(paths):
+        options = [
+            {"text": opt["text"], "isCorrect": bool(opt.get("isCorrect")), "rationale": opt.get("rationale", "")}
+            for opt in question.get("answerOptions", [])
+        ]
+        correct_index = next((i for i, opt in enumerate(options) if opt["isCorrect"]), None)
+        if correct_index is None:
+            continue
+        qid = question.get("id") or question_id(question["question"])
+        if qid in bank:
+            print(f"[QuizBank] duplicate question ID {qid}, keeping the first: {question['question'][:60]}")
+            continue
+        bank[qid] = {
+            "id": qid,
+            "question": question["question"],
+            "answerOptions": options,
+            "correct_index": correct_index,
+            "module_number": module_number,
+        }
+    return bank
+
+
+def write_ids(paths: Optional[List[str]] = None) -> int:
+    """
+    Insert an "id" line above every question that lacks one, keeping the
+    files' own formatting. Returns how many IDs were added.
+    """
+    question_line = re.compile(r'^(\s*)"question": (".*"),\s*$')
+    added = 0
+    for path in paths or QUIZ_SOURCES:
+        with open(path, "r", encoding="utf-8") as f:
+            lines = f.read().split("\n")
+        out: List[str] = []
+        for i, line in enumerate(lines):
+            match = question_line.match(line)
+            if match and not (out and out[-1].strip().startswith('"id":')):
+                out.append(f'{match.group(1)}"id": "{question_id(json.loads(match.group(2)))}",')
+                added += 1
+            out.append(line)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write("\n".join(out))
+    return added
+
+
+if __name__ == "__main__":
+    if "--write-ids" in sys.argv:
+        print(f"Added {write_ids()} question IDs")
+    bank = load_quiz_bank()
+    print(f"{len(bank)} questions in the quiz bank")
@@ -0,0 +1,275 @@
+# quiz_jobs.py
+"""
+Background jobs for long-running quiz analyses.
+
+Submitting returns a job ID immediately; a bounded pool of workers runs the
+analyses and persists results in SQLite, so a client that navigates away can
+poll (or long-poll) for the result later, and jobs survive a restart.
+Duplicate submissions (same student + same quiz + same preferences) attach to
+the existing job instead of starting a new one.
+"""
+import os
+import json
+import time
+import sqlite3
+import asyncio
+import hashlib
+import threading
+from typing import Any, Callable, Dict, Optional, Tuple
+from uuid import uuid4
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DB_PATH = os.getenv("QUIZ_JOBS_DB", os.path.join(BASE_DIR, "quiz_jobs.db"))
+WORKERS = int(os.getenv("QUIZ_JOB_WORKERS", "4"))
+QUEUE_MAX = int(os.getenv("QUIZ_JOB_QUEUE_MAX", "200"))
+# Finished jobs are kept (and reused for duplicate submissions) this long.
+RESULT_TTL_SECONDS = float(os.getenv("QUIZ_JOB_RESULT_TTL", str(24 * 3600)))
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+
+
+class QueueFull(Exception):
+    pass
+
+
+class JobFallback(Exception):
+    """
+    Raised by a handler that only produced a degraded result. The job is marked
+    failed, so it is never reused for duplicate submissions, but keeps `result`
+    for the client that is polling it.
+    """
+
+    def __init__(self, result: Dict[str, Any], reason: str):
+        super().__init__(reason)
+        self.result = result
+
+
+def dedupe_key(payload: Dict[str, Any]) -> str:
+    """
+    Stable key for "same student, same quiz answers, same preferences".
+    """
+    canonical = json.dumps(payload, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class JobStore:
+    """
+    SQLite persistence. All access is serialized through one lock; statements are
+    tiny so this is never the bottleneck.
+    """
+
+    def __init__(self, path: str = DB_PATH):
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        with self._lock, self._db:
+            self._db.execute(
+                """
+                CREATE TABLE IF NOT EXISTS quiz_jobs (
+                    id TEXT PRIMARY KEY,
+                    dedupe_key TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    request_json TEXT NOT NULL,
+                    result_json TEXT,
+                    error TEXT,
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL
+                )
+                """
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS idx_quiz_jobs_key ON quiz_jobs (dedupe_key)")
+
+    def find_reusable(self, key: str) -> Optional[sqlite3.Row]:
+        """
+        A queued/running job for this key, or a finished one still within its TTL.
+        Failed jobs are never reused so the student can retry.
+        """
+        with self._lock:
+            return self._db.execute(
+                """
+                SELECT * FROM quiz_jobs
+                WHERE dedupe_key = ?
+                  AND (status IN (?, ?) OR (status = ? AND updated_at > ?))
+                ORDER BY created_at DESC LIMIT 1
+                """,
+                (key, QUEUED, RUNNING, DONE, time.time() - RESULT_TTL_SECONDS),
+            ).fetchone()
+
+    def create(self, key: str, request: Dict[str, Any]) -> str:
+        job_id = uuid4().hex
+        now = time.time()
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT INTO quiz_jobs (id, dedupe_key, status, request_json, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (job_id, key, QUEUED, json.dumps(request, ensure_ascii=False), now, now),
+            )
+        return job_id
+
+    def update(self, job_id: str, status: str, result: Optional[Dict[str, Any]] = None, error: Optional[str] = None):
+        with self._lock, self._db:
+            self._db.execute(
+                "UPDATE quiz_jobs SET status = ?, result_json = ?, error = ?, updated_at = ? WHERE id = ?",
+                (
+                    status,
+                    json.dumps(result, ensure_ascii=False) if result is not None else None,
+                    error,
+                    time.time(),
+                    job_id,
+                ),
+            )
+
+    def get(self, job_id: str) -> Optional[sqlite3.Row]:
+        with self._lock:
+            return self._db.execute("SELECT * FROM quiz_jobs WHERE id = ?", (job_id,)).fetchone()
+
+    def unfinished(self) -> list:
+        with self._lock:
+            return self._db.execute(
+                "SELECT id, request_json FROM quiz_jobs WHERE status IN (?, ?) ORDER BY created_at",
+                (QUEUED, RUNNING),
+            ).fetchall()
+
+    def purge_expired(self):
+        with self._lock, self._db:
+            self._db.execute(
+                "DELETE FROM quiz_jobs WHERE status IN (?, ?) AND updated_at < ?",
+                (DONE, FAILED, time.time() - RESULT_TTL_SECONDS),
+            )
+
+
+class QuizJobQueue:
+    """
+    Bounded worker pool over an asyncio queue. `handler` is the blocking analysis
+    function (request dict -> result dict); it runs in a worker thread and any
+    exception it raises fails the job with str(exception) (or `detail` if present).
+    """
+
+    def __init__(self, store: JobStore, handler: Callable[[Dict[str, Any]], Dict[str, Any]], workers: int = WORKERS):
+        self.store = store
+        self.handler = handler
+        self.workers = workers
+        self._queue: "asyncio.Queue[Tuple[str, Dict[str, Any]]]" = asyncio.Queue(maxsize=QUEUE_MAX)
+        self._tasks: list = []
+        self._finished: Dict[str, asyncio.Event] = {}
+        # Jobs in the in-memory queue or running; the store may hold more
+        # queued jobs than the queue fits (see _fill_from_store).
+        self._in_memory: set = set()
+        self._store_backlog = False
+        self.submitted = 0
+        self.deduplicated = 0
+        self.completed = 0
+        self.failed = 0
+
+    async def start(self):
+        """
+        Start workers and re-enqueue jobs that were queued/running at shutdown.
+        """
+        self.store.purge_expired()
+        unfinished = self.store.unfinished()
+        for row in unfinished:
+            self.store.update(row["id"], QUEUED)
+        self._fill_from_store()
+        for n in range(self.workers):
+            self._tasks.append(asyncio.create_task(self._worker(n)))
+        print(
+            f"[Jobs] {self.workers} quiz analysis workers started "
+            f"({len(unfinished)} jobs resumed, {self._queue.qsize()} in the queue)"
+        )
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        self._tasks.clear()
+
+    def _enqueue(self, job_id: str, request: Dict[str, Any]):
+        self._finished.setdefault(job_id, asyncio.Event())
+        self._in_memory.add(job_id)
+        self._queue.put_nowait((job_id, request))
+
+    def _fill_from_store(self):
+        """
+        Move queued jobs from the store into the queue, oldest first, until it is
+        full. Whatever doesn't fit stays queued in the store and is pulled in as
+        workers free up room, so a large backlog at startup never overflows the queue.
+        """
+        for row in self.store.unfinished():
+            if row["id"] in self._in_memory:
+                continue
+            if self._queue.full():
+                self._store_backlog = True
+                return
+            self._enqueue(row["id"], json.loads(row["request_json"]))
+        self._store_backlog = False
+
+    def submit(self, key: str, request: Dict[str, Any]) -> Tuple[str, bool]:
+        """
+        Returns (job_id, deduplicated). Raises QueueFull when the backlog is full.
+        """
+        existing = self.store.find_reusable(key)
+        if existing is not None:
+            self.deduplicated += 1
+            return existing["id"], True
+
+        if self._queue.full():
+            raise QueueFull()
+
+        job_id = self.store.create(key, request)
+        self._enqueue(job_id, request)
+        self.submitted += 1
+        return job_id, False
+
+    async def _worker(self, n: int):
+        while True:
+            job_id, request = await self._queue.get()
+            try:
+                self.store.update(job_id, RUNNING)
+                try:
+                    result = await asyncio.to_thread(self.handler, request)
+                    self.store.update(job_id, DONE, result=result)
+                    self.completed += 1
+                except JobFallback as e:
+                    print(f"[Jobs] job {job_id} fell back: {e}")
+                    self.store.update(job_id, FAILED, result=e.result, error=str(e))
+                    self.failed += 1
+                except Exception as e:
+                    detail = getattr(e, "detail", None) or str(e)
+                    print(f"[Jobs] job {job_id} failed: {detail}")
+                    self.store.update(job_id, FAILED, error=str(detail))
+                    self.failed += 1
+            finally:
+                self._in_memory.discard(job_id)
+                event = self._finished.pop(job_id, None)
+                if event:
+                    event.set()
+                self._queue.task_done()
+                if self._store_backlog:
+                    self._fill_from_store()
+
+    async def wait(self, job_id: str, timeout: float):
+        """
+        Long-poll helper: return once the job finishes or `timeout` elapses.
+        """
+        event = self._finished.get(job_id)
+        if event is None:
+            # Still waiting in the store for room in the queue.
+            row = self.store.get(job_id)
+            if row is not None and row["status"] == QUEUED:
+                event = self._finished.setdefault(job_id, asyncio.Event())
+        if event is None or timeout <= 0:
+            return
+        try:
+            await asyncio.wait_for(event.wait(), timeout=timeout)
+        except asyncio.TimeoutError:
+            pass
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "workers": self.workers,
+            "queued": self._queue.qsize(),
+            "backlog_in_store": self._store_backlog,
+            "submitted": self.submitted,
+            "deduplicated": self.deduplicated,
+            "completed": self.completed,
+            "failed": self.failed,
+        }
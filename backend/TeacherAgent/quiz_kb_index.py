@@ -0,0 +1,195 @@
+# quiz_kb_index.py
+"""
+Offline build step for /analyze-quiz.
+
+Reads the fixed Academia and Debate quiz banks from the frontend, retrieves the
+most relevant KB passages for every question + correct answer from the vector
+store, and writes them to an index keyed by question. agent.py loads this index
+at startup and injects the passages directly instead of running file_search.
+
+Run from backend/TeacherAgent after the vector store exists:
+    python quiz_kb_index.py
+"""
+import os
+import re
+import json
+import datetime
+from typing import Any, Dict, Iterator, List, Optional
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+POLICY_WORLD_DIR = os.path.normpath(
+    os.path.join(BASE_DIR, "..", "..", "frontend", "src", "pages", "MapPage", "Policy_World")
+)
+
+# Quiz banks whose questions are fixed and therefore worth precomputing.
+QUIZ_SOURCES = [
+    os.path.join(POLICY_WORLD_DIR, "Academia", "Module1", "quiz_module1.json"),
+    os.path.join(POLICY_WORLD_DIR, "Academia", "quiz_module2.json"),
+    os.path.join(POLICY_WORLD_DIR, "Academia", "quiz_module3.json"),
+    os.path.join(POLICY_WORLD_DIR, "Academia", "quiz_module4.json"),
+    os.path.join(POLICY_WORLD_DIR, "Debate", "quiz.json"),
+]
+
+INDEX_PATH = os.environ.get(
+    "QUIZ_KB_INDEX_PATH", os.path.join(BASE_DIR, "kb_index", "quiz_passages.json")
+)
+
+# How many passages to keep per question, and how much text per passage.
+PASSAGES_PER_QUESTION = 3
+MAX_PASSAGE_CHARS = 1200
+
+
+def question_key(question_text: str) -> str:
+    """
+    Normalize a question so small whitespace/case differences between the
+    frontend payload and the quiz file still hit the same index entry.
+    """
+    return re.sub(r"\s+", " ", question_text or "").strip().lower()
+
+
+def iter_quiz_questions(paths: Optional[List[str]] = None) -> Iterator[Dict[str, Any]]:
+    """
+    Yield every question dict from the quiz files.
+    Handles both {"quiz": [...]} and {"modules": [{"quiz": [...]}, ...]} layouts.
+    """
+    for path in paths or QUIZ_SOURCES:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+
+        if "modules" in data:
+            for module in data["modules"]:
+                for question in module.get("quiz", []):
+                    yield question
+        else:
+            for question in data.get("quiz", []):
+                yield question
+
+
+def _correct_option(question: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    return next((opt for opt in question.get("answerOptions", []) if opt.get("isCorrect")), None)
+
+
+def retrieve_passages(
+    client,
+    vector_store_id: str,
+    query: str,
+    filters: Optional[Dict[str, Any]] = None,
+    max_results: int = PASSAGES_PER_QUESTION,
+) -> List[Dict[str, Any]]:
+    """
+    Run a vector store search and keep the top passages with their filenames.
+    `filters` is an attribute filter (e.g. {"type": "eq", "key": "module", "value": 3}).
+    """
+    search_args: Dict[str, Any] = {}
+    if filters:
+        search_args["filters"] = filters
+    page = client.vector_stores.search(
+        vector_store_id=vector_store_id,
+        query=query,
+        max_num_results=max_results,
+        **search_args,
+    )
+
+    passages: List[Dict[str, Any]] = []
+    for result in page.data:
+        text = "\n".join(
+            c.text for c in (result.content or []) if getattr(c, "type", None) == "text"
+        ).strip()
+        if not text:
+            continue
+        passages.append(
+            {
+                "filename": result.filename,
+                "score": round(float(result.score or 0.0), 4),
+                "text": text[:MAX_PASSAGE_CHARS],
+            }
+        )
+    return passages
+
+
+def build_index(client, vector_store_id: str) -> Dict[str, Any]:
+    """
+    Retrieve passages for every quiz question and return the index document.
+    """
+    entries: Dict[str, Any] = {}
+
+    for question in iter_quiz_questions():
+        key = question_key(question["question"])
+        if key in entries:
+            continue
+
+        correct = _correct_option(question)
+        query = question["question"]
+        if correct:
+            query += "\n" + correct["text"]
+
+        passages = retrieve_passages(client, vector_store_id, query)
+        entries[key] = {
+            "question": question["question"],
+            "correct_answer": correct["text"] if correct else None,
+            "passages": passages,
+        }
+        print(f"Indexed ({len(passages)} passages): {question['question'][:80]}")
+
+    return {
+        "vector_store_id": vector_store_id,
+        "kb_version": os.getenv("KB_VERSION") or vector_store_id,
+        "built_at": datetime.datetime.utcnow().isoformat(),
+        "entries": entries,
+    }
+
+
+def load_index(
+    path: str = INDEX_PATH,
+    vector_store_id: Optional[str] = None,
+    kb_version: Optional[str] = None,
+) -> Dict[str, Any]:
+    """
+    Load the precomputed index entries (question_key -> entry).
+    Returns an empty dict if the build step hasn't been run, or if the index was
+    built against a different vector store / KB version than the one given
+    (stale passages must not ground answers; re-run this script).
+    """
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            index = json.load(f)
+    except (OSError, json.JSONDecodeError) as e:
+        print(f"Could not load quiz KB index from {path}: {e}")
+        return {}
+
+    if vector_store_id and index.get("vector_store_id") != vector_store_id:
+        print(
+            f"Ignoring quiz KB index {path}: built for vector store {index.get('vector_store_id')}, "
+            f"current is {vector_store_id}. Re-run quiz_kb_index.py."
+        )
+        return {}
+    built_version = index.get("kb_version") or index.get("vector_store_id")
+    if kb_version and built_version != kb_version:
+        print(
+            f"Ignoring quiz KB index {path}: built for KB version {built_version}, "
+            f"current is {kb_version}. Re-run quiz_kb_index.py."
+        )
+        return {}
+    return index.get("entries", {})
+
+
+if __name__ == "__main__":
+    from openai import OpenAI
+
+    vector_store_id = os.getenv("VECTOR_STORE_ID")
+    if not vector_store_id:
+        raise RuntimeError("VECTOR_STORE_ID missing in .env (run vector_store.py first)")
+
+    index = build_index(OpenAI(api_key=os.getenv("OPENAI_API_KEY")), vector_store_id)
+
+    os.makedirs(os.path.dirname(INDEX_PATH), exist_ok=True)
+    with open(INDEX_PATH, "w", encoding="utf-8") as f:
+        json.dump(index, f, ensure_ascii=False, indent=2)
+
+    print(f"\nWrote {len(index['entries'])} questions to {INDEX_PATH}")
@@ -0,0 +1,198 @@
+# reflection_prescore.py
+"""
+Instant local pre-scoring for /analyze-reflection.
+
+Runs before (or instead of) the LLM call:
+- one compiled regex with a named group per corruption type from
+  REFLECTION_ANALYSIS_PROMPT, so a single finditer pass classifies the story;
+- heuristic extraction of actors, benefit and harm from role words and cue phrases;
+- a provisional score on the same rubric the LLM uses;
+- a low-effort check, so stories not worth an upstream call are answered locally
+  (a short story only counts as low-effort if it shows no corruption signals).
+
+Everything here is plain `re`/string work and returns in well under a millisecond
+for typical stories.
+"""
+import re
+from typing import Dict, List, Optional, Tuple
+
+# Corruption type -> phrases that suggest it. Group names must be valid identifiers,
+# so spaces are mapped to "_" and back.
+CORRUPTION_PATTERNS: Dict[str, Tuple[str, ...]] = {
+    "bribery": (r"brib\w*", r"kickbacks?", r"pa(?:id|y|ying) (?:him|her|them|off)", r"under the table",
+                r"in exchange for", r"envelope", r"(?:extra|unofficial) (?:fee|payment|money)"),
+    "nepotism": (r"nepotis\w*", r"(?:his|her|their|my|our) (?:son|daughter|nephew|niece|cousin|brother|sister|relative|family)",
+                 r"relatives?", r"family members?", r"brother-in-law|sister-in-law"),
+    "conflict of interest": (r"conflicts? of interest", r"(?:own|his|her|their) (?:company|business|firm)",
+                             r"shares? in", r"stake in", r"personal interest"),
+    "abuse of functions": (r"abus\w* (?:of )?(?:power|position|office|functions?|authority)",
+                           r"misuse\w* (?:of )?(?:power|position|office|authority)",
+                           r"used (?:his|her|their) (?:position|power|office)"),
+    "embezzlement": (r"embezzl\w*", r"misappropriat\w*", r"stole (?:public|company|state) (?:money|funds)",
+                     r"diverted (?:funds|money)", r"pocketed"),
+    "extortion": (r"extort\w*", r"threaten\w*", r"forced (?:him|her|them|us|me) to pay", r"demanded (?:money|payment)"),
+    "favoritism": (r"favou?ritis\w*", r"favou?red", r"friends? of", r"(?:his|her|their) friends?",
+                   r"connections", r"skipp\w* the (?:queue|line)"),
+    "fraud": (r"fraud\w*", r"fak(?:e|ed) (?:documents?|invoices?|receipts?|results?)", r"forg\w*",
+              r"falsif\w*", r"rigg\w*", r"cheat\w*"),
+}
+
+_CORRUPTION_RE = re.compile(
+    "|".join(
+        f"(?P<{name.replace(' ', '_')}>\\b(?:{'|'.join(phrases)})\\b)"
+        for name, phrases in CORRUPTION_PATTERNS.items()
+    ),
+    re.IGNORECASE,
+)
+
+_ACTOR_RE = re.compile(
+    r"\b(?:(?:the|a|an|my|our|his|her|their|local)\s+)?"
+    r"((?:police\s+)?officers?|policem[ae]n|officials?|ministers?|mayors?|governors?|politicians?|"
+    r"judges?|inspectors?|clerks?|civil servants?|public servants?|managers?|directors?|bosses|boss|"
+    r"ceos?|contractors?|compan(?:y|ies)|businessm[ae]n|suppliers?|teachers?|professors?|principals?|"
+    r"doctors?|nurses?|guards?|customs (?:officers?|agents?)|tax (?:officers?|collectors?)|"
+    r"employees?|landlords?|students?|parents?|citizens?|drivers?|owners?|"
+    r"son|daughter|nephew|niece|cousin|brother|sister|relatives?|friends?)\b",
+    re.IGNORECASE,
+)
+
+_BENEFIT_RE = re.compile(
+    r"\b(?:benefit\w*|gain\w*|profit\w*|got (?:the|a|an)|won (?:the|a)|received|in exchange for|"
+    r"so that|in order to|avoid\w* (?:a |the )?(?:fine|ticket|punishment)|promot\w*|hired|awarded)\b",
+    re.IGNORECASE,
+)
+
+_HARM_RE = re.compile(
+    r"\b(?:harm\w*|hurt|suffer\w*|lost|loss\w*|unfair\w*|denied|deprived|victims?|taxpayers?|"
+    r"public (?:money|funds|trust)|poor quality|dangerous|unsafe|could not afford|cost\w*|damag\w*|"
+    r"qualified (?:candidates?|people|students?))\b",
+    re.IGNORECASE,
+)
+
+_DUTY_RE = re.compile(
+    r"\b(?:laws?|illegal|rules?|dut(?:y|ies)|regulations?|polic(?:y|ies)|code of (?:conduct|ethics)|"
+    r"procurement|oath|impartial\w*|integrity|fair (?:process|competition|procedure)|tender)\b",
+    re.IGNORECASE,
+)
+
+_SENTENCE_SPLIT_RE = re.compile(r"(?<=[.!?])\s+|\n+")
+_WORD_RE = re.compile(r"[A-Za-z']+")
+_VOWEL_RE = re.compile(r"[aeiouy]", re.IGNORECASE)
+
+# Below these the story isn't worth an upstream call. A short story still gets the
+# full analysis when it names a corruption type, a harm or a breached duty.
+MIN_WORDS = 25
+MIN_UNIQUE_RATIO = 0.35
+MAX_GIBBERISH_RATIO = 0.3
+
+
+def _sentences(text: str) -> List[str]:
+    return [s.strip() for s in _SENTENCE_SPLIT_RE.split(text) if s.strip()]
+
+
+def _first_sentence_matching(sentences: List[str], pattern: "re.Pattern") -> Optional[str]:
+    return next((s for s in sentences if pattern.search(s)), None)
+
+
+def classify_corruption(text: str) -> List[str]:
+    """
+    Corruption types mentioned in the story, most-mentioned first.
+    """
+    counts: Dict[str, int] = {}
+    for match in _CORRUPTION_RE.finditer(text):
+        name = match.lastgroup.replace("_", " ")
+        counts[name] = counts.get(name, 0) + 1
+    return sorted(counts, key=lambda name: -counts[name])
+
+
+def extract_actors(text: str, limit: int = 4) -> List[str]:
+    actors: List[str] = []
+    for match in _ACTOR_RE.finditer(text):
+        actor = re.sub(r"\s+", " ", match.group(1).lower())
+        if actor not in actors:
+            actors.append(actor)
+        if len(actors) == limit:
+            break
+    return actors
+
+
+def has_corruption_signals(text: str) -> bool:
+    """
+    Whether the story names a corruption mechanism, a harm or a breached rule.
+    """
+    return bool(_CORRUPTION_RE.search(text) or _HARM_RE.search(text) or _DUTY_RE.search(text))
+
+
+def low_effort_reason(text: str) -> Optional[str]:
+    """
+    Why the story is too low-effort for a full analysis, or None if it's fine.
+    """
+    words = [w.lower() for w in _WORD_RE.findall(text)]
+    if not words:
+        return "The story could not be read. Please write full sentences."
+    if len(words) < MIN_WORDS and not has_corruption_signals(text):
+        return f"The story is very short ({len(words)} words). Describe who was involved, what happened, who benefited and who was harmed."
+    if len(set(words)) / len(words) < MIN_UNIQUE_RATIO:
+        return "The story repeats the same words. Describe the situation in your own words."
+    gibberish = sum(1 for w in words if len(w) > 3 and not _VOWEL_RE.search(w))
+    if gibberish / len(words) > MAX_GIBBERISH_RATIO:
+        return "The story could not be read. Please write full sentences."
+    return None
+
+
+def prescore(text: str) -> Dict:
+    """
+    Provisional analysis in the ReflectionAnalysisResponse shape, plus
+    "low_effort" (str reason or None).
+    """
+    sentences = _sentences(text)
+    words = _WORD_RE.findall(text)
+    types = classify_corruption(text)
+    actors = extract_actors(text)
+    benefit = _first_sentence_matching(sentences, _BENEFIT_RE)
+    harm = [s for s in sentences if _HARM_RE.search(s)][:2]
+    duty = _first_sentence_matching(sentences, _DUTY_RE)
+
+    # Same rubric as REFLECTION_ANALYSIS_PROMPT, scored on what the heuristics found.
+    clarity = min(3.0, len(sentences) * 0.5 + (1.0 if len(words) >= 60 else 0.0) + (0.5 if actors else 0.0))
+    benefit_harm = (1.5 if benefit else 0.0) + (1.5 if harm else 0.0)
+    mechanism = 2.0 if types else 0.0
+    breach = 2.0 if duty else 0.0
+    score = round(clarity + benefit_harm + mechanism + breach, 1)
+
+    strengths: List[str] = []
+    missing: List[str] = []
+    if actors:
+        strengths.append(f"You identified who was involved ({', '.join(actors[:3])}).")
+    else:
+        missing.append("Name the people or roles involved (for example an official, a company, a relative).")
+    if types:
+        strengths.append(f"Your story describes a recognizable form of corruption ({types[0]}).")
+    else:
+        missing.append("Explain the mechanism: was it a bribe, a favour to family, a conflict of interest, ...?")
+    if benefit:
+        strengths.append("You explained who gained from the situation.")
+    else:
+        missing.append("Say who benefited and what they gained.")
+    if harm:
+        strengths.append("You described the harm that was caused.")
+    else:
+        missing.append("Describe who was harmed and how.")
+    if not duty:
+        missing.append("Name the rule, law or duty that was breached.")
+
+    return {
+        "actors": actors,
+        "action": sentences[0] if sentences else "",
+        "benefit_receiver": benefit or "",
+        "type_of_corruption": types or ["other"],
+        "harm": harm,
+        "rule_or_duty_breached": duty or "",
+        "score": score,
+        "feedback": {
+            "strengths": strengths[:2],
+            "missing_points": missing[:2],
+            "improved_sentence": "",
+        },
+        "low_effort": low_effort_reason(text),
+    }
@@ -1,8 +1,11 @@
 # ingest_kb.py
 import os
+import sys
 from dotenv import load_dotenv
 from openai import OpenAI
 
+from kb_modules import module_attributes, tag_vector_store_files
+
 load_dotenv()
 client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
 
@@ -19,13 +22,21 @@ def upload_files(vector_store_id: str):
 
     for path in files:
         with open(path, "rb") as f:
+            # The "module" attribute lets searches be scoped to one course module.
             client.vector_stores.files.upload_and_poll(
                 vector_store_id=vector_store_id,
                 file=f,
+                attributes=module_attributes(path) or None,
             )
             print("Uploaded:", path)
 
 if __name__ == "__main__":
+    if "--tag-modules" in sys.argv:
+        # Existing store: add the "module" attribute to files uploaded before it existed.
+        tagged = tag_vector_store_files(client, os.getenv("VECTOR_STORE_ID"))
+        print(f"Tagged {tagged} files")
+        sys.exit(0)
+
     vs_id = create_vector_store()
     upload_files(vs_id)
     print("\nUse this VECTOR_STORE_ID in your .env:")
@@ -0,0 +1,148 @@
+# fixtures.py
+"""
+Fixed, deterministic inputs for the micro-benchmarks (no network, no randomness
+between runs), sized like real traffic: a 5 s voice turn, a ~100 ms Realtime
+audio delta, a cited assistant answer, a 5-question wrong-answer quiz with KB
+passages, and a fenced JSON reflection answer.
+"""
+import os
+import json
+import base64
+import random
+
+from openai.types.beta.threads import Message
+
+from quiz_kb_index import POLICY_WORLD_DIR
+from voice_protocol import AUDIO, encode_frame
+
+SAMPLE_RATE_HZ = 24000
+
+# 5 s of mono PCM16 at 24 kHz.
+PCM_5S = random.Random(7).randbytes(SAMPLE_RATE_HZ * 2 * 5)
+
+# v1: one message per 128-sample worklet frame, then the zero-length end-of-turn marker.
+V1_MESSAGES = [PCM_5S[i:i + 256] for i in range(0, len(PCM_5S), 256)] + [b""]
+
+# v2: 2048-sample AUDIO frames.
+V2_MESSAGES = [
+    encode_frame(AUDIO, seq, PCM_5S[offset:offset + 4096])
+    for seq, offset in enumerate(range(0, len(PCM_5S), 4096))
+]
+
+# One Realtime "response.audio.delta" event carrying ~100 ms of audio.
+REALTIME_DELTA_EVENT = json.dumps(
+    {
+        "type": "response.audio.delta",
+        "event_id": "event_B8rXTe3bTqKZZhbMbPqfJ",
+        "response_id": "resp_B8rXTQmZu0XUHuOhmbuGy",
+        "item_id": "item_B8rXTuNf1GyJv9L9pANb1",
+        "output_index": 0,
+        "content_index": 0,
+        "delta": base64.b64encode(PCM_5S[:4800]).decode("ascii"),
+    }
+)
+
+_ANSWER_PARAGRAPHS = [
+    "Bribery is the offering, giving, receiving or soliciting of something of value to influence the actions "
+    "of an official in the discharge of a public or legal duty.",
+    "The module distinguishes active bribery, where the briber offers the advantage, from passive bribery, "
+    "where the official requests or accepts it; both are criminalised under UNCAC articles 15 and 16.",
+    "Grand corruption involves high-level officials and large sums, while petty corruption refers to everyday "
+    "abuse of entrusted power in interactions with ordinary citizens, such as paying to skip a queue.",
+]
+_ANSWER_TEXT = "\n\n".join(p + f"【4:{i}†source】" for i, p in enumerate(_ANSWER_PARAGRAPHS))
+
+ASSISTANT_MESSAGE = Message.model_validate(
+    {
+        "id": "msg_abc123",
+        "assistant_id": "asst_abc123",
+        "attachments": [],
+        "completed_at": None,
+        "content": [
+            {
+                "type": "text",
+                "text": {
+                    "value": _ANSWER_TEXT,
+                    "annotations": [
+                        {
+                            "type": "file_citation",
+                            "text": f"【4:{i}†source】",
+                            "file_citation": {"file_id": f"file-{i:04d}"},
+                            "start_index": 100 * i,
+                            "end_index": 100 * i + 12,
+                        }
+                        for i in range(4)
+                    ],
+                },
+            }
+        ],
+        "created_at": 1730000000,
+        "incomplete_at": None,
+        "incomplete_details": None,
+        "metadata": {},
+        "object": "thread.message",
+        "role": "assistant",
+        "run_id": "run_abc123",
+        "status": "completed",
+        "thread_id": "thread_abc123",
+    }
+)
+
+STYLE_PREFERENCES = {
+    "understanding_style": "step-by-step logic",
+    "correction_style": "gentle encouragement",
+    "complexity": "technical",
+    "start_with": "An example",
+    "visual_preference": "diagrams (mermaid)",
+}
+
+
+def load_quiz_questions(count: int = 5) -> list:
+    """
+    The first `count` Academia module 2 questions, as wrong answers.
+    """
+    with open(os.path.join(POLICY_WORLD_DIR, "Academia", "quiz_module2.json"), encoding="utf-8") as f:
+        questions = json.load(f)["quiz"][:count]
+    return [dict(q, user_answer=False) for q in questions]
+
+
+# One index entry per wrong question: 3 passages of 1200 chars, like quiz_kb_index.py.
+PASSAGE_ENTRIES = [
+    {
+        "passages": [
+            {
+                "filename": "Anti-Corruption_Module_2_Corruption_and_Good_Governance.pdf",
+                "score": 0.8,
+                "text": (" ".join(_ANSWER_PARAGRAPHS) * 4)[:1200],
+            }
+            for _ in range(3)
+        ]
+    }
+    for _ in range(5)
+]
+
+REFLECTION_STORY = (
+    "When my cousin applied for a job at the city hall, the mayor hired him even though other qualified "
+    "candidates had better results. In exchange for the job my uncle paid the mayor an envelope of cash under "
+    "the table. The mayor benefited financially and my cousin got a stable salary. Qualified people were denied "
+    "a fair chance and citizens lost trust in public institutions. This broke the rules of fair procurement and "
+    "the mayor's duty to be impartial."
+)
+
+REFLECTION_ANSWER = "```json\n" + json.dumps(
+    {
+        "actors": ["the mayor", "the student's cousin", "the student's uncle"],
+        "action": "The mayor hired the cousin in exchange for a cash payment.",
+        "benefit_receiver": "The mayor (money) and the cousin (a job).",
+        "type_of_corruption": ["bribery", "nepotism"],
+        "harm": ["Qualified candidates lost a fair chance", "Citizens lost trust in public institutions"],
+        "rule_or_duty_breached": "The duty of impartiality in public hiring.",
+        "score": 8.5,
+        "feedback": {
+            "strengths": ["Clear description of who benefited", "Identifies the harm to other candidates"],
+            "missing_points": ["Which specific rule governs public hiring", "Long-term effects on the institution"],
+            "improved_sentence": "By hiring his relative in exchange for cash, the mayor breached his duty of impartiality.",
+        },
+    },
+    indent=2,
+) + "\n```"
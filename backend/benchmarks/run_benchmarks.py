@@ -0,0 +1,183 @@
+# run_benchmarks.py
+"""
+Micro-benchmarks for the pure-Python work done on every request, with stored
+baselines. Runs offline against fixtures.py (no OpenAI calls).
+
+    python benchmarks/run_benchmarks.py               # compare with baseline.json, exit 1 on regression
+    python benchmarks/run_benchmarks.py --update      # record a new baseline
+    python benchmarks/run_benchmarks.py --only wav    # benchmarks whose name contains "wav"
+
+Timings are divided by a fixed pure-Python calibration loop measured in the
+same run, so a baseline recorded on one machine is still meaningful on another.
+A benchmark regresses when its normalized time exceeds the baseline by more
+than --threshold (default 50%: on a busy single-core box best-of-7 timings of
+these microsecond-scale calls still wander by ~35%; pass a lower threshold on
+quiet CI hardware).
+"""
+import os
+import sys
+import json
+import time
+import timeit
+import argparse
+import tempfile
+from typing import Callable, Dict, List, Tuple
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+
+# Both agents refuse to import without these; nothing here talks to OpenAI.
+os.environ.setdefault("OPENAI_API_KEY", "sk-benchmark")
+os.environ.setdefault("VECTOR_STORE_ID", "vs_benchmark")
+os.environ["QUIZ_JOBS_DB"] = os.path.join(tempfile.mkdtemp(), "quiz_jobs.db")
+os.environ.pop("VOICE_RECORD_DIR", None)
+
+for path in (BACKEND_DIR, os.path.join(BACKEND_DIR, "SpeechAgent"), os.path.join(BACKEND_DIR, "TeacherAgent")):
+    sys.path.insert(0, path)
+
+import agent  # noqa: E402
+import main  # noqa: E402
+import fixtures  # noqa: E402
+from common.kb import extract_text_and_citations, parse_json_answer  # noqa: E402
+from common.single_flight import question_flight_key  # noqa: E402
+from quiz_bank import question_id  # noqa: E402
+from reflection_prescore import prescore  # noqa: E402
+from voice_protocol import AUDIO, PROTOCOL_V1, PROTOCOL_V2, SeqTracker  # noqa: E402
+
+
+def _calibration():
+    # Fixed mix of the operations the benchmarks lean on: arithmetic, dicts, strings.
+    d = {}
+    for i in range(2000):
+        d[str(i)] = i * i
+    return sum(d.values()), "-".join(d)[:10]
+
+
+def _audio_buffering(protocol: int, messages: List[bytes]):
+    # voice_bridge receive loop: classify each message, buffer the audio.
+    seq_tracker = SeqTracker()
+    chunks: List[bytes] = []
+    for data in messages:
+        classified = main.classify_message(protocol, {"type": "websocket.receive", "bytes": data}, seq_tracker)
+        if classified and classified[0] == AUDIO:
+            chunks.append(classified[1])
+    return b"".join(chunks)
+
+
+def _realtime_audio_delta():
+    # speak_text_via_realtime: parse the event, decode its audio.
+    return main.decode_audio_delta(json.loads(fixtures.REALTIME_DELTA_EVENT))
+
+
+QUIZ_QUESTIONS = [agent.QuizQuestion(**q) for q in fixtures.load_quiz_questions()]
+PREFERENCES = agent.UserPreferences(**fixtures.STYLE_PREFERENCES)
+STYLE_PROMPT = agent.build_style_instructions(PREFERENCES)
+BANK_REQUEST = agent.QuizAnalysisRequest(
+    answers=[{"question_id": question_id(q["question"]), "choice": 0} for q in fixtures.load_quiz_questions()]
+)
+
+BENCHMARKS: Dict[str, Callable[[], object]] = {
+    "wav_bytes_from_pcm16_5s": lambda: main._wav_bytes_from_pcm16(fixtures.PCM_5S),
+    "audio_buffering_v1_5s": lambda: _audio_buffering(PROTOCOL_V1, fixtures.V1_MESSAGES),
+    "audio_buffering_v2_5s": lambda: _audio_buffering(PROTOCOL_V2, fixtures.V2_MESSAGES),
+    "realtime_audio_delta_decode": _realtime_audio_delta,
+    "extract_text_and_citations": lambda: extract_text_and_citations(fixtures.ASSISTANT_MESSAGE),
+    "build_style_instructions": lambda: agent.build_style_instructions(PREFERENCES),
+    "quiz_prompt_file_search_5q": lambda: agent.build_quiz_analysis_prompt(STYLE_PROMPT, QUIZ_QUESTIONS),
+    "quiz_prompt_passages_5q": lambda: agent.build_quiz_analysis_prompt(
+        STYLE_PROMPT, QUIZ_QUESTIONS, fixtures.PASSAGE_ENTRIES
+    ),
+    "resolve_quiz_bank_5q": lambda: agent.resolve_quiz(BANK_REQUEST),
+    "parse_json_answer_reflection": lambda: parse_json_answer(fixtures.REFLECTION_ANSWER),
+    "reflection_prescore": lambda: prescore(fixtures.REFLECTION_STORY),
+    "question_flight_key": lambda: question_flight_key("  What IS bribery, exactly?? ", "vs_benchmark"),
+}
+
+
+def run(only: str = "", repeat: int = 7) -> Tuple[float, Dict[str, Dict[str, float]]]:
+    """
+    Best-of-`repeat` seconds per call for the calibration loop and each benchmark.
+    Repeats are interleaved round-robin (each lasting >= 0.2 s), so drift in
+    machine load hits the calibration and the benchmarks alike.
+    """
+    selected = {name: fn for name, fn in BENCHMARKS.items() if not only or only in name}
+    timers = {name: timeit.Timer(fn) for name, fn in [("_calibration", _calibration), *selected.items()]}
+    numbers = {name: timer.autorange()[0] for name, timer in timers.items()}
+    best = {name: float("inf") for name in timers}
+    for _ in range(repeat):
+        for name, timer in timers.items():
+            best[name] = min(best[name], timer.timeit(numbers[name]) / numbers[name])
+
+    calibration = best.pop("_calibration")
+    results = {
+        name: {
+            "us_per_call": round(seconds * 1e6, 3),
+            "normalized": round(seconds / calibration, 5),
+        }
+        for name, seconds in best.items()
+    }
+    return calibration, results
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="Backend hot-path micro-benchmarks")
+    parser.add_argument("--update", action="store_true", help="write the results as the new baseline")
+    parser.add_argument("--threshold", type=float, default=0.5, help="allowed slowdown vs baseline (0.5 = 50%%)")
+    parser.add_argument("--only", default="", help="run only benchmarks whose name contains this")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    args = parser.parse_args()
+
+    calibration, results = run(args.only)
+
+    if args.update:
+        baseline = {}
+        if args.only and os.path.exists(args.baseline):
+            with open(args.baseline, "r", encoding="utf-8") as f:
+                baseline = json.load(f).get("benchmarks", {})
+        baseline.update(results)
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "recorded_at": time.strftime("%Y-%m-%d"),
+                    "python": sys.version.split()[0],
+                    "calibration_us": round(calibration * 1e6, 3),
+                    "benchmarks": dict(sorted(baseline.items())),
+                },
+                f,
+                indent=2,
+            )
+            f.write("\n")
+        for name, r in results.items():
+            print(f"{name:<32} {r['us_per_call']:>12.2f} us")
+        print(f"Baseline written to {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}; run with --update first.")
+        return 1
+    with open(args.baseline, "r", encoding="utf-8") as f:
+        baseline = json.load(f)["benchmarks"]
+
+    regressions = 0
+    print(f"{'benchmark':<32} {'us/call':>12} {'vs baseline':>12}")
+    for name, r in results.items():
+        base = baseline.get(name)
+        if not base:
+            print(f"{name:<32} {r['us_per_call']:>12.2f} {'(new)':>12}")
+            continue
+        change = r["normalized"] / base["normalized"] - 1
+        flag = ""
+        if change > args.threshold:
+            regressions += 1
+            flag = "  REGRESSION"
+        print(f"{name:<32} {r['us_per_call']:>12.2f} {change:>+11.1%}{flag}")
+
+    if regressions:
+        print(f"\n{regressions} benchmark(s) slower than baseline by more than {args.threshold:.0%}")
+        return 1
+    print("\nNo regressions.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
@@ -0,0 +1 @@
+# Shared helpers for the SpeechAgent and TeacherAgent backends.
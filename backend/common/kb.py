@@ -0,0 +1,176 @@
+# kb.py
+"""
+KB query helpers shared by SpeechAgent and TeacherAgent: Assistants runs with
+file_search, answer/citation extraction, and JSON answer parsing.
+"""
+import json
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from openai import OpenAI
+
+from common.prompts import PROMPT_CACHE_STATS
+
+
+class AssistantRunError(RuntimeError):
+    """
+    The assistant run ended in a state other than "completed" (or timed out).
+    """
+
+
+class OutputTruncated(AssistantRunError):
+    """
+    The model hit its output-token limit before finishing (chat finish_reason
+    "length", or an Assistants run "incomplete" on max_completion_tokens).
+    Callers that need complete JSON retry with a larger budget or fall back.
+    """
+
+
+class AssistantRunCancelled(AssistantRunError):
+    """
+    The caller set the run's cancel event (e.g. it lost a hedge); the upstream
+    run was asked to cancel and polling stopped.
+    """
+
+
+def create_kb_assistant(
+    client: OpenAI,
+    name: str,
+    instructions: str,
+    model: str,
+    vector_store_id: str,
+) -> str:
+    """
+    Create an assistant with file_search over the vector store; returns its ID.
+    """
+    assistant = client.beta.assistants.create(
+        name=name,
+        instructions=instructions,
+        model=model,
+        tools=[{"type": "file_search"}],
+        tool_resources={"file_search": {"vector_store_ids": [vector_store_id]}},
+    )
+    return assistant.id
+
+
+def run_assistant(
+    client: OpenAI,
+    assistant_id: str,
+    content: str,
+    max_wait_seconds: float,
+    poll_interval: float,
+    usage_label: Optional[str] = None,
+    model: Optional[str] = None,
+    max_completion_tokens: Optional[int] = None,
+    additional_instructions: Optional[str] = None,
+    allow_incomplete: bool = False,
+    cancel_event: Optional[threading.Event] = None,
+) -> Optional[Any]:
+    """
+    Post `content` to a new thread, run the assistant, poll until it finishes,
+    and return the latest assistant message (None if it produced none).
+    `model` / `max_completion_tokens` override the assistant's defaults for this run;
+    `additional_instructions` is appended to the assistant's instructions for this run.
+    A run cut off by max_completion_tokens raises OutputTruncated, unless
+    `allow_incomplete` (free-text answers), in which case the partial message is returned.
+    Setting `cancel_event` stops polling, cancels the run upstream, and raises
+    AssistantRunCancelled.
+    """
+    thread = client.beta.threads.create()
+    client.beta.threads.messages.create(
+        thread_id=thread.id,
+        role="user",
+        content=content,
+    )
+
+    run_overrides: Dict[str, Any] = {}
+    if model:
+        run_overrides["model"] = model
+    if max_completion_tokens:
+        run_overrides["max_completion_tokens"] = max_completion_tokens
+    if additional_instructions:
+        run_overrides["additional_instructions"] = additional_instructions
+
+    run = client.beta.threads.runs.create(
+        thread_id=thread.id,
+        assistant_id=assistant_id,
+        **run_overrides,
+    )
+
+    # Poll until the run is complete or times out
+    waited = 0.0
+    while run.status in ("queued", "in_progress") and waited < max_wait_seconds:
+        if cancel_event is None:
+            time.sleep(poll_interval)
+        elif cancel_event.wait(poll_interval):
+            try:
+                client.beta.threads.runs.cancel(thread_id=thread.id, run_id=run.id)
+            except Exception as e:
+                print(f"[KB] failed to cancel run {run.id}: {e}")
+            raise AssistantRunCancelled(f"Assistant run {run.id} cancelled by caller")
+        waited += poll_interval
+        run = client.beta.threads.runs.retrieve(thread_id=thread.id, run_id=run.id)
+
+    truncated = (
+        run.status == "incomplete"
+        and getattr(getattr(run, "incomplete_details", None), "reason", None) == "max_completion_tokens"
+    )
+    if truncated and not allow_incomplete:
+        raise OutputTruncated(f"Assistant run hit max_completion_tokens={max_completion_tokens}")
+
+    if run.status != "completed" and not truncated:
+        detail = (
+            run.last_error.message
+            if getattr(run, "last_error", None)
+            else f"Assistant run status: {run.status}"
+        )
+        raise AssistantRunError(detail)
+
+    if usage_label:
+        PROMPT_CACHE_STATS.record(usage_label, getattr(run, "usage", None))
+
+    # messages.data is in reverse chronological order
+    messages = client.beta.threads.messages.list(thread_id=thread.id)
+    return next((m for m in messages.data if m.role == "assistant"), None)
+
+
+def extract_text_and_citations(message: Any) -> Tuple[str, List[Dict[str, Any]]]:
+    """
+    Concatenate the text parts of an assistant message and collect its
+    annotations as plain JSON-able dicts (best-effort).
+    """
+    answer_text = ""
+    citations: List[Dict[str, Any]] = []
+
+    for part in getattr(message, "content", None) or []:
+        # Most assistant outputs are text parts
+        if getattr(part, "type", None) != "text":
+            continue
+        text_obj = getattr(part, "text", None)
+        if text_obj and getattr(text_obj, "value", None):
+            answer_text += (text_obj.value or "")
+
+        for ann in getattr(text_obj, "annotations", []) or []:
+            raw = ann if isinstance(ann, dict) else getattr(ann, "__dict__", {"annotation": str(ann)})
+            try:
+                citations.append(json.loads(json.dumps(raw, ensure_ascii=False, default=str)))
+            except Exception:
+                citations.append({"citation": str(raw)})
+
+    return answer_text.strip(), citations
+
+
+def parse_json_answer(answer_text: str) -> Dict[str, Any]:
+    """
+    Parse a model's JSON answer, tolerating ```json ... ``` fences around it.
+    Raises json.JSONDecodeError if the content isn't JSON.
+    """
+    answer_text = answer_text.strip()
+    if answer_text.startswith("```json"):
+        answer_text = answer_text[7:]
+    if answer_text.startswith("```"):
+        answer_text = answer_text[3:]
+    if answer_text.endswith("```"):
+        answer_text = answer_text[:-3]
+    return json.loads(answer_text.strip())
@@ -0,0 +1,246 @@
+# model_router.py
+"""
+Latency-tiered model routing.
+
+Each request is classified locally (no model call) from its stage, size and
+preferences into a tier; the tier table maps tiers to a model and an output-token
+budget. If a tier is currently slower than its latency target for that stage,
+requests are moved down one tier. Latency is tracked per (stage, tier), so slow
+Assistants quiz runs don't push /ask or voice traffic down, and it is exposed so
+the table can be tuned.
+
+Stages that must return complete JSON (quiz and reflection analysis) have an
+output-token floor (STAGE_MIN_OUTPUT_TOKENS) that a downgrade never goes below.
+With the default table that floor gives every quiz tier the same budget, so quiz
+routing picks between gpt-4o-mini (standard) and gpt-4o (deep) only.
+
+The tier table can be replaced with MODEL_TIERS (inline JSON) or MODEL_TIERS_FILE
+(path to a JSON file), e.g.:
+    {"fast": {"model": "gpt-4o-mini", "max_output_tokens": 400, "slo_ms": 4000}, ...}
+A stage can also be pinned to one model on every tier (`stage_models`); the
+SpeechAgent does this for "voice" when OPENAI_RAG_ASSISTANT_MODEL is set.
+"""
+import os
+import json
+import time
+import threading
+from collections import deque
+from contextlib import contextmanager
+from dataclasses import dataclass, replace
+from typing import Any, Deque, Dict, Iterator, Optional, Tuple
+
+# Ordered fastest -> most thorough. Downgrades move one step left.
+TIER_ORDER = ("fast", "standard", "deep")
+
+DEFAULT_TIERS: Dict[str, Dict[str, Any]] = {
+    "fast": {"model": "gpt-4o-mini", "max_output_tokens": 400, "slo_ms": 6000},
+    "standard": {"model": "gpt-4o-mini", "max_output_tokens": 2000, "slo_ms": 30000},
+    "deep": {"model": "gpt-4o", "max_output_tokens": 6000, "slo_ms": 90000},
+}
+
+# Truncated JSON is unusable, so these stages always get at least this many output tokens.
+STAGE_MIN_OUTPUT_TOKENS: Dict[str, int] = {
+    "quiz_analysis": 6000,
+    "reflection_analysis": 1000,
+}
+
+# Latency samples kept per (stage, tier) for percentiles.
+_WINDOW = 200
+
+
+@dataclass(frozen=True)
+class Tier:
+    name: str
+    model: str
+    max_output_tokens: int
+    slo_ms: int
+    # Stage this tier was routed for (set by ModelRouter.route; keys the latency stats)
+    stage: str = ""
+
+
+def expand_budget(tier: Tier, factor: int = 2) -> Tier:
+    """
+    The same tier with a larger output budget, for one retry after truncated output.
+    """
+    return replace(tier, max_output_tokens=tier.max_output_tokens * factor)
+
+
+class _TierStats:
+    def __init__(self):
+        self.samples: Deque[float] = deque(maxlen=_WINDOW)
+        self.in_flight = 0
+        self.routed = 0
+        self.downgraded_from = 0
+
+
+def _percentile(samples: list, pct: float) -> Optional[float]:
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(pct * len(ordered)))]
+
+
+class ModelRouter:
+    def __init__(
+        self,
+        tiers: Dict[str, Dict[str, Any]],
+        min_output_tokens: Optional[Dict[str, int]] = None,
+        stage_models: Optional[Dict[str, str]] = None,
+    ):
+        self.tiers: Dict[str, Tier] = {
+            name: Tier(
+                name=name,
+                model=cfg["model"],
+                max_output_tokens=int(cfg["max_output_tokens"]),
+                slo_ms=int(cfg.get("slo_ms", 0)),
+            )
+            for name, cfg in tiers.items()
+        }
+        self.min_output_tokens = dict(STAGE_MIN_OUTPUT_TOKENS if min_output_tokens is None else min_output_tokens)
+        # stage -> model used on every tier for that stage (budgets still follow the tier)
+        self.stage_models = {stage: model for stage, model in (stage_models or {}).items() if model}
+        self._lock = threading.Lock()
+        self._stats: Dict[Tuple[str, str], _TierStats] = {}
+
+    def _stats_for(self, stage: str, tier_name: str) -> _TierStats:
+        # Caller holds self._lock.
+        key = (stage, tier_name)
+        if key not in self._stats:
+            self._stats[key] = _TierStats()
+        return self._stats[key]
+
+    @classmethod
+    def from_env(cls, stage_models: Optional[Dict[str, str]] = None) -> "ModelRouter":
+        tiers = {name: dict(cfg) for name, cfg in DEFAULT_TIERS.items()}
+        raw = os.environ.get("MODEL_TIERS")
+        path = os.environ.get("MODEL_TIERS_FILE")
+        if path:
+            with open(path, "r", encoding="utf-8") as f:
+                raw = f.read()
+        if raw:
+            for name, cfg in json.loads(raw).items():
+                tiers.setdefault(name, {}).update(cfg)
+        return cls(tiers, stage_models=stage_models)
+
+    # ---------------- classification ----------------
+
+    @staticmethod
+    def classify(
+        stage: str,
+        text_length: int = 0,
+        item_count: int = 1,
+        complexity: Optional[str] = None,
+        brief: bool = False,
+    ) -> str:
+        """
+        Pick a tier from cheap local signals only.
+
+        stage:       "voice" | "ask" | "quiz_analysis" | "reflection_analysis"
+        text_length: characters of user-provided text in the prompt
+        item_count:  e.g. number of wrong quiz questions to explain
+        complexity:  ComplexityLevel value from the user's preferences, if any
+        brief:       the user asked for short explanations
+        """
+        if stage == "voice":
+            # Spoken answers are 2-3 sentences; only unusually long questions need more.
+            return "standard" if text_length > 400 else "fast"
+
+        if stage == "ask":
+            return "standard" if text_length > 300 else "fast"
+
+        if stage == "quiz_analysis":
+            if complexity == "technical" or item_count >= 6:
+                return "deep"
+            if brief or complexity == "very simple":
+                return "standard"
+            return "deep" if item_count >= 4 else "standard"
+
+        if stage == "reflection_analysis":
+            return "deep" if text_length > 3000 else "standard"
+
+        return "standard"
+
+    def _overloaded(self, stage: str, tier: Tier) -> bool:
+        stats = self._stats_for(stage, tier.name)
+        if not tier.slo_ms or len(stats.samples) < 5:
+            return False
+        recent_p90 = _percentile(list(stats.samples)[-20:], 0.9)
+        return recent_p90 is not None and recent_p90 * 1000 > tier.slo_ms
+
+    def route(self, stage: str, **signals: Any) -> Tier:
+        """
+        Classify the request, then step down while the chosen tier is missing its
+        SLO for this stage. The output budget never drops below the stage's floor.
+        """
+        name = self.classify(stage, **signals)
+        with self._lock:
+            idx = TIER_ORDER.index(name) if name in TIER_ORDER else TIER_ORDER.index("standard")
+            while idx > 0 and self._overloaded(stage, self.tiers[TIER_ORDER[idx]]):
+                self._stats_for(stage, TIER_ORDER[idx]).downgraded_from += 1
+                idx -= 1
+            base = self.tiers[TIER_ORDER[idx]]
+            self._stats_for(stage, base.name).routed += 1
+        tier = self._for_stage(base, stage)
+        print(f"[Router] {stage} -> {tier.name} ({tier.model}, max {tier.max_output_tokens} tokens)")
+        return tier
+
+    def _for_stage(self, base: Tier, stage: str) -> Tier:
+        return replace(
+            base,
+            stage=stage,
+            model=self.stage_models.get(stage, base.model),
+            max_output_tokens=max(base.max_output_tokens, self.min_output_tokens.get(stage, 0)),
+        )
+
+    def escalate(self, tier: Tier) -> Tier:
+        """
+        The next tier up for the same stage, for one retry after truncated output;
+        the deepest tier gets double its budget instead.
+        """
+        idx = TIER_ORDER.index(tier.name) if tier.name in TIER_ORDER else len(TIER_ORDER) - 1
+        if idx == len(TIER_ORDER) - 1:
+            return expand_budget(tier)
+        return self._for_stage(self.tiers[TIER_ORDER[idx + 1]], tier.stage)
+
+    # ---------------- latency tracking ----------------
+
+    @contextmanager
+    def track(self, tier: Tier) -> Iterator[None]:
+        """
+        Time one upstream call made on this tier (for the stage it was routed for).
+        """
+        with self._lock:
+            stats = self._stats_for(tier.stage, tier.name)
+            stats.in_flight += 1
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            with self._lock:
+                stats.in_flight -= 1
+                stats.samples.append(time.monotonic() - started)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            out: Dict[str, Any] = {
+                "tiers": {
+                    name: {"model": tier.model, "max_output_tokens": tier.max_output_tokens, "slo_ms": tier.slo_ms}
+                    for name, tier in self.tiers.items()
+                },
+                "min_output_tokens": dict(self.min_output_tokens),
+                "stage_models": dict(self.stage_models),
+                "stages": {},
+            }
+            for (stage, name), stats in sorted(self._stats.items()):
+                samples = list(stats.samples)
+                p50 = _percentile(samples, 0.5)
+                p95 = _percentile(samples, 0.95)
+                out["stages"].setdefault(stage, {})[name] = {
+                    "routed": stats.routed,
+                    "downgraded_from": stats.downgraded_from,
+                    "in_flight": stats.in_flight,
+                    "samples": len(samples),
+                    "p50_ms": round(p50 * 1000) if p50 is not None else None,
+                    "p95_ms": round(p95 * 1000) if p95 is not None else None,
+                }
+            return out
@@ -0,0 +1,195 @@
+# openai_client.py
+"""
+One tuned OpenAI client per process, shared by every call site.
+
+The SDK default builds a fresh httpx pool per OpenAI() instance with library
+defaults. Here the pool size, keep-alive and HTTP/2 are explicit, and each stage
+(STT, RAG, analysis) gets its own timeout on top of the same connection pool, so
+connections are always reused. TRANSPORT_STATS counts requests vs new
+connections to make that reuse measurable (see /stats).
+
+All settings can be overridden in .env:
+    OPENAI_HTTP_MAX_CONNECTIONS, OPENAI_HTTP_MAX_KEEPALIVE,
+    OPENAI_HTTP_KEEPALIVE_EXPIRY, OPENAI_HTTP2 (auto/1/0),
+    OPENAI_CONNECT_TIMEOUT, OPENAI_TIMEOUT_<STAGE> (e.g. OPENAI_TIMEOUT_STT)
+"""
+import os
+import threading
+import importlib.util
+from typing import Any, Dict, Optional
+
+import httpx
+from openai import AsyncOpenAI, DefaultAsyncHttpxClient, DefaultHttpxClient, OpenAI
+
+MAX_CONNECTIONS = int(os.environ.get("OPENAI_HTTP_MAX_CONNECTIONS", "50"))
+MAX_KEEPALIVE_CONNECTIONS = int(os.environ.get("OPENAI_HTTP_MAX_KEEPALIVE", "20"))
+KEEPALIVE_EXPIRY_SECONDS = float(os.environ.get("OPENAI_HTTP_KEEPALIVE_EXPIRY", "90"))
+CONNECT_TIMEOUT_SECONDS = float(os.environ.get("OPENAI_CONNECT_TIMEOUT", "5"))
+
+# HTTP/2 needs the optional `h2` package (pip install "httpx[http2]").
+_http2_setting = os.environ.get("OPENAI_HTTP2", "auto").lower()
+HTTP2_ENABLED = (
+    importlib.util.find_spec("h2") is not None
+    if _http2_setting == "auto"
+    else _http2_setting in ("1", "true", "yes")
+)
+
+# Per-call read timeouts by pipeline stage (seconds).
+STAGE_TIMEOUTS: Dict[str, float] = {
+    "stt": 30.0,
+    "rag": 60.0,
+    "analysis": 180.0,
+    "default": 60.0,
+}
+for _stage in list(STAGE_TIMEOUTS):
+    _override = os.environ.get(f"OPENAI_TIMEOUT_{_stage.upper()}")
+    if _override:
+        STAGE_TIMEOUTS[_stage] = float(_override)
+
+
+class TransportStats:
+    """
+    Counts requests and newly opened TCP connections via httpcore trace events.
+    requests - connections_opened == requests served on a reused connection.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.connections_opened = 0
+        self.by_http_version: Dict[str, int] = {}
+
+    def _trace(self, event_name: str, info: Dict[str, Any]):
+        if event_name == "connection.connect_tcp.complete":
+            with self._lock:
+                self.connections_opened += 1
+
+    def on_request(self, request: httpx.Request):
+        request.extensions["trace"] = self._trace
+        with self._lock:
+            self.requests += 1
+
+    def on_response(self, response: httpx.Response):
+        with self._lock:
+            self.by_http_version[response.http_version] = (
+                self.by_http_version.get(response.http_version, 0) + 1
+            )
+
+    # httpx.AsyncClient requires coroutine event hooks.
+    async def on_request_async(self, request: httpx.Request):
+        self.on_request(request)
+
+    async def on_response_async(self, response: httpx.Response):
+        self.on_response(response)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            reused = max(self.requests - self.connections_opened, 0)
+            return {
+                "requests": self.requests,
+                "connections_opened": self.connections_opened,
+                "connection_reuse_ratio": round(reused / self.requests, 4) if self.requests else 0.0,
+                "by_http_version": dict(self.by_http_version),
+                "http2_enabled": HTTP2_ENABLED,
+            }
+
+
+TRANSPORT_STATS = TransportStats()
+
+_client_lock = threading.Lock()
+_client: Optional[OpenAI] = None
+_stage_clients: Dict[str, OpenAI] = {}
+_async_client: Optional[AsyncOpenAI] = None
+_async_stage_clients: Dict[str, AsyncOpenAI] = {}
+
+
+def _pool_settings() -> Dict[str, Any]:
+    return {
+        "http2": HTTP2_ENABLED,
+        "limits": httpx.Limits(
+            max_connections=MAX_CONNECTIONS,
+            max_keepalive_connections=MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=KEEPALIVE_EXPIRY_SECONDS,
+        ),
+        "timeout": httpx.Timeout(STAGE_TIMEOUTS["default"], connect=CONNECT_TIMEOUT_SECONDS),
+    }
+
+
+def _build_http_client() -> httpx.Client:
+    return DefaultHttpxClient(
+        **_pool_settings(),
+        event_hooks={
+            "request": [TRANSPORT_STATS.on_request],
+            "response": [TRANSPORT_STATS.on_response],
+        },
+    )
+
+
+def _build_async_http_client() -> httpx.AsyncClient:
+    return DefaultAsyncHttpxClient(
+        **_pool_settings(),
+        event_hooks={
+            "request": [TRANSPORT_STATS.on_request_async],
+            "response": [TRANSPORT_STATS.on_response_async],
+        },
+    )
+
+
+def get_openai_client(api_key: Optional[str] = None) -> OpenAI:
+    """
+    The process-wide OpenAI client (created on first use).
+    """
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = OpenAI(
+                api_key=api_key or os.environ.get("OPENAI_API_KEY"),
+                http_client=_build_http_client(),
+                timeout=httpx.Timeout(STAGE_TIMEOUTS["default"], connect=CONNECT_TIMEOUT_SECONDS),
+            )
+        return _client
+
+
+def client_for_stage(stage: str) -> OpenAI:
+    """
+    The shared client with this stage's timeout. Derived clients reuse the same
+    httpx pool, so switching stage never opens new connections.
+    """
+    base = get_openai_client()
+    with _client_lock:
+        if stage not in _stage_clients:
+            timeout = STAGE_TIMEOUTS.get(stage, STAGE_TIMEOUTS["default"])
+            _stage_clients[stage] = base.with_options(
+                timeout=httpx.Timeout(timeout, connect=CONNECT_TIMEOUT_SECONDS)
+            )
+        return _stage_clients[stage]
+
+
+def get_async_openai_client(api_key: Optional[str] = None) -> AsyncOpenAI:
+    """
+    The process-wide AsyncOpenAI client, for streaming calls that must be
+    cancellable from the event loop. Same pool settings as the sync client.
+    """
+    global _async_client
+    with _client_lock:
+        if _async_client is None:
+            _async_client = AsyncOpenAI(
+                api_key=api_key or os.environ.get("OPENAI_API_KEY"),
+                http_client=_build_async_http_client(),
+                timeout=httpx.Timeout(STAGE_TIMEOUTS["default"], connect=CONNECT_TIMEOUT_SECONDS),
+            )
+        return _async_client
+
+
+def async_client_for_stage(stage: str) -> AsyncOpenAI:
+    """
+    Async counterpart of client_for_stage().
+    """
+    base = get_async_openai_client()
+    with _client_lock:
+        if stage not in _async_stage_clients:
+            timeout = STAGE_TIMEOUTS.get(stage, STAGE_TIMEOUTS["default"])
+            _async_stage_clients[stage] = base.with_options(
+                timeout=httpx.Timeout(timeout, connect=CONNECT_TIMEOUT_SECONDS)
+            )
+        return _async_stage_clients[stage]
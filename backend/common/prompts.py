@@ -0,0 +1,95 @@
+# prompts.py
+"""
+Prompt layout helpers tuned for provider-side prompt caching.
+
+OpenAI caches prompts by exact prefix (from ~1024 tokens up), so every prompt
+we send is laid out as:
+    [static instructions + output schema]  ->  [per-request content]
+Anything that varies per request (style preferences, questions, student text)
+must go after the static prefix, never inside it.
+"""
+import threading
+from typing import Any, Dict
+
+
+def build_prompt(static_prefix: str, *dynamic_parts: str) -> str:
+    """
+    Join a static prefix with per-request parts, appended last.
+    Empty parts are skipped so they can't shift anything after them.
+    """
+    parts = [static_prefix.rstrip()]
+    parts.extend(p.strip() for p in dynamic_parts if p and p.strip())
+    return "\n\n".join(parts) + "\n"
+
+
+def _get(obj: Any, name: str) -> Any:
+    # Usage objects come back as SDK models (chat/responses/assistants) or as
+    # plain dicts (Realtime events); read both the same way.
+    if obj is None:
+        return None
+    if isinstance(obj, dict):
+        return obj.get(name)
+    return getattr(obj, name, None)
+
+
+def prompt_token_counts(usage: Any) -> tuple[int, int]:
+    """
+    Return (prompt_tokens, cached_tokens) from any OpenAI usage payload.
+    """
+    # Chat Completions / Assistants runs
+    prompt_tokens = _get(usage, "prompt_tokens")
+    details = _get(usage, "prompt_tokens_details")
+    if prompt_tokens is None:
+        # Responses API / Realtime
+        prompt_tokens = _get(usage, "input_tokens")
+        details = _get(usage, "input_tokens_details") or _get(usage, "input_token_details")
+
+    cached_tokens = _get(details, "cached_tokens")
+    return int(prompt_tokens or 0), int(cached_tokens or 0)
+
+
+class PromptCacheStats:
+    """
+    Per-call-site counters of prompt tokens vs cached prompt tokens.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._by_label: Dict[str, Dict[str, int]] = {}
+
+    def record(self, label: str, usage: Any) -> float:
+        """
+        Record one response's usage and return its cached-token ratio.
+        """
+        prompt_tokens, cached_tokens = prompt_token_counts(usage)
+        if not prompt_tokens:
+            return 0.0
+
+        with self._lock:
+            entry = self._by_label.setdefault(
+                label, {"calls": 0, "prompt_tokens": 0, "cached_tokens": 0}
+            )
+            entry["calls"] += 1
+            entry["prompt_tokens"] += prompt_tokens
+            entry["cached_tokens"] += cached_tokens
+
+        ratio = cached_tokens / prompt_tokens
+        print(f"[PromptCache] {label}: {cached_tokens}/{prompt_tokens} prompt tokens cached ({ratio:.0%})")
+        return ratio
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            return {
+                label: {
+                    **entry,
+                    "cached_ratio": (
+                        round(entry["cached_tokens"] / entry["prompt_tokens"], 4)
+                        if entry["prompt_tokens"]
+                        else 0.0
+                    ),
+                }
+                for label, entry in self._by_label.items()
+            }
+
+
+PROMPT_CACHE_STATS = PromptCacheStats()
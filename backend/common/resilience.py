@@ -0,0 +1,242 @@
+# resilience.py
+"""
+Hedged requests and circuit breakers for upstream model calls.
+
+- Hedger: for idempotent calls. If the call hasn't finished after the recent
+  p95 latency (HEDGE_PERCENTILE) for that endpoint, a duplicate is started; the
+  first successful result wins and the other task is cancelled. Hedges are
+  capped at HEDGE_MAX_RATIO of calls so a slow upstream doesn't get double load.
+  Cancellation only stops work that can be interrupted: async SDK calls abort
+  their HTTP request, and blocking calls run through to_thread_cancellable()
+  get a cancel event to stop on. A plain asyncio.to_thread task only has its
+  result discarded; the SDK call in the worker thread still runs to completion.
+- CircuitBreaker: after BREAKER_FAILURES consecutive failures an endpoint is
+  "open" for BREAKER_RESET_SECONDS and calls fail fast (callers return a cached
+  or fallback response); then a single trial call decides whether it closes again.
+
+Counters for both are exposed via resilience_snapshot() (GET /stats).
+"""
+import os
+import time
+import asyncio
+import threading
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional, TypeVar
+
+T = TypeVar("T")
+
+HEDGE_PERCENTILE = float(os.environ.get("HEDGE_PERCENTILE", "0.95"))
+HEDGE_MAX_RATIO = float(os.environ.get("HEDGE_MAX_RATIO", "0.1"))
+HEDGE_MIN_SAMPLES = int(os.environ.get("HEDGE_MIN_SAMPLES", "20"))
+BREAKER_FAILURES = int(os.environ.get("BREAKER_FAILURES", "5"))
+BREAKER_RESET_SECONDS = float(os.environ.get("BREAKER_RESET_SECONDS", "30"))
+
+_HEDGERS: Dict[str, "Hedger"] = {}
+_BREAKERS: Dict[str, "CircuitBreaker"] = {}
+
+
+class CircuitOpenError(RuntimeError):
+    """
+    The endpoint's breaker is open; the call was not attempted.
+    """
+
+
+async def to_thread_cancellable(fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """
+    asyncio.to_thread(fn, ...) for blocking functions that accept a `cancel_event`
+    keyword: cancelling the awaiting task sets the event so the worker thread
+    can stop (and cancel its upstream work) instead of running on unobserved.
+    """
+    cancel_event = threading.Event()
+    try:
+        return await asyncio.to_thread(fn, *args, cancel_event=cancel_event, **kwargs)
+    except asyncio.CancelledError:
+        cancel_event.set()
+        raise
+
+
+class Hedger:
+    def __init__(
+        self,
+        name: str,
+        percentile: float = HEDGE_PERCENTILE,
+        max_ratio: float = HEDGE_MAX_RATIO,
+        min_samples: int = HEDGE_MIN_SAMPLES,
+        min_delay: float = 0.05,
+        window: int = 200,
+    ):
+        self.name = name
+        self.percentile = percentile
+        self.max_ratio = max_ratio
+        self.min_samples = min_samples
+        self.min_delay = min_delay
+        self._latencies: Deque[float] = deque(maxlen=window)
+        self.calls = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+        self.cancelled = 0
+        _HEDGERS[name] = self
+
+    def hedge_delay(self) -> Optional[float]:
+        """
+        Seconds to wait before hedging, or None (not enough samples / over budget).
+        """
+        if len(self._latencies) < self.min_samples:
+            return None
+        if self.hedged >= self.max_ratio * self.calls:
+            return None
+        ordered = sorted(self._latencies)
+        return max(self.min_delay, ordered[min(len(ordered) - 1, int(self.percentile * len(ordered)))])
+
+    async def run(self, fn: Callable[[], Awaitable[T]]) -> T:
+        """
+        Await fn(), starting a second fn() if the first is slower than the hedge delay.
+        fn must be safe to call twice.
+        """
+        self.calls += 1
+        started = time.monotonic()
+        primary = asyncio.ensure_future(fn())
+        tasks = {primary}
+        try:
+            delay = self.hedge_delay()
+            if delay is not None:
+                done, _ = await asyncio.wait(tasks, timeout=delay)
+                if not done:
+                    self.hedged += 1
+                    print(f"[Hedge] {self.name}: no answer after {delay * 1000:.0f} ms, sending hedge")
+                    tasks.add(asyncio.ensure_future(fn()))
+
+            pending = set(tasks)
+            last_error: Optional[BaseException] = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is not primary:
+                            self.hedge_wins += 1
+                        self._latencies.append(time.monotonic() - started)
+                        return task.result()
+                    last_error = task.exception()
+            raise last_error
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+                    self.cancelled += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        ordered = sorted(self._latencies)
+        p = ordered[min(len(ordered) - 1, int(self.percentile * len(ordered)))] if ordered else None
+        return {
+            "calls": self.calls,
+            "hedged": self.hedged,
+            "hedge_wins": self.hedge_wins,
+            "cancelled": self.cancelled,
+            f"p{int(self.percentile * 100)}_ms": round(p * 1000) if p is not None else None,
+        }
+
+
+class CircuitBreaker:
+    """
+    Consecutive-failure breaker: closed -> open -> half_open -> closed/open.
+    Thread-safe, so the sync analysis code running in worker threads can use it.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int = BREAKER_FAILURES,
+        reset_seconds: float = BREAKER_RESET_SECONDS,
+    ):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self._lock = threading.Lock()
+        self.state = "closed"
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+        self.successes = 0
+        self.failures = 0
+        self.short_circuits = 0
+        self.opened = 0
+        _BREAKERS[name] = self
+
+    def allow(self) -> bool:
+        """
+        Whether a call may go upstream now. Counts a short circuit when it may not.
+        """
+        with self._lock:
+            if self.state == "open" and time.monotonic() - self._opened_at >= self.reset_seconds:
+                self.state = "half_open"
+                self._trial_in_flight = False
+            if self.state == "closed":
+                return True
+            if self.state == "half_open" and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            self.short_circuits += 1
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.successes += 1
+            self._failures = 0
+            if self.state != "closed":
+                print(f"[Breaker] {self.name} closed")
+            self.state = "closed"
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._failures += 1
+            self._trial_in_flight = False
+            if self.state == "half_open" or (self.state == "closed" and self._failures >= self.failure_threshold):
+                self.state = "open"
+                self._opened_at = time.monotonic()
+                self.opened += 1
+                print(f"[Breaker] {self.name} open for {self.reset_seconds:.0f}s after {self._failures} failures")
+
+    async def call(
+        self,
+        fn: Callable[[], Awaitable[T]],
+        fallback: Optional[Callable[[], T]] = None,
+    ) -> T:
+        """
+        Await fn() through the breaker. When open, return fallback() if given,
+        else raise CircuitOpenError.
+        """
+        if not self.allow():
+            if fallback is not None:
+                return fallback()
+            raise CircuitOpenError(f"{self.name} is temporarily unavailable")
+        try:
+            result = await fn()
+        except asyncio.CancelledError:
+            # The caller gave up; that says nothing about upstream health.
+            with self._lock:
+                self._trial_in_flight = False
+            raise
+        except Exception:
+            self.record_failure()
+            raise
+        self.record_success()
+        return result
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "state": self.state,
+                "successes": self.successes,
+                "failures": self.failures,
+                "short_circuits": self.short_circuits,
+                "opened": self.opened,
+            }
+
+
+def resilience_snapshot() -> Dict[str, Any]:
+    return {
+        "hedging": {name: h.snapshot() for name, h in _HEDGERS.items()},
+        "breakers": {name: b.snapshot() for name, b in _BREAKERS.items()},
+    }
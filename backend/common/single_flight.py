@@ -0,0 +1,81 @@
+# single_flight.py
+"""
+In-flight request coalescing ("single flight").
+
+When a class is told to ask the same question, dozens of identical KB queries
+arrive within seconds. Concurrent callers with the same key share one upstream
+call: the first caller starts it, later callers attach to it, and all of them get
+its result or its exception.
+"""
+import re
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Optional, TypeVar
+
+T = TypeVar("T")
+
+
+def question_flight_key(question: str, kb_version: str) -> str:
+    """
+    Key for KB questions: case, whitespace and trailing punctuation don't matter,
+    and answers from different KB versions are never shared.
+    """
+    normalized = re.sub(r"\s+", " ", question or "").strip().lower().rstrip("?!. ")
+    return f"{kb_version}:{normalized}"
+
+
+class SingleFlight:
+    """
+    Deduplicates concurrent async calls by key. Must be used from one event loop.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self.upstream_calls = 0
+        self.coalesced = 0
+        self.timeouts = 0
+        self.errors = 0
+
+    def _finished(self, key: str, task: asyncio.Task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        # Mark the exception as retrieved even if every waiter already timed out.
+        if not task.cancelled() and task.exception() is not None:
+            self.errors += 1
+
+    async def do(
+        self,
+        key: str,
+        fn: Callable[[], Awaitable[T]],
+        timeout: Optional[float] = None,
+    ) -> T:
+        """
+        Await fn() for this key, or join the call already in flight.
+
+        The timeout applies to this caller only: the shared call keeps running for
+        the other waiters (asyncio.TimeoutError is raised to the caller that gave up).
+        """
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._finished(key, t))
+            self.upstream_calls += 1
+        else:
+            self.coalesced += 1
+            print(f"[SingleFlight:{self.name}] coalesced request onto in-flight call ({key[:60]})")
+
+        try:
+            return await asyncio.wait_for(asyncio.shield(task), timeout)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            raise
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "in_flight": len(self._inflight),
+            "upstream_calls": self.upstream_calls,
+            "coalesced": self.coalesced,
+            "timeouts": self.timeouts,
+            "errors": self.errors,
+        }
@@ -1,5 +1,13 @@
 import React, { useRef, useState, useEffect } from "react";
 import "./VoiceCall.css";
+import {
+  AudioBatcher,
+  FrameType,
+  VOICE_SUBPROTOCOL,
+  decodeFrame,
+  decodeJson,
+  encodeFrame,
+} from "./voiceProtocol";
 
 /**
  * AI Speech Tutor - Conversational Voice Interface
@@ -8,12 +16,30 @@ import "./VoiceCall.css";
 
 type TutorState = "idle" | "listening" | "thinking" | "speaking";
 
+type VoiceEvent = {
+  type?: string;
+  transcript?: string;
+  answer?: string;
+  citations?: Array<Record<string, unknown>>;
+  error?: string;
+  status?: string;
+  /** Degradation mode ("mode" events, and kb_result while degraded). */
+  mode?: string;
+  reason?: string;
+  /** Place in line ("waiting_room" events). */
+  position?: number;
+};
+
+// Server degradation modes in which answers arrive as text only, with no audio.
+const SILENT_MODES = ["text_only", "cached_only"];
+
 const VoiceCall: React.FC = () => {
   const [isConnected, setIsConnected] = useState(false);
   const [isSpeaking, setIsSpeaking] = useState(false);
   const [error, setError] = useState<string | null>(null);
   const [tutorMessage, setTutorMessage] = useState<string>("");
   const [tutorState, setTutorState] = useState<TutorState>("idle");
+  const [voiceMode, setVoiceMode] = useState<string>("normal");
 
   const wsRef = useRef<WebSocket | null>(null);
   const playbackAudioContextRef = useRef<AudioContext | null>(null);
@@ -24,6 +50,12 @@ const VoiceCall: React.FC = () => {
   const captureWorkletRef = useRef<AudioWorkletNode | null>(null);
   const mediaStreamRef = useRef<MediaStream | null>(null);
   const videoRef = useRef<HTMLVideoElement>(null);
+  // Protocol v2 (typed binary frames) when the server accepts it, else v1.
+  const protocolV2Ref = useRef<boolean>(false);
+  const sendSeqRef = useRef<number>(0);
+  const audioBatcherRef = useRef<AudioBatcher>(new AudioBatcher());
+  // Read from socket handlers, which keep the closure of the render that connected.
+  const voiceModeRef = useRef<string>("normal");
 
   // Auto-dismiss error after 5 seconds
   useEffect(() => {
@@ -77,6 +109,105 @@ const VoiceCall: React.FC = () => {
     return out;
   };
 
+  const sendFrame = (ws: WebSocket, type: number, payload?: Uint8Array) => {
+    ws.send(encodeFrame(type, sendSeqRef.current++, payload));
+  };
+
+  // Send captured mic audio: batched frames on v2, raw PCM per chunk on v1.
+  const sendCapturedAudio = (ws: WebSocket, pcm16: Int16Array) => {
+    if (!protocolV2Ref.current) {
+      ws.send(pcm16.buffer);
+      return;
+    }
+    const batch = audioBatcherRef.current.push(pcm16);
+    if (batch) sendFrame(ws, FrameType.AUDIO, batch);
+  };
+
+  const sendEndOfTurn = (ws: WebSocket) => {
+    if (!protocolV2Ref.current) {
+      ws.send(new ArrayBuffer(0));
+      return;
+    }
+    const rest = audioBatcherRef.current.flush();
+    if (rest) sendFrame(ws, FrameType.AUDIO, rest);
+    sendFrame(ws, FrameType.END_TURN);
+  };
+
+  const handleVoiceEvent = (msg: VoiceEvent) => {
+    if (msg.type === "mode" && msg.mode) {
+      voiceModeRef.current = msg.mode;
+      setVoiceMode(msg.mode);
+      return;
+    }
+
+    if (msg.type === "waiting_room") {
+      if (msg.status === "rejected") {
+        setError("Grace is busy right now. Please try again in a few minutes.");
+      } else if (msg.status === "admitted") {
+        setTutorMessage("Hi! I'm Grace. What would you like to learn today?");
+        setTutorState("idle");
+      } else if (typeof msg.position === "number") {
+        setTutorMessage(`Grace is talking with other students. You're number ${msg.position} in line...`);
+        setTutorState("thinking");
+      }
+      return;
+    }
+
+    if (msg.type === "kb_result") {
+      if (msg.error) {
+        setError(msg.error);
+        setTutorState("idle");
+      }
+
+      if (msg.transcript === "") {
+        // Nothing was heard, so the server skips the answer.
+        setTutorState("idle");
+        setTutorMessage("Sorry, I didn't catch that. Could you say it again?");
+      }
+
+      if (msg.status === "processing") {
+        setTutorState("thinking");
+        setTutorMessage("Let me think about that...");
+      }
+
+      if (msg.status === "done" && typeof msg.answer === "string") {
+        // We just update the text here. The state "speaking" is triggered by the binary audio data.
+        // If there's no audio (text-only response), we might need to handle that,
+        // but typically 'voice' endpoint sends audio.
+        if (msg.answer) {
+          setTutorMessage(msg.answer);
+        }
+        // In text_only / cached_only the server sends no audio, so nothing else ends "thinking".
+        if (SILENT_MODES.includes(msg.mode ?? voiceModeRef.current)) {
+          setTutorState("idle");
+        }
+      }
+    }
+  };
+
+  const playPcm16 = async (pcmArrayBuf: ArrayBuffer) => {
+    setTutorState("speaking");
+
+    const ctx = await ensurePlaybackContext();
+    const inputRate = 24000;
+    const pcm16 = new Int16Array(pcmArrayBuf);
+    const float32 = pcm16ToFloat32(pcm16);
+    const resampled = resampleLinear(float32, inputRate, ctx.sampleRate);
+
+    const audioBuffer = ctx.createBuffer(1, resampled.length, ctx.sampleRate);
+    audioBuffer.getChannelData(0).set(resampled);
+
+    const source = ctx.createBufferSource();
+    source.buffer = audioBuffer;
+    source.connect(ctx.destination);
+
+    const now = ctx.currentTime;
+    const minLead = 0.05;
+    const startAt = Math.max(playbackNextTimeRef.current, now + minLead);
+    source.start(startAt);
+    playbackNextTimeRef.current = startAt + audioBuffer.duration;
+  };
+
   const connectCall = async () => {
     if (isConnected) return;
     setError(null);
@@ -87,11 +218,15 @@ const VoiceCall: React.FC = () => {
         `ws://${window.location.hostname}:8000/ws/voice`) ||
       "ws://127.0.0.1:8000/ws/voice";
 
-    const ws = new WebSocket(wsUrl);
+    const ws = new WebSocket(wsUrl, VOICE_SUBPROTOCOL);
     ws.binaryType = "arraybuffer";
 
     ws.onopen = () => {
-      console.log("Connected to backend");
+      protocolV2Ref.current = ws.protocol === VOICE_SUBPROTOCOL;
+      sendSeqRef.current = 0;
+      voiceModeRef.current = "normal";
+      setVoiceMode("normal");
+      console.log(`Connected to backend (protocol ${protocolV2Ref.current ? "v2" : "v1"})`);
       wsRef.current = ws;
       setIsConnected(true);
       setTutorMessage("Hi! I'm Grace. What would you like to learn today?");
@@ -112,62 +247,32 @@ const VoiceCall: React.FC = () => {
 
     ws.onmessage = async (event) => {
       if (typeof event.data === "string") {
+        // v1: JSON events as text
         try {
-          const msg = JSON.parse(event.data) as {
-            type?: string;
-            transcript?: string;
-            answer?: string;
-            citations?: Array<Record<string, unknown>>;
-            error?: string;
-            status?: string;
-          };
-
-          if (msg.type === "kb_result") {
-            if (msg.error) setError(msg.error);
-
-            if (msg.status === "processing") {
-              setTutorState("thinking");
-              setTutorMessage("Let me think about that...");
-            }
-
-            if (msg.status === "done" && typeof msg.answer === "string") {
-              // We just update the text here. The state "speaking" is triggered by the binary audio data.
-              // If there's no audio (text-only response), we might need to handle that,
-              // but typically 'voice' endpoint sends audio.
-              if (msg.answer) {
-                setTutorMessage(msg.answer);
-              }
-            }
-            return;
-          }
+          handleVoiceEvent(JSON.parse(event.data) as VoiceEvent);
         } catch {
-          // fall through
+          // ignore malformed events
         }
         return;
       }
 
-      // Binary: audio playback
-      const pcmArrayBuf = event.data as ArrayBuffer;
-      setTutorState("speaking");
-
-      const ctx = await ensurePlaybackContext();
-      const inputRate = 24000;
-      const pcm16 = new Int16Array(pcmArrayBuf);
-      const float32 = pcm16ToFloat32(pcm16);
-      const resampled = resampleLinear(float32, inputRate, ctx.sampleRate);
-
-      const audioBuffer = ctx.createBuffer(1, resampled.length, ctx.sampleRate);
-      audioBuffer.getChannelData(0).set(resampled);
-
-      const source = ctx.createBufferSource();
-      source.buffer = audioBuffer;
-      source.connect(ctx.destination);
+      if (!protocolV2Ref.current) {
+        // v1: binary is always audio playback
+        await playPcm16(event.data as ArrayBuffer);
+        return;
+      }
 
-      const now = ctx.currentTime;
-      const minLead = 0.05;
-      const startAt = Math.max(playbackNextTimeRef.current, now + minLead);
-      source.start(startAt);
-      playbackNextTimeRef.current = startAt + audioBuffer.duration;
+      const frame = decodeFrame(event.data as ArrayBuffer);
+      if (!frame) return;
+      if (frame.type === FrameType.AUDIO_OUT) {
+        await playPcm16(frame.payload);
+      } else if (frame.type === FrameType.RESULT || frame.type === FrameType.CONTROL) {
+        try {
+          handleVoiceEvent(decodeJson<VoiceEvent>(frame.payload));
+        } catch {
+          // ignore malformed events
+        }
+      }
     };
   };
 
@@ -238,7 +343,7 @@ const VoiceCall: React.FC = () => {
             if (ws.readyState !== WebSocket.OPEN) return;
             const data = evt.data as { type?: string; buffer?: ArrayBuffer };
             if (data?.type === "pcm16" && data.buffer) {
-              ws.send(data.buffer);
+              sendCapturedAudio(ws, new Int16Array(data.buffer));
             }
           };
 
@@ -260,7 +365,7 @@ const VoiceCall: React.FC = () => {
             const s = Math.max(-1, Math.min(1, input[i]));
             pcm16[i] = s < 0 ? s * 0x8000 : s * 0x7fff;
           }
-          ws.send(pcm16.buffer);
+          sendCapturedAudio(ws, pcm16);
         };
 
         source.connect(processor);
@@ -293,7 +398,7 @@ const VoiceCall: React.FC = () => {
     captureAudioContextRef.current = null;
 
     if (wsRef.current && wsRef.current.readyState === WebSocket.OPEN) {
-      wsRef.current.send(new ArrayBuffer(0));
+      sendEndOfTurn(wsRef.current);
     }
   };
 
@@ -314,6 +419,7 @@ const VoiceCall: React.FC = () => {
 
     wsRef.current?.close();
     wsRef.current = null;
+    audioBatcherRef.current.flush();
 
     playbackAudioContextRef.current?.close();
     playbackAudioContextRef.current = null;
@@ -341,7 +447,9 @@ const VoiceCall: React.FC = () => {
       case "speaking":
         return "Speaking...";
       default:
-        return "Ready to chat";
+        return SILENT_MODES.includes(voiceMode)
+          ? "Ready to chat (text answers while Grace is busy)"
+          : "Ready to chat";
     }
   };
 
@@ -0,0 +1,106 @@
+/**
+ * /ws/voice protocol v2 (see backend/SpeechAgent/voice_protocol.py).
+ *
+ * Every message is a binary frame with an 8-byte little-endian header
+ *   u8 version (=2) | u8 type | u16 flags | u32 seq
+ * followed by the payload. Negotiated with the "voice.v2" subprotocol.
+ *
+ * Independently, ?input=text and/or ?output=text on the socket URL select a
+ * text-only session: questions are typed (QUESTION frames) instead of spoken,
+ * and/or answers come back only as result events, without audio.
+ */
+
+export const VOICE_PROTOCOL_VERSION = 2;
+export const VOICE_SUBPROTOCOL = "voice.v2";
+
+export const FrameType = {
+  AUDIO: 0x01,
+  END_TURN: 0x02,
+  CANCEL: 0x03,
+  CONTROL: 0x04,
+  RESULT: 0x05,
+  AUDIO_OUT: 0x06,
+  QUESTION: 0x07,
+} as const;
+
+export type SessionMode = 'audio' | 'text';
+
+const HEADER_BYTES = 8;
+
+// Mic audio is sent in batches of this many samples (~85 ms at 24 kHz)
+// instead of one message per 128-sample worklet frame.
+export const AUDIO_BATCH_SAMPLES = 2048;
+
+export type Frame = {
+  type: number;
+  flags: number;
+  seq: number;
+  payload: ArrayBuffer;
+};
+
+export function encodeFrame(type: number, seq: number, payload?: Uint8Array): ArrayBuffer {
+  const length = payload ? payload.byteLength : 0;
+  const out = new ArrayBuffer(HEADER_BYTES + length);
+  const view = new DataView(out);
+  view.setUint8(0, VOICE_PROTOCOL_VERSION);
+  view.setUint8(1, type);
+  view.setUint16(2, 0, true);
+  view.setUint32(4, seq >>> 0, true);
+  if (payload) new Uint8Array(out, HEADER_BYTES).set(payload);
+  return out;
+}
+
+/** A typed question, for sessions opened with ?input=text. */
+export function encodeQuestion(seq: number, question: string): ArrayBuffer {
+  return encodeFrame(FrameType.QUESTION, seq, new TextEncoder().encode(question));
+}
+
+export function decodeFrame(data: ArrayBuffer): Frame | null {
+  if (data.byteLength < HEADER_BYTES) return null;
+  const view = new DataView(data);
+  if (view.getUint8(0) !== VOICE_PROTOCOL_VERSION) return null;
+  return {
+    type: view.getUint8(1),
+    flags: view.getUint16(2, true),
+    seq: view.getUint32(4, true),
+    payload: data.slice(HEADER_BYTES),
+  };
+}
+
+export function decodeJson<T>(payload: ArrayBuffer): T {
+  return JSON.parse(new TextDecoder().decode(payload)) as T;
+}
+
+/**
+ * Collects small PCM16 capture frames into one batch.
+ */
+export class AudioBatcher {
+  private chunks: Int16Array[] = [];
+  private samples = 0;
+  private readonly batchSamples: number;
+
+  constructor(batchSamples: number = AUDIO_BATCH_SAMPLES) {
+    this.batchSamples = batchSamples;
+  }
+
+  /** Add a frame; returns a full batch once enough samples are buffered. */
+  push(pcm: Int16Array): Uint8Array | null {
+    this.chunks.push(pcm);
+    this.samples += pcm.length;
+    return this.samples >= this.batchSamples ? this.flush() : null;
+  }
+
+  /** Whatever is buffered (null if nothing). */
+  flush(): Uint8Array | null {
+    if (this.samples === 0) return null;
+    const out = new Int16Array(this.samples);
+    let offset = 0;
+    for (const chunk of this.chunks) {
+      out.set(chunk, offset);
+      offset += chunk.length;
+    }
+    this.chunks = [];
+    this.samples = 0;
+    return new Uint8Array(out.buffer);
+  }
+}
@@ -4,6 +4,9 @@ import WorldPageLayout from '../../../../../components/WorldPageLayout/WorldPage
 import { ROUTES } from '../../../../../config/routes';
 import { assets } from '../../../../../assets/assets';
 import type { Question } from '../../../../../types/quiz';
+import type { QuizUserAnswer } from '../../../../../utils/quizPayload';
+import { quizAnswersPayload } from '../../../../../utils/quizPayload';
+import { runQuizAnalysisJob } from '../../../../../utils/quizJobs';
 import type { QuizAnalysisResponse } from '../../../../../types/analysis';
 import type { UserPreferences } from '../../../../../types/preferences';
 import type { ReflectionAnalysis } from '../../../../../types/reflection';
@@ -58,13 +61,7 @@ function Module1Page() {
     const [characterState, setCharacterState] = useState<CharacterState>('idle');
 
     // AI analysis state
-    const [userAnswers, setUserAnswers] = useState<
-        Array<{
-            question: string;
-            answerOptions: Question['answerOptions'];
-            answerCorrect: boolean;
-        }>
-    >([]);
+    const [userAnswers, setUserAnswers] = useState<QuizUserAnswer[]>([]);
     const [isAnalyzing, setIsAnalyzing] = useState(false);
     const [shouldAnalyze, setShouldAnalyze] = useState(false);
     const [userPreferences, setUserPreferences] = useState<UserPreferences | null>(null);
@@ -112,26 +109,55 @@ function Module1Page() {
         }
 
         setIsSubmittingReflection(true);
+        const body = JSON.stringify({
+            module_number: 1,
+            student_response: reflectionText,
+        });
+        let fullAnalysisDone = false;
+        let showingPrescore = false;
+
+        // The instant local prescore is shown until the full analysis replaces it.
+        fetch('http://127.0.0.1:8000/analyze-reflection/prescore', {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body,
+        })
+            .then((response) => (response.ok ? response.json() : null))
+            .then((data: ReflectionAnalysis | null) => {
+                if (data && !fullAnalysisDone) {
+                    showingPrescore = true;
+                    setReflectionFeedback(data);
+                    setPhase((current) => (current === 'reflection' ? 'feedback' : current));
+                }
+            })
+            .catch(() => {
+                // The full analysis still follows.
+            });
+
         try {
             const response = await fetch('http://127.0.0.1:8000/analyze-reflection', {
                 method: 'POST',
                 headers: { 'Content-Type': 'application/json' },
-                body: JSON.stringify({
-                    module_number: 1,
-                    student_response: reflectionText,
-                }),
+                body,
             });
 
             if (response.ok) {
                 const data: ReflectionAnalysis = await response.json();
+                fullAnalysisDone = true;
                 setReflectionFeedback(data);
-                setPhase('feedback');
+                // The student may have moved on from the prescore already.
+                setPhase((current) => (current === 'reflection' ? 'feedback' : current));
             } else {
+                fullAnalysisDone = true;
                 const error = await response.json();
-                alert(error.detail || 'Failed to analyze reflection. Please try again.');
+                if (!showingPrescore) {
+                    alert(error.detail || 'Failed to analyze reflection. Please try again.');
+                }
             }
         } catch (error) {
+            fullAnalysisDone = true;
             console.error('Reflection analysis failed:', error);
+            if (showingPrescore) return;
             // Create fallback feedback
             setReflectionFeedback({
                 actors: ['Unable to identify'],
@@ -183,6 +209,8 @@ function Module1Page() {
         setUserAnswers((prev) => [
             ...prev,
             {
+                questionId: currentQuestion.id,
+                choice: selectedAnswer,
                 question: currentQuestion.question,
                 answerOptions: currentQuestion.answerOptions,
                 answerCorrect: isCorrect,
@@ -214,21 +242,13 @@ function Module1Page() {
         const runAnalysis = async () => {
             setIsAnalyzing(true);
             try {
-                const response = await fetch('http://127.0.0.1:8000/analyze-quiz', {
-                    method: 'POST',
-                    headers: { 'Content-Type': 'application/json' },
-                    body: JSON.stringify({
-                        quiz: userAnswers.map((a) => ({
-                            question: a.question,
-                            answerOptions: a.answerOptions,
-                            user_answer: a.answerCorrect,
-                        })),
-                        preferences: userPreferences,
-                    }),
+                const data = await runQuizAnalysisJob({
+                    ...quizAnswersPayload(userAnswers),
+                    preferences: userPreferences,
+                    module_number: 1,
                 });
 
-                if (response.ok) {
-                    const data: QuizAnalysisResponse = await response.json();
+                if (data) {
                     navigate(ROUTES.POLICY_WORLD_ACADEMIA_MODULE_1_CORRECTION, {
                         state: {
                             analysisResult: data,
@@ -382,6 +402,13 @@ function Module1Page() {
                         <h2 className="feedback-title">Your Reflection Feedback</h2>
                         <span className="feedback-score">{reflectionFeedback.score}/10</span>
                     </div>
+                    {(reflectionFeedback.provisional || reflectionFeedback.fallback) && (
+                        <p className="feedback-provisional">
+                            {reflectionFeedback.provisional && isSubmittingReflection
+                                ? 'Quick check. Grace is still reading your story...'
+                                : 'Quick check only. The full analysis is unavailable right now.'}
+                        </p>
+                    )}
 
                     <div className="feedback-section">
                         <h3 className="feedback-section-title">Extracted Elements</h3>
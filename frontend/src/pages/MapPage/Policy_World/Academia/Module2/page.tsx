@@ -4,6 +4,9 @@ import WorldPageLayout from '../../../../../components/WorldPageLayout/WorldPage
 import { ROUTES } from '../../../../../config/routes';
 import { assets } from '../../../../../assets/assets';
 import type { Question } from '../../../../../types/quiz';
+import type { QuizUserAnswer } from '../../../../../utils/quizPayload';
+import { quizAnswersPayload } from '../../../../../utils/quizPayload';
+import { runQuizAnalysisJob } from '../../../../../utils/quizJobs';
 import type { QuizAnalysisResponse } from '../../../../../types/analysis';
 import type { UserPreferences } from '../../../../../types/preferences';
 import quizData from '../quiz_module2.json';
@@ -41,13 +44,7 @@ function Module2Page() {
     const [characterState, setCharacterState] = useState<CharacterState>('idle');
 
     // AI analysis state
-    const [userAnswers, setUserAnswers] = useState<
-        Array<{
-            question: string;
-            answerOptions: Question['answerOptions'];
-            answerCorrect: boolean;
-        }>
-    >([]);
+    const [userAnswers, setUserAnswers] = useState<QuizUserAnswer[]>([]);
     const [isAnalyzing, setIsAnalyzing] = useState(false);
     const [shouldAnalyze, setShouldAnalyze] = useState(false);
     const [userPreferences, setUserPreferences] = useState<UserPreferences | null>(null);
@@ -110,6 +107,8 @@ function Module2Page() {
         setUserAnswers((prev) => [
             ...prev,
             {
+                questionId: currentQuestion.id,
+                choice: selectedAnswer,
                 question: currentQuestion.question,
                 answerOptions: currentQuestion.answerOptions,
                 answerCorrect: isCorrect,
@@ -141,21 +140,13 @@ function Module2Page() {
         const runAnalysis = async () => {
             setIsAnalyzing(true);
             try {
-                const response = await fetch('http://127.0.0.1:8000/analyze-quiz', {
-                    method: 'POST',
-                    headers: { 'Content-Type': 'application/json' },
-                    body: JSON.stringify({
-                        quiz: userAnswers.map((a) => ({
-                            question: a.question,
-                            answerOptions: a.answerOptions,
-                            user_answer: a.answerCorrect,
-                        })),
-                        preferences: userPreferences,
-                    }),
+                const data = await runQuizAnalysisJob({
+                    ...quizAnswersPayload(userAnswers),
+                    preferences: userPreferences,
+                    module_number: 2,
                 });
 
-                if (response.ok) {
-                    const data: QuizAnalysisResponse = await response.json();
+                if (data) {
                     navigate(ROUTES.POLICY_WORLD_ACADEMIA_MODULE_2_CORRECTION, {
                         state: {
                             analysisResult: data,
@@ -4,6 +4,9 @@ import WorldPageLayout from '../../../../components/WorldPageLayout/WorldPageLay
 import { ROUTES } from '../../../../config/routes';
 import { useQuizCompletion } from '../../../../contexts/QuizCompletionContext';
 import type { Question } from '../../../../types/quiz';
+import type { QuizUserAnswer } from '../../../../utils/quizPayload';
+import { quizAnswersPayload } from '../../../../utils/quizPayload';
+import { runQuizAnalysisJob } from '../../../../utils/quizJobs';
 import type { QuizAnalysisResponse } from '../../../../types/analysis';
 import type { UserPreferences } from '../../../../types/preferences';
 import { assets } from '../../../../assets/assets';
@@ -22,12 +25,6 @@ const CHARACTER_VIDEOS: Record<CharacterState, string> = {
     sad: '/Policy-world/Character/sad-mic.webm',
 };
 
-interface DebateUserAnswer {
-    question: string;
-    answerOptions: Question['answerOptions'];
-    answerCorrect: boolean;
-}
-
 function DebatePage() {
     const navigate = useNavigate();
     const { markCompleted } = useQuizCompletion();
@@ -48,7 +45,7 @@ function DebatePage() {
     const [characterState, setCharacterState] = useState<CharacterState>('idle');
 
     // AI analysis state
-    const [userAnswers, setUserAnswers] = useState<DebateUserAnswer[]>([]);
+    const [userAnswers, setUserAnswers] = useState<QuizUserAnswer[]>([]);
     const [isAnalyzing, setIsAnalyzing] = useState(false);
     const [, setAnalysisResult] = useState<QuizAnalysisResponse | null>(null);
     const [shouldAnalyze, setShouldAnalyze] = useState(false);
@@ -129,6 +126,8 @@ function DebatePage() {
         setUserAnswers((prev) => [
             ...prev,
             {
+                questionId: currentQuestion.id,
+                choice: selectedAnswer,
                 question: currentQuestion.question,
                 answerOptions: currentQuestion.answerOptions,
                 answerCorrect: isCorrect,
@@ -170,21 +169,12 @@ function DebatePage() {
         const runAnalysis = async () => {
             setIsAnalyzing(true);
             try {
-                const response = await fetch('http://127.0.0.1:8000/analyze-quiz', {
-                    method: 'POST',
-                    headers: { 'Content-Type': 'application/json' },
-                    body: JSON.stringify({
-                        quiz: userAnswers.map((a) => ({
-                            question: a.question,
-                            answerOptions: a.answerOptions,
-                            user_answer: a.answerCorrect,
-                        })),
-                        preferences: userPreferences,
-                    }),
+                const data = await runQuizAnalysisJob({
+                    ...quizAnswersPayload(userAnswers),
+                    preferences: userPreferences,
                 });
 
-                if (response.ok) {
-                    const data: QuizAnalysisResponse = await response.json();
+                if (data) {
                     setAnalysisResult(data);
 
                     navigate(ROUTES.POLICY_WORLD_DEBATE_CORRECTION, {
@@ -8,6 +8,8 @@ export interface QuizAnalysisResponse {
         diagram_code?: string | null;
     }>;
     overall_summary: string;
+    /** True when the AI analysis was unavailable and these are the quiz's own rationales. */
+    fallback?: boolean;
 }
 
 
@@ -5,6 +5,8 @@ export interface AnswerOption {
 }
 
 export interface Question {
+    /** Quiz bank ID, for questions the backend knows (see backend/TeacherAgent/quiz_bank.py). */
+    id?: string;
     question: string;
     answerOptions: AnswerOption[];
     hint: string;
@@ -13,6 +13,10 @@ export interface ReflectionAnalysis {
     rule_or_duty_breached: string;
     score: number;
     feedback: ReflectionFeedback;
+    /** True for the instant local prescore, before (or instead of) the full analysis. */
+    provisional?: boolean;
+    /** True when the full analysis was unavailable and this is the prescore as the final answer. */
+    fallback?: boolean;
 }
 
 export interface ReflectionRequest {
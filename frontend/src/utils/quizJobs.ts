@@ -0,0 +1,50 @@
+import type { QuizAnalysisResponse } from '../types/analysis';
+
+const TEACHER_API_URL = 'http://127.0.0.1:8000';
+// Each poll is a long-poll: the server answers as soon as the job finishes.
+const POLL_WAIT_SECONDS = 25;
+const MAX_POLLS = 12;
+
+/**
+ * Anonymous per-browser ID sent with quiz jobs. Resubmitting the same quiz
+ * (for example after navigating away mid-analysis) then reattaches to the
+ * job already running on the server instead of starting a new one.
+ */
+export function quizStudentId(): string {
+    let id = localStorage.getItem('quizStudentId');
+    if (!id) {
+        id = crypto.randomUUID();
+        localStorage.setItem('quizStudentId', id);
+    }
+    return id;
+}
+
+/**
+ * Run a quiz analysis as a background job: submit it to /analyze-quiz/jobs,
+ * then long-poll the job until it finishes. Resolves to null when the job
+ * fails without a result or never finishes, so the caller can show its
+ * local fallback.
+ */
+export async function runQuizAnalysisJob(
+    body: Record<string, unknown>
+): Promise<QuizAnalysisResponse | null> {
+    const submitted = await fetch(`${TEACHER_API_URL}/analyze-quiz/jobs`, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ ...body, student_id: quizStudentId() }),
+    });
+    if (!submitted.ok) return null;
+    const { job_id } = await submitted.json();
+
+    for (let poll = 0; poll < MAX_POLLS; poll++) {
+        const response = await fetch(
+            `${TEACHER_API_URL}/analyze-quiz/jobs/${job_id}?wait=${POLL_WAIT_SECONDS}`
+        );
+        if (!response.ok) return null;
+        const job = await response.json();
+        if (job.status === 'done') return job.result ?? null;
+        // A failed job may still carry the quiz's own rationales as a fallback result.
+        if (job.status === 'failed') return job.result ?? null;
+    }
+    return null;
+}
@@ -0,0 +1,31 @@
+import type { Question } from '../types/quiz';
+
+export interface QuizUserAnswer {
+    /** Quiz bank ID (the question's `id`), if the question has one. */
+    questionId?: string;
+    /** Index of the chosen option. */
+    choice: number;
+    question: string;
+    answerOptions: Question['answerOptions'];
+    answerCorrect: boolean;
+}
+
+/**
+ * The answers part of an /analyze-quiz request body. Questions from the
+ * server-side quiz bank are sent as compact {question_id, choice} pairs;
+ * anything else falls back to the full questions.
+ */
+export function quizAnswersPayload(answers: QuizUserAnswer[]) {
+    if (answers.every((a) => a.questionId)) {
+        return {
+            answers: answers.map((a) => ({ question_id: a.questionId, choice: a.choice })),
+        };
+    }
+    return {
+        quiz: answers.map((a) => ({
+            question: a.question,
+            answerOptions: a.answerOptions,
+            user_answer: a.answerCorrect,
+        })),
+    };
+}
@@ -8,6 +8,7 @@ export function resetAllState() {
     localStorage.removeItem('userName');
     localStorage.removeItem('userPreferences');
     localStorage.removeItem('userStats');
+    localStorage.removeItem('quizStudentId');
     
     // Reload the page to reset React state
     window.location.reload();
@@ -22,6 +23,7 @@ export function clearAllState() {
     localStorage.removeItem('userName');
     localStorage.removeItem('userPreferences');
     localStorage.removeItem('userStats');
+    localStorage.removeItem('quizStudentId');
 }
 
 // Make it available globally for easy console access during development